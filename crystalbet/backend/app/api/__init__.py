@@ -2,10 +2,19 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-from core.config import settings  # Import configuration settings
+from db.mongodb import init_db, close_db
+from utils.cache_backends import close_cache_backend
+from core.hashing import calibrate_hash_policy, shutdown_hasher
+from services.outbox import start_outbox_worker, stop_outbox_worker
+from services.campaign import stop_campaigns
+from services.cashout import start_cashout_engine, stop_cashout_engine
+from services.exposure import start_exposure_book, stop_exposure_book
+from services.odds import start_odds_snapshot, stop_odds_snapshot
+from utils.throttle import close_throttle
+from db.group_commit import close_group_writers
 from api.auth import router as auth_router
 from api.bets import router as bet_router
+from api.betting import router as betting_router
 from api.match import router as match_router
 from api.users import router as user_router
 from api.admin import router as admin_router
@@ -29,20 +38,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allow all HTTP methods
     allow_headers=["*"],  # Allow all HTTP headers
+    expose_headers=["X-Next-Cursor"],  # Pagination cursor (utils/pagination.py) must be readable by the frontend
 )
 
 # MongoDB connection setup
 @app.on_event("startup")
 async def startup_db_client():
-    app.mongodb_client = AsyncIOMotorClient(settings.MONGODB_URI)
-    app.mongodb = app.mongodb_client[settings.MONGODB_DB]
+    await init_db()
+    await calibrate_hash_policy()
+    await start_outbox_worker()
+    await start_exposure_book()
+    await start_odds_snapshot()
+    await start_cashout_engine()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    app.mongodb_client.close()
+    await stop_campaigns()
+    await stop_outbox_worker()
+    await close_group_writers()
+    await stop_exposure_book()
+    await stop_cashout_engine()
+    await stop_odds_snapshot()
+    await close_db()
+    await close_cache_backend()
+    await close_throttle()
+    shutdown_hasher()
 
 # Include various API routes
 app.include_router(auth_router, prefix="/api/auth", tags=["Auth"])
+app.include_router(betting_router, prefix="/api/bets", tags=["Bets"])
 app.include_router(bet_router, prefix="/api/bets", tags=["Bets"])
 app.include_router(match_router, prefix="/api/matches", tags=["Matches"])
 app.include_router(user_router, prefix="/api/users", tags=["Users"])
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from datetime import datetime
+from typing import Any, Dict, List, Optional
 from pymongo.collection import Collection
 from bson import ObjectId
 from pydantic import BaseModel, Field
-from db.mongodb import get_db, get_collection  # Ensure you have the correct import for your MongoDB functions
+from db.mongodb import collection_dependency, get_collection, get_db, iter_cursor  # Ensure you have the correct import for your MongoDB functions
 from services.auth import verify_admin
 from models.user import UserInDB
+from services.database import get_all_content as get_cached_content, invalidate_content, iter_all_bets
+from services.campaign import campaign_progress, create_campaign, pause_campaign, start_campaign
+from services.settlement import get_settlement, settle_match
+from services.exposure import match_exposure, top_exposures
+from services.match import MatchService
+from utils.streaming import stream_documents, stream_mode
+from utils.pagination import DESCENDING, PageParams, paginate, set_next_cursor
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -28,6 +36,26 @@ class ContentResponse(BaseModel):
     content_type: str
     is_active: bool
 
+class CampaignSegment(BaseModel):
+    is_active: Optional[bool] = True
+    email_verified: Optional[bool] = None
+    is_superuser: Optional[bool] = None
+    created_after: Optional[datetime] = None
+
+class CampaignCreate(BaseModel):
+    name: str
+    subject: str
+    template: str = Field("promotion.html", description="Template file in templates/")
+    context: Dict[str, Any] = Field(default_factory=dict, description="Template variables, e.g. headline, message, cta_url")
+    segment: CampaignSegment = Field(default_factory=CampaignSegment)
+    rate_per_second: Optional[float] = Field(None, gt=0, description="Defaults to CAMPAIGN_RATE_PER_SECOND")
+    connections: Optional[int] = Field(None, ge=1, le=32, description="Defaults to CAMPAIGN_CONNECTIONS")
+
+class MatchResult(BaseModel):
+    winning_selections: List[str] = Field(default_factory=list, description="Selections that won, e.g. ['home']")
+    void_selections: List[str] = Field(default_factory=list, description="Selections whose stakes are returned")
+    void_all: bool = Field(False, description="Match abandoned: every stake is returned")
+
 def content_to_response(content: dict) -> ContentResponse:
     return ContentResponse(
         id=str(content["_id"]),
@@ -40,21 +68,50 @@ def content_to_response(content: dict) -> ContentResponse:
 @router.get("/content", response_model=List[ContentResponse])
 async def get_all_content(
     current_user: UserInDB = Depends(verify_admin),
-    content_collection: Collection = Depends(lambda: get_collection("admin_content"))
+    stream: Optional[str] = Depends(stream_mode),
+    content_collection: Collection = Depends(collection_dependency("admin_content"))
 ):
-    contents = await content_collection.find().to_list(None)
+    if stream:
+        return stream_documents(iter_cursor(content_collection.find()), stream)
+    contents = await get_cached_content()
     return [content_to_response(content) for content in contents]
 
+@router.get("/bets")
+async def export_all_bets(
+    response: Response,
+    user_id: Optional[str] = None,
+    status_filter: Optional[str] = None,
+    page: PageParams = Depends(),
+    stream: Optional[str] = Depends(stream_mode),
+    current_user: UserInDB = Depends(verify_admin),
+):
+    """
+    List bets newest first, one keyset page at a time, optionally filtered by user and status.
+    With `stream=ndjson|json` the full result set is streamed instead; memory stays flat
+    however many bets the collection holds.
+    """
+    query = {}
+    if user_id:
+        query["user_id"] = user_id
+    if status_filter:
+        query["status"] = status_filter
+    if stream:
+        return stream_documents(iter_all_bets(query), stream)
+    bets, next_cursor = await paginate(await get_collection("bets"), query, page, sort_key="created_at", direction=DESCENDING)
+    set_next_cursor(response, next_cursor)
+    return bets
+
 @router.post("/content", response_model=ContentResponse, status_code=status.HTTP_201_CREATED)
 async def create_content(
     content_data: ContentCreate, 
     current_user: UserInDB = Depends(verify_admin),
-    content_collection: Collection = Depends(lambda: get_collection("admin_content"))
+    content_collection: Collection = Depends(collection_dependency("admin_content"))
 ):
     new_content = content_data.dict()
     insert_result = await content_collection.insert_one(new_content)
     
     if insert_result.inserted_id:
+        await invalidate_content()
         created_content = await content_collection.find_one({"_id": insert_result.inserted_id})
         return content_to_response(created_content)
     
@@ -65,7 +122,7 @@ async def update_content(
     content_id: str, 
     content_data: ContentUpdate, 
     current_user: UserInDB = Depends(verify_admin),
-    content_collection: Collection = Depends(lambda: get_collection("admin_content"))
+    content_collection: Collection = Depends(collection_dependency("admin_content"))
 ):
     update_data = {k: v for k, v in content_data.dict(exclude_unset=True).items()}
     
@@ -76,6 +133,7 @@ async def update_content(
     )
     
     if updated_content:
+        await invalidate_content()
         return content_to_response(updated_content)
     
     raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Content not found")
@@ -84,11 +142,94 @@ async def update_content(
 async def delete_content(
     content_id: str, 
     current_user: UserInDB = Depends(verify_admin),
-    content_collection: Collection = Depends(lambda: get_collection("admin_content"))
+    content_collection: Collection = Depends(collection_dependency("admin_content"))
 ):
     delete_result = await content_collection.delete_one({"_id": ObjectId(content_id)})
     
     if delete_result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Content not found")
+    await invalidate_content()
     
     return None
+
+@router.post("/campaigns", status_code=status.HTTP_201_CREATED)
+async def create_email_campaign(
+    campaign: CampaignCreate,
+    current_user: UserInDB = Depends(verify_admin),
+    db=Depends(get_db),
+):
+    """
+    Create a promotional email campaign as a draft.
+    """
+    return await create_campaign(db, **campaign.dict())
+
+@router.post("/campaigns/{campaign_id}/start")
+async def start_email_campaign(campaign_id: str, current_user: UserInDB = Depends(verify_admin), db=Depends(get_db)):
+    """
+    Start a campaign, or resume it from its last checkpoint. Sending continues in the background.
+    """
+    return await start_campaign(db, campaign_id)
+
+@router.post("/campaigns/{campaign_id}/pause")
+async def pause_email_campaign(campaign_id: str, current_user: UserInDB = Depends(verify_admin), db=Depends(get_db)):
+    """
+    Pause a campaign running in this process after its in-flight messages.
+    """
+    return await pause_campaign(db, campaign_id)
+
+@router.get("/campaigns/{campaign_id}")
+async def get_email_campaign(campaign_id: str, current_user: UserInDB = Depends(verify_admin), db=Depends(get_db)):
+    """
+    Campaign status and progress: sent, failed, checkpoint and messages per second.
+    """
+    return await campaign_progress(db, campaign_id)
+
+@router.post("/matches/{match_id}/settle")
+async def settle_finished_match(
+    match_id: str,
+    result: MatchResult,
+    current_user: UserInDB = Depends(verify_admin),
+    db=Depends(get_db),
+):
+    """
+    Record a match result and settle its open bets. Safe to repeat: a rerun resumes from the checkpoint.
+    """
+    if not (result.winning_selections or result.void_selections or result.void_all):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="A result needs winning or void selections.")
+    return await settle_match(db, match_id, result.winning_selections, result.void_selections, result.void_all)
+
+@router.get("/settlements/{match_id}")
+async def get_match_settlement(match_id: str, current_user: UserInDB = Depends(verify_admin), db=Depends(get_db)):
+    """
+    Settlement status and totals of a match: settled, won, lost, void and payout total.
+    """
+    return await get_settlement(db, match_id)
+
+@router.get("/exposure/top")
+async def get_top_exposures(n: int = 20, by: str = "liability", current_user: UserInDB = Depends(verify_admin), db=Depends(get_db)):
+    """
+    The n open outcomes with the largest liability (by=liability), stake (by=stake) or bet count (by=bets).
+    Served from the last checkpoint outside the process keeping the book.
+    """
+    if by not in ("liability", "stake", "bets"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="by must be liability, stake or bets.")
+    return await top_exposures(db, max(1, min(n, 500)), by)
+
+@router.get("/exposure/matches/{match_id}")
+async def get_match_exposure(match_id: str, current_user: UserInDB = Depends(verify_admin), db=Depends(get_db)):
+    """
+    Stake, liability and net result per outcome of an open match.
+    """
+    return await match_exposure(db, match_id)
+
+@router.post("/odds")
+async def ingest_odds_feed(
+    updates: Dict[str, Dict[str, float]],
+    current_user: UserInDB = Depends(verify_admin),
+    db=Depends(get_db),
+):
+    """
+    Apply a batch of price updates ({match_id: {selection: odds}}); only the selections sent change.
+    """
+    modified = await MatchService(db["matches"]).ingest_odds(updates)
+    return {"matches_updated": modified}
@@ -1,18 +1,21 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 from pydantic import EmailStr
-from core.security import verify_password, create_access_token, hash_password
-from services.auth import create_user, authenticate_user, send_reset_password_email, reset_password
-from schemas.auth import Token, UserCreate, PasswordResetRequest, PasswordReset
+from core.security import create_access_token
+from services.auth import access_token_claims, create_user, authenticate_user, send_reset_password_email, reset_password, verify_email
+from schemas.auth import Token, TokenRefresh, UserCreate, PasswordResetRequest, PasswordReset
+from services.session import create_session, end_session, rotate_session
+from services.email import request_email_verification
 from db.mongodb import get_db
 from utils.token import decode_token
+from utils.throttle import throttle_auth
 
 router = APIRouter()
 
 # Set up OAuth2 password bearer for protected routes
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
-@router.post("/token", response_model=Token)
+@router.post("/token", response_model=Token, dependencies=[Depends(throttle_auth)])
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db)):
     """
     Log in a user and generate a JWT token.
@@ -25,12 +28,14 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get
             detail="Incorrect username or password"
         )
 
-    # Generate access token for the user
-    access_token = create_access_token({"sub": str(user["_id"])})
+    # Generate access token for the user, with the claims admin checks rely on
+    claims = access_token_claims(user)
+    access_token = create_access_token(claims)
+    refresh_token = await create_session(db, claims)
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
 
-@router.post("/register", status_code=status.HTTP_201_CREATED)
+@router.post("/register", status_code=status.HTTP_201_CREATED, dependencies=[Depends(throttle_auth)])
 async def register(user: UserCreate, db=Depends(get_db)):
     """
     Register a new user.
@@ -43,13 +48,14 @@ async def register(user: UserCreate, db=Depends(get_db)):
             detail="Email already registered"
         )
     
-    # Hash the password before saving
-    user.password = hash_password(user.password)
+    # create_user hashes the password
     created_user = await create_user(db, user)
+    # Queued in the outbox, registration does not wait for SMTP
+    await request_email_verification(db, created_user.id, user.email)
     
-    return {"message": "User created successfully", "user_id": str(created_user.inserted_id)}
+    return {"message": "User created successfully", "user_id": str(created_user.id)}
 
-@router.post("/password-reset-request", status_code=status.HTTP_200_OK)
+@router.post("/password-reset-request", status_code=status.HTTP_200_OK, dependencies=[Depends(throttle_auth)])
 async def password_reset_request(reset_request: PasswordResetRequest, db=Depends(get_db)):
     """
     Handle password reset request by sending an email with a reset token.
@@ -71,19 +77,26 @@ async def password_reset(reset: PasswordReset, db=Depends(get_db)):
     """
     Handle the password reset using the provided reset token.
     """
-    user = await db["users"].find_one({"reset_token": reset.token})
-    
-    if not user:
+    if reset.new_password != reset.confirm_password:
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail="Invalid or expired token"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Passwords do not match"
         )
     
-    # Reset the user's password
-    await reset_password(db, user, reset.new_password)
+    # Redeems the token and resets the user's password
+    await reset_password(db, reset.reset_token, reset.new_password)
     
     return {"message": "Password updated successfully"}
 
+@router.get("/verify-email/{token}", status_code=status.HTTP_200_OK)
+async def confirm_email(token: str, db=Depends(get_db)):
+    """
+    Confirm an email address with the token from the verification email.
+    """
+    await verify_email(db, token)
+    
+    return {"message": "Email verified successfully"}
+
 @router.get("/me", response_model=UserCreate)
 async def read_users_me(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
     """
@@ -97,7 +110,7 @@ async def read_users_me(token: str = Depends(oauth2_scheme), db=Depends(get_db))
 
     return user
 
-@router.post("/login", response_model=Token)
+@router.post("/login", response_model=Token, dependencies=[Depends(throttle_auth)])
 async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get_db)):
     """
     Log in a user and generate a JWT token.
@@ -111,7 +124,29 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(get
             detail="Incorrect username or password"
         )
 
-    # Generate an access token for the authenticated user
-    access_token = create_access_token({"sub": str(user.id)})
+    # Generate an access token and a refresh session for the authenticated user
+    claims = access_token_claims(user)
+    access_token = create_access_token(claims)
+    refresh_token = await create_session(db, claims)
     
-    return {"access_token": access_token, "token_type": "bearer"} 
\ No newline at end of file
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/refresh", response_model=Token)
+async def refresh(body: TokenRefresh, db=Depends(get_db)):
+    """
+    Exchange a refresh token for a new access token and a new refresh token.
+    The presented refresh token stops working; presenting it again revokes the session.
+    """
+    claims, refresh_token = await rotate_session(db, body.refresh_token)
+    access_token = create_access_token(claims)
+
+    return {"access_token": access_token, "token_type": "bearer", "refresh_token": refresh_token}
+
+@router.post("/logout", status_code=status.HTTP_200_OK)
+async def logout(body: TokenRefresh, db=Depends(get_db)):
+    """
+    End the session behind a refresh token.
+    """
+    await end_session(db, body.refresh_token)
+
+    return {"message": "Logged out"} 
\ No newline at end of file
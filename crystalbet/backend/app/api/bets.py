@@ -1,29 +1,45 @@
 # api/match.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from typing import List
 from models.match import Match, LiveMatch
 from schemas.match import MatchResponse, MatchDetailResponse, LiveMatchResponse, SportCategoryResponse
 from services.match import MatchService
 from utils.jwt import get_current_user
+from db.mongodb import collection_dependency
+from utils.pagination import PageParams, set_next_cursor
+from utils.fields import FieldSelection, sparse_fields
+from utils.serialization import FastPath
 
 router = APIRouter(
     prefix="/api/matches",
     tags=["Matches"]
 )
+fast_path = FastPath("matches")
 
 # Dependency for MatchService
-def get_match_service():
-    return MatchService()
+def get_match_service(collection=Depends(collection_dependency("matches"))):
+    return MatchService(collection)
 
 @router.get("/", response_model=List[MatchResponse])
-async def get_all_matches(match_service: MatchService = Depends(get_match_service)):
+async def get_all_matches(
+    response: Response,
+    page: PageParams = Depends(),
+    match_service: MatchService = Depends(get_match_service),
+    fields: FieldSelection = Depends(sparse_fields(MatchResponse)),
+):
     """
-    Retrieve all available matches.
+    Retrieve available matches, one keyset page at a time.
+    Supports sparse fieldsets through ?fields=.
     """
-    matches = await match_service.get_all_matches()
+    matches, next_cursor = await match_service.find_matches_cached(page, projection=fields.projection)
+    set_next_cursor(response, next_cursor)
     if not matches:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No matches found")
+    if fields.partial:
+        return fields.respond(matches, headers=response.headers)
+    if fast_path.enabled:
+        return fast_path.respond(matches, headers=response.headers)
     return matches
 
 @router.get("/live", response_model=List[LiveMatchResponse])
@@ -36,16 +52,6 @@ async def get_live_matches(match_service: MatchService = Depends(get_match_servi
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No live matches found")
     return live_matches
 
-@router.get("/{match_id}", response_model=MatchDetailResponse)
-async def get_match_by_id(match_id: str, match_service: MatchService = Depends(get_match_service)):
-    """
-    Retrieve match details by match ID.
-    """
-    match = await match_service.get_match_by_id(match_id)
-    if not match:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found")
-    return match
-
 @router.get("/sports/{category}", response_model=List[SportCategoryResponse])
 async def get_matches_by_sport_category(category: str, match_service: MatchService = Depends(get_match_service)):
     """
@@ -65,3 +71,13 @@ async def get_todays_matches(match_service: MatchService = Depends(get_match_ser
     if not todays_matches:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No matches available for today")
     return todays_matches
+
+@router.get("/{match_id}", response_model=MatchDetailResponse)
+async def get_match_by_id(match_id: str, match_service: MatchService = Depends(get_match_service)):
+    """
+    Retrieve match details by match ID.
+    """
+    match = await match_service.get_match_by_id(match_id)
+    if not match:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match not found")
+    return match
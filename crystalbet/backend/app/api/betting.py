@@ -0,0 +1,56 @@
+# api/betting.py
+
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from db.mongodb import get_db
+from models.user import UserInDB
+from schemas.bet import BetSlip, CashoutQuote, SlipQuote, SlipRequest
+from services.auth import get_current_user
+from services.bet import BetService
+from services.cashout import get_cashout_quote
+from utils.idempotency import idempotent
+
+router = APIRouter()
+
+# Dependency for BetService
+def get_bet_service(db=Depends(get_db)):
+    return BetService(db)
+
+@router.post("/slip/calculate", response_model=SlipQuote, response_model_exclude_none=True)
+async def calculate_bet_slip(slip: SlipRequest):
+    """
+    Quote a slip: total stake, potential payout, payout per fold and, with include_lines, per line.
+    Needs no login so the bet slip can recalculate on every selection change.
+    """
+    return BetService.quote_slip(slip)
+
+@router.post("/book", response_model=BetSlip, status_code=status.HTTP_201_CREATED)
+async def book_bet_slip(
+    slip: SlipRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: UserInDB = Depends(get_current_user),
+    bet_service: BetService = Depends(get_bet_service),
+):
+    """
+    Book singles, an accumulator or a system bet for the current user.
+    Retries sent with the same Idempotency-Key get the original slip back instead of booking again.
+    """
+    return await idempotent(
+        response,
+        f"bets.book:{current_user.id}",
+        idempotency_key,
+        slip,
+        lambda: bet_service.book_bet(slip, current_user.id),
+    )
+
+@router.get("/{bet_id}/cashout", response_model=CashoutQuote)
+async def get_bet_cashout(bet_id: str, current_user: UserInDB = Depends(get_current_user), db=Depends(get_db)):
+    """
+    Current cash-out offer for an open single or accumulator of the current user.
+    Offers are revalued whenever the odds move; serving one reads only the bet's status.
+    """
+    quote = await get_cashout_quote(db, bet_id, current_user.id)
+    if quote is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No cash-out offer for this bet.")
+    return quote
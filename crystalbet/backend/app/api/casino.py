@@ -1,24 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from bson import ObjectId
-from typing import List
+from typing import List, Optional
 from services.casino import CasinoService
 from schemas.casino import CasinoGame, CasinoGameCreate, CasinoGameUpdate
 from db.mongodb import get_db  # Assuming you have a function to get the DB connection
+from utils.streaming import stream_documents, stream_mode
+from utils.pagination import PageParams, set_next_cursor
+from utils.fields import FieldSelection, sparse_fields
+from utils.serialization import FastPath
 
 router = APIRouter()
+fast_path = FastPath("casino")
 
 @router.get("/", response_model=List[CasinoGame])
-async def get_casino_games(db=Depends(get_db)):
-    """Get a list of casino games."""
+async def get_casino_games(
+    response: Response,
+    page: PageParams = Depends(),
+    db=Depends(get_db),
+    stream: Optional[str] = Depends(stream_mode),
+    fields: FieldSelection = Depends(sparse_fields(CasinoGame)),
+):
+    """Get a page of casino games (follow the X-Next-Cursor header for the next one)."""
     casino_service = CasinoService(db)  # Pass the database connection to the service
-    games = await casino_service.get_all_games()
+    if stream:
+        return stream_documents(casino_service.iter_games(projection=fields.projection), stream)
+    games, next_cursor = await casino_service.find_games(page, fields.projection)
+    set_next_cursor(response, next_cursor)
+    if fields.partial:
+        return fields.respond(games, headers=response.headers)
+    if fast_path.enabled:
+        return fast_path.respond(games, headers=response.headers)
     return games
 
 @router.get("/{game_id}", response_model=CasinoGame)
 async def get_casino_game(game_id: str, db=Depends(get_db)):
     """Get details of a specific casino game by ID."""
     casino_service = CasinoService(db)  # Pass the database connection to the service
-    game = await casino_service.get_game_by_id(game_id)
+    game = await casino_service.get_game(game_id)
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
     return game
@@ -3,11 +3,17 @@ from pydantic import BaseModel
 from pymongo.collection import Collection
 from typing import Any, Optional
 from datetime import datetime
-from db.mongodb import get_db
+from db.mongodb import collection_dependency
+from utils.cache import ReadThroughCache
+from core.config import settings
 from models.coupon import CouponModel  # Assuming a CouponModel schema exists in models
 
 router = APIRouter()
 
+# Coupon documents by code; expiry is checked on every read, so a cached coupon still expires on time
+coupon_cache = ReadThroughCache("coupons", ttl=settings.COUPON_CACHE_TTL_SECONDS)
+COUPON_PROJECTION = {"_id": 0, "expires_at": 1, "is_active": 1, "discount_amount": 1}
+
 class CouponCheckRequest(BaseModel):
     code: str
 
@@ -17,8 +23,8 @@ class CouponResponse(BaseModel):
     discount_amount: Optional[float] = None
     message: str
 
-def find_coupon_by_code(db: Collection, code: str) -> Optional[CouponResponse]:
-    coupon = db.find_one({"code": code})
+async def find_coupon_by_code(db: Collection, code: str) -> Optional[CouponResponse]:
+    coupon = await coupon_cache.get(code, lambda: db.find_one({"code": code}, COUPON_PROJECTION))
     if coupon:
         if coupon["expires_at"] < datetime.utcnow() or not coupon["is_active"]:
             return CouponResponse(
@@ -41,9 +47,9 @@ def find_coupon_by_code(db: Collection, code: str) -> Optional[CouponResponse]:
 @router.post("/check", response_model=CouponResponse, status_code=status.HTTP_200_OK)
 async def check_coupon(
     request: CouponCheckRequest,
-    db: Collection = Depends(lambda: get_db("coupons"))
+    db: Collection = Depends(collection_dependency("coupons"))
 ) -> Any:
-    coupon_response = find_coupon_by_code(db, request.code)
+    coupon_response = await find_coupon_by_code(db, request.code)
     if not coupon_response.is_valid:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -0,0 +1,101 @@
+# app/api/health.py
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from db.indexes import index_report, indexes_ready
+from db.mongodb import get_pool_stats
+from db.group_commit import group_commit_stats
+from utils.cache import cache_stats
+from core.hashing import hashing_stats
+from core.tokens import token_stats
+from services.cashout import cashout_engine
+from services.exposure import get_exposure_book
+from services.odds import odds_snapshot
+from services.outbox import outbox_stats
+from utils.throttle import throttle_stats
+
+router = APIRouter()
+
+@router.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe: fails while the index registry is not applied or a hot query plans as COLLSCAN.
+    """
+    content = {
+        "ready": indexes_ready(),
+        "indexes_applied": index_report["applied"],
+        "index_errors": index_report["errors"],
+        "collscans": index_report["collscans"],
+    }
+    if not content["ready"]:
+        return JSONResponse(status_code=503, content=content)
+    return content
+
+@router.get("/db")
+async def database_pool_stats():
+    """
+    Live connection pool stats of the shared Mongo client.
+    """
+    return get_pool_stats()
+
+@router.get("/cache")
+async def cache_metrics():
+    """
+    Per-namespace hit, miss, refill and eviction counters of the cache backend.
+    """
+    return await cache_stats()
+
+@router.get("/hashing")
+async def password_hashing_stats():
+    """
+    Password hashing pool: admission queue, rejections, queue-wait and hash-time.
+    """
+    return hashing_stats()
+
+@router.get("/tokens")
+async def token_engine_stats():
+    """
+    JWT engine: signing keys loaded, active kid, and verified-token cache hits and misses.
+    """
+    return token_stats()
+
+@router.get("/outbox")
+async def email_outbox_stats():
+    """
+    Email outbox depth per status and this worker's send, retry and connection counters.
+    """
+    return await outbox_stats()
+
+@router.get("/throttle")
+async def auth_throttle_stats():
+    """
+    Authentication throttling: tracked keys, allowed and throttled attempts, evictions.
+    """
+    return await throttle_stats()
+
+@router.get("/group-commit")
+async def group_commit_writer_stats():
+    """
+    Group-commit writers per collection: queued documents, writes in flight, batches and average batch size.
+    """
+    return group_commit_stats()
+
+@router.get("/odds")
+async def odds_snapshot_stats():
+    """
+    Odds snapshot: matches and selections held, last refresh, stale updates skipped, misses and rejected slips.
+    """
+    return odds_snapshot.stats()
+
+@router.get("/exposure")
+async def exposure_book_stats():
+    """
+    Liability book: open matches and outcomes, outcomes awaiting checkpoint, last bet covered.
+    """
+    return get_exposure_book().stats()
+
+@router.get("/cashout")
+async def cashout_engine_stats():
+    """
+    Cash-out engine: open bets and matches tracked, array capacity, revaluations and legs revalued.
+    """
+    return cashout_engine.stats()
@@ -1,12 +1,17 @@
 # app/api/match.py
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional
 from services.match import MatchService
 from motor.motor_asyncio import AsyncIOMotorCollection
-from db.mongodb import get_db, get_collection  # Import your database connection function
+from db.mongodb import collection_dependency  # Import your database connection function
+from utils.streaming import stream_documents, stream_mode
+from utils.pagination import PageParams, set_next_cursor
+from utils.fields import FieldSelection, sparse_fields
+from utils.serialization import FastPath
 
 router = APIRouter()
+fast_path = FastPath("matches")
 
 class MatchResponse(BaseModel):
     id: str = Field(..., alias="_id")
@@ -20,19 +25,38 @@ class MatchResponse(BaseModel):
         allow_population_by_field_name = True
 
 # Dependency function to create MatchService instance
-def get_match_service(collection: AsyncIOMotorCollection = Depends(get_collection)):
+def get_match_service(collection: AsyncIOMotorCollection = Depends(collection_dependency("matches"))):
     return MatchService(collection)
 
 @router.get("/", response_model=List[MatchResponse])
-async def get_all_matches(service: MatchService = Depends(get_match_service)):
-    matches = await service.get_all_matches()
+async def get_all_matches(
+    response: Response,
+    page: PageParams = Depends(),
+    service: MatchService = Depends(get_match_service),
+    stream: Optional[str] = Depends(stream_mode),
+    fields: FieldSelection = Depends(sparse_fields(MatchResponse)),
+):
+    if stream:
+        return stream_documents(service.iter_matches(projection=fields.projection), stream)
+    matches, next_cursor = await service.find_matches_cached(page, projection=fields.projection)
+    set_next_cursor(response, next_cursor)
+    if fields.partial:
+        return fields.respond(matches, headers=response.headers)
+    if fast_path.enabled:
+        return fast_path.respond(matches, headers=response.headers)
     return matches
 
 @router.get("/{match_id}", response_model=MatchResponse)
-async def get_match(match_id: str, service: MatchService = Depends(get_match_service)):
-    match = await service.get_match(match_id)
+async def get_match(
+    match_id: str,
+    service: MatchService = Depends(get_match_service),
+    fields: FieldSelection = Depends(sparse_fields(MatchResponse)),
+):
+    match = await service.find_match(match_id, fields.projection)
     if match is None:
         raise HTTPException(status_code=404, detail="Match not found")
+    if fields.partial:
+        return fields.respond(match)
     return match
 
 @router.post("/", response_model=MatchResponse)
@@ -55,8 +79,8 @@ async def delete_match(match_id: str, service: MatchService = Depends(get_match_
     return {"detail": "Match deleted successfully"}
 @router.get("/{match_id}/markets", response_model=List[dict])
 async def get_match_markets(match_id: str, service: MatchService = Depends(get_match_service)):
-    match = await service.get_match(match_id)
+    # Only the embedded markets are needed, skip the rest of the document
+    match = await service.find_match(match_id, {"markets": 1})
     if not match:
         raise HTTPException(status_code=404, detail="Match not found")
-    # Assuming markets are a field in the match document
     return match.get("markets", [])
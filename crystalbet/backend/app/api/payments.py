@@ -1,9 +1,13 @@
 # api/payments.py
 
-from fastapi import APIRouter, HTTPException, Depends, status
+import asyncio
+from fastapi import APIRouter, HTTPException, Depends, Header, Response, status
 from pydantic import BaseModel
 from typing import Optional
 from core.security import verify_access_token  # JWT authentication
+from models.user import UserInDB
+from services.auth import get_current_user
+from utils.idempotency import idempotent
 import stripe  # Replace with actual payment provider if different
 
 # Initialize the router
@@ -28,17 +32,38 @@ class PaymentVerificationRequest(BaseModel):
 
 
 @router.post("/initiate", summary="Initiate a new payment")
-async def initiate_payment(payment_request: PaymentInitiateRequest):
+async def initiate_payment(
+    payment_request: PaymentInitiateRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None),
+    current_user: UserInDB = Depends(get_current_user),
+):
     """
     Initiates a new payment using Stripe (or other provider).
+    Retries sent with the same Idempotency-Key return the original payment intent.
     """
+    # Keys are scoped to the user: two customers picking the same key get separate payments
+    scoped_key = f"{current_user.id}:{idempotency_key}" if idempotency_key else None
+    return await idempotent(
+        response,
+        f"payments.initiate:{current_user.id}",
+        idempotency_key,
+        payment_request,
+        lambda: _create_payment_intent(payment_request, scoped_key),
+    )
+
+async def _create_payment_intent(payment_request: PaymentInitiateRequest, idempotency_key: Optional[str]):
     try:
-        # Create a payment intent with Stripe (modify if using a different provider)
-        payment_intent = stripe.PaymentIntent.create(
+        # Create a payment intent with Stripe (modify if using a different provider).
+        # The key is passed on so Stripe also deduplicates a retry that reaches it twice.
+        # The client blocks, so it runs in a thread and the idempotency lease keeps being renewed.
+        payment_intent = await asyncio.to_thread(
+            stripe.PaymentIntent.create,
             amount=int(payment_request.amount * 100),  # Stripe requires cents for USD
             currency=payment_request.currency,
             description=payment_request.description,
             receipt_email=payment_request.customer_email,
+            idempotency_key=idempotency_key,
         )
 
         return {
@@ -1,18 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, Response, status
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 from pymongo.collection import Collection
 from bson import ObjectId
-from db.mongodb import get_db
+from db.mongodb import collection_dependency, iter_cursor
+from utils.streaming import stream_documents, stream_mode
+from utils.pagination import DESCENDING, PageParams, paginate, set_next_cursor
+from utils.fields import FieldSelection, sparse_fields
 from models.transaction import TransactionModel  # Assuming a TransactionModel schema exists in models
 from schemas.transaction import TransactionCreate, TransactionResponse  # Assuming schema files exist
 
 router = APIRouter()
 
 # Helper function to retrieve a single transaction by ID
-async def get_transaction_by_id(db: Collection, transaction_id: str) -> Optional[TransactionResponse]:
-    transaction = await db.find_one({"_id": ObjectId(transaction_id)})
+async def get_transaction_by_id(db: Collection, transaction_id: str, projection: Optional[dict] = None) -> Optional[TransactionResponse]:
+    transaction = await db.find_one({"_id": ObjectId(transaction_id)}, projection)
     if transaction:
         return TransactionResponse(**transaction)
     return None
@@ -21,7 +24,7 @@ async def get_transaction_by_id(db: Collection, transaction_id: str) -> Optional
 @router.post("/", response_model=TransactionResponse, status_code=status.HTTP_201_CREATED)
 async def create_transaction(
     transaction: TransactionCreate,
-    db: Collection = Depends(lambda: get_db("transactions"))
+    db: Collection = Depends(collection_dependency("transactions"))
 ) -> TransactionResponse:
     """
     Create a new transaction record.
@@ -37,29 +40,43 @@ async def create_transaction(
 # Endpoint to get a list of all transactions, with optional filtering by user ID
 @router.get("/", response_model=List[TransactionResponse], status_code=status.HTTP_200_OK)
 async def get_transactions(
+    response: Response,
     user_id: Optional[str] = None,
-    db: Collection = Depends(lambda: get_db("transactions"))
+    page: PageParams = Depends(),
+    stream: Optional[str] = Depends(stream_mode),
+    fields: FieldSelection = Depends(sparse_fields(TransactionResponse)),
+    db: Collection = Depends(collection_dependency("transactions"))
 ) -> List[TransactionResponse]:
     """
-    Retrieve all transactions, optionally filtered by user ID.
+    Retrieve transactions newest first, optionally filtered by user ID.
+    Pages are keyset-paginated: follow the X-Next-Cursor header.
+    Pass `stream=ndjson` or `stream=json` to stream the full result set.
     """
     query = {"user_id": user_id} if user_id else {}
-    transactions = db.find(query)
-    results = []
-    async for t in transactions:
-        results.append(TransactionResponse(**t))
-    return results
+    if stream:
+        return stream_documents(iter_cursor(db.find(query, fields.projection)), stream)
+    transactions, next_cursor = await paginate(db, query, page, sort_key="created_at", direction=DESCENDING, projection=fields.projection)
+    set_next_cursor(response, next_cursor)
+    if fields.partial:
+        return fields.respond(transactions, headers=response.headers)
+    return [TransactionResponse(**t) for t in transactions]
 
 # Endpoint to retrieve a specific transaction by ID
 @router.get("/{transaction_id}", response_model=TransactionResponse, status_code=status.HTTP_200_OK)
 async def get_transaction(
     transaction_id: str,
-    db: Collection = Depends(lambda: get_db("transactions"))
+    fields: FieldSelection = Depends(sparse_fields(TransactionResponse)),
+    db: Collection = Depends(collection_dependency("transactions"))
 ) -> TransactionResponse:
     """
     Get details of a specific transaction by ID.
     """
-    transaction = await get_transaction_by_id(db, transaction_id)
+    if fields.partial:
+        transaction = await db.find_one({"_id": ObjectId(transaction_id)}, fields.projection)
+        if not transaction:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found.")
+        return fields.respond(transaction)
+    transaction = await get_transaction_by_id(db, transaction_id, fields.projection)
     if not transaction:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Transaction not found.")
     return transaction
@@ -69,7 +86,7 @@ async def get_transaction(
 async def update_transaction(
     transaction_id: str,
     transaction: TransactionCreate,
-    db: Collection = Depends(lambda: get_db("transactions"))
+    db: Collection = Depends(collection_dependency("transactions"))
 ) -> TransactionResponse:
     """
     Update an existing transaction by ID.
@@ -85,7 +102,7 @@ async def update_transaction(
 @router.delete("/{transaction_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_transaction(
     transaction_id: str,
-    db: Collection = Depends(lambda: get_db("transactions"))
+    db: Collection = Depends(collection_dependency("transactions"))
 ) -> None:
     """
     Delete a transaction by ID.
@@ -1,11 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 from typing import List
 
 from core.security import get_current_user
 from schemas.user import UserUpdate, UserResponse, UserInDB
-from services.auth import get_user_by_email, update_user
-from db.mongodb import get_db
+from services.auth import revoke_user_tokens, update_user
+from db.mongodb import get_db, collection_dependency
+from services.session import revoke_user_sessions
+from services.user import get_cached_user, invalidate_principal, invalidate_user
+from utils.fields import FieldSelection, sparse_fields
+from utils.pagination import PageParams, paginate, set_next_cursor
 from pymongo.collection import Collection
+from db.codecs import to_object_id
 
 router = APIRouter(
     prefix="/users",
@@ -23,7 +28,7 @@ def get_user_profile(current_user: UserInDB = Depends(get_current_user)):
 
 
 @router.put("/profile", response_model=UserResponse)
-def update_user_profile(
+async def update_user_profile(
     user_update: UserUpdate,
     current_user: UserInDB = Depends(get_current_user),
     db: Collection = Depends(get_db)
@@ -35,7 +40,7 @@ def update_user_profile(
     """
     # Check if email is being updated and if the new email is already taken
     if user_update.email and user_update.email != current_user.email:
-        existing_user = get_user_by_email(db, email=user_update.email)
+        existing_user = await db["users"].find_one({"email": user_update.email}, {"_id": 1})
         if existing_user:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -43,41 +48,52 @@ def update_user_profile(
             )
 
     # Update the user information in MongoDB
-    updated_user = update_user(db, user_update=user_update, user_id=current_user.id)
+    updated_user = await update_user(db, user_update=user_update, user_id=current_user.id)
     return updated_user
 
 
 @router.get("/", response_model=List[UserResponse])
-def list_all_users(skip: int = 0, limit: int = 10, db: Collection = Depends(get_db)):
+async def list_all_users(
+    response: Response,
+    page: PageParams = Depends(),
+    fields: FieldSelection = Depends(sparse_fields(UserResponse)),
+    db: Collection = Depends(collection_dependency("users"))
+):
     """
-    List all users with pagination.
+    List all users with keyset pagination (follow the X-Next-Cursor header).
+    Only the fields of UserResponse (or the ?fields= subset) are fetched; password hashes stay in Mongo.
     Requires admin access.
     """
-    users = db.find().skip(skip).limit(limit)
-    return list(users)
+    users, next_cursor = await paginate(db, {}, page, projection=fields.projection)
+    set_next_cursor(response, next_cursor)
+    if fields.partial:
+        return fields.respond(users, headers=response.headers)
+    return users
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-def get_user_by_id(user_id: str, db: Collection = Depends(get_db)):
+async def get_user_by_id(user_id: str, fields: FieldSelection = Depends(sparse_fields(UserResponse))):
     """
     Get user details by user ID.
     Requires admin access.
     """
-    user = db.find_one({"_id": user_id})
-    if not user:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user = await get_cached_user(user_id, fields.projection)
+    if fields.partial:
+        return fields.respond(user)
     return user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_user(user_id: str, db: Collection = Depends(get_db)):
+async def delete_user(user_id: str, db: Collection = Depends(collection_dependency("users"))):
     """
     Delete a user by ID.
     Requires admin access.
     """
-    user = db.find_one({"_id": user_id})
-    if not user:
+    result = await db.delete_one({"_id": to_object_id(user_id)})
+    if result.deleted_count == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
-
-    db.delete_one({"_id": user_id})
+    await invalidate_user(user_id)
+    await invalidate_principal(user_id)
+    revoke_user_tokens(user_id)
+    await revoke_user_sessions(await get_db(), user_id)
     return {"detail": "User deleted successfully"}
@@ -0,0 +1,107 @@
+# benchmarks/bench_fast_path.py
+#
+# Request throughput of the match and casino listings with and without the
+# zero-validation fast path (FAST_PATH_ROUTERS). Runs in-process: the real routers
+# are mounted on a bare app and served through httpx's ASGI transport, with the
+# database handle replaced by in-memory collections so only the API layer is measured.
+#
+#   cd backend/app && python -m benchmarks.bench_fast_path [--requests 2000] [--limit 100] [--rounds 5]
+
+import argparse
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+import httpx
+from bson import ObjectId
+from fastapi import FastAPI
+from core.config import settings
+import db.mongodb as mongodb
+import api.casino as casino_api
+import api.match as match_api
+
+class _Cursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, count):
+        self.documents = self.documents[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return [dict(doc) for doc in self.documents[:length]]
+
+class _Collection:
+    """Serves the same pre-sorted documents for every find()."""
+    def __init__(self, documents):
+        self.documents = documents
+
+    def find(self, query=None, projection=None):
+        return _Cursor(self.documents)
+
+def build_documents(count: int):
+    kickoff = datetime(2026, 1, 1)
+    matches = [{
+        "_id": str(ObjectId()),
+        "team_a": f"Team {i}",
+        "team_b": f"Team {i + 1}",
+        "score": "0-0",
+        "status": "scheduled",
+        "start_time": (kickoff + timedelta(minutes=i)).isoformat(),
+    } for i in range(count)]
+    games = [{
+        "_id": str(ObjectId()),
+        "name": f"Game {i}",
+        "description": "Five reels, twenty lines",
+        "category": "slots",
+        "image_url": f"https://cdn.example.com/games/{i}.png",
+    } for i in range(count)]
+    return matches, games
+
+def build_app(matches, games) -> FastAPI:
+    app = FastAPI()
+    app.include_router(match_api.router, prefix="/api/match")
+    app.include_router(casino_api.router, prefix="/api/casino")
+    # Plain dict in place of the Motor database: get_db()/collection_dependency() resolve against it
+    mongodb.database = {"matches": _Collection(matches), "casino_games": _Collection(games)}
+    return app
+
+async def measure(client: httpx.AsyncClient, path: str, requests: int) -> float:
+    response = await client.get(path)
+    response.raise_for_status()
+    start = time.perf_counter()
+    for _ in range(requests):
+        await client.get(path)
+    return requests / (time.perf_counter() - start)
+
+async def run(requests: int, limit: int, rounds: int):
+    matches, games = build_documents(limit + 1)
+    transport = httpx.ASGITransport(app=build_app(matches, games))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"{requests} requests x {rounds} rounds per row (best round), {limit} items per page")
+        print(f"{'listing':<16}{'validated (req/s)':>20}{'fast path (req/s)':>20}{'speedup':>10}")
+        for name, path in (("matches", f"/api/match/?limit={limit}"), ("casino", f"/api/casino/?limit={limit}")):
+            validated = fast = 0.0
+            # Alternate the two modes so drift on a shared machine hits both equally
+            for _ in range(rounds):
+                settings.FAST_PATH_ROUTERS = ""
+                validated = max(validated, await measure(client, path, requests))
+                settings.FAST_PATH_ROUTERS = name
+                fast = max(fast, await measure(client, path, requests))
+            print(f"{name:<16}{validated:>20,.0f}{fast:>20,.0f}{fast / validated:>9.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    # Per-request client logging would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    asyncio.run(run(args.requests, args.limit, args.rounds))
+
+if __name__ == "__main__":
+    main()
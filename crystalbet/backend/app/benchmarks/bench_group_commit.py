@@ -0,0 +1,108 @@
+# benchmarks/bench_group_commit.py
+#
+# Bets placed per second through BetService.book_bet with and without the group-commit
+# writer (db/group_commit.py), with many concurrent clients as at kickoff.
+#
+# Runs against a simulated server by default: every write costs a network round trip,
+# plus a commit and a per-document cost that writes take in turn (as journal commits do).
+# Pass --uri to run against a real MongoDB instead (documents go to a scratch database
+# that is dropped afterwards).
+#
+#   cd backend/app && python -m benchmarks.bench_group_commit [--clients 500] [--bets 20000] [--uri mongodb://localhost:27017]
+
+import argparse
+import asyncio
+import time
+from bson import ObjectId
+from core.config import settings
+from db.group_commit import close_group_writers, group_commit_stats
+from schemas.bet import BetCreate
+from services.bet import BetService
+
+class _InsertResult:
+    def __init__(self, ids):
+        self.inserted_ids = ids
+        self.inserted_id = ids[0]
+
+class _SimulatedCollection:
+    """Insert-only collection with round-trip, commit and per-document costs."""
+    def __init__(self, name: str, server: dict, rtt: float, commit: float, per_doc: float):
+        self.name = name
+        self.server = server
+        self.rtt = rtt
+        self.commit = commit
+        self.per_doc = per_doc
+
+    async def _write(self, docs):
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        # Writes queue for the server's commit lane; the reply arrives half a round trip after
+        # the commit. Modelled on a clock rather than with a lock so timer granularity does not
+        # inflate the per-write cost.
+        arrival = time.perf_counter() + self.rtt / 2
+        done = max(arrival, self.server["free_at"]) + self.commit + self.per_doc * len(docs)
+        self.server["free_at"] = done
+        await asyncio.sleep(done + self.rtt / 2 - time.perf_counter())
+        return _InsertResult([doc["_id"] for doc in docs])
+
+    async def insert_many(self, docs, ordered=True):
+        return await self._write(docs)
+
+    async def insert_one(self, doc):
+        return await self._write([doc])
+
+async def run(db, clients: int, bets: int, group_commit: bool) -> float:
+    settings.BET_GROUP_COMMIT = group_commit
+    service = BetService(db)
+    remaining = iter(range(bets))
+
+    async def client():
+        for i in remaining:
+            bet = BetCreate(match_id=f"match-{i % 300}", selection=("home", "draw", "away")[i % 3], odds=1.5 + (i % 20) / 10, stake=10.0)
+            await service.book_bet(bet, f"user-{i % 5000}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    stats = group_commit_stats()
+    await close_group_writers()
+    if group_commit:
+        print(f"    bets writer: {stats['bets']['batches']} batches, average {stats['bets']['average_batch']} documents")
+    return bets / elapsed
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=500, help="concurrent placements")
+    parser.add_argument("--bets", type=int, default=20000)
+    parser.add_argument("--rtt-ms", type=float, default=0.5, help="simulated network round trip")
+    parser.add_argument("--commit-us", type=float, default=100.0, help="simulated per-write commit cost")
+    parser.add_argument("--doc-us", type=float, default=10.0, help="simulated per-document cost")
+    parser.add_argument("--uri", help="run against this MongoDB instead of the simulation")
+    args = parser.parse_args()
+
+    settings.EXPOSURE_ENABLED = False
+    settings.ODDS_CHECK_ENABLED = False
+    settings.CASHOUT_ENABLED = False
+    if args.uri:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.uri, maxPoolSize=100)
+        db = client["bench_group_commit"]
+    else:
+        server = {"free_at": 0.0}
+        db = {
+            name: _SimulatedCollection(name, server, args.rtt_ms / 1000, args.commit_us / 1e6, args.doc_us / 1e6)
+            for name in ("bets", "bet_slips")
+        }
+
+    print(f"{args.bets} bets from {args.clients} concurrent clients ({'MongoDB' if args.uri else 'simulated server'})")
+    for group_commit in (False, True):
+        label = "group commit" if group_commit else "insert per request"
+        rate = await run(db, args.clients, args.bets, group_commit)
+        print(f"  {label:<20} {rate:>10,.0f} bets/s")
+
+    if args.uri:
+        await client.drop_database("bench_group_commit")
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+# benchmarks/bench_objectid_codec.py
+#
+# Compare the old per-document `_id` conversion with the codec-level ObjectId decoder.
+# Runs without a server: a synthetic 100k-document result set is BSON-encoded once and
+# decoded the same way the driver decodes server batches.
+#
+#   cd backend/app && python -m benchmarks.bench_objectid_codec [--docs 100000] [--repeat 5]
+
+import argparse
+import time
+import tracemalloc
+from datetime import datetime
+from bson import ObjectId, decode_all, encode
+from bson.codec_options import DEFAULT_CODEC_OPTIONS
+from db.codecs import CODEC_OPTIONS
+
+def build_batch(count: int) -> bytes:
+    """Encode `count` bet-like documents into one BSON buffer."""
+    now = datetime.utcnow()
+    return b"".join(
+        encode({
+            "_id": ObjectId(),
+            "user_id": f"user-{i % 5000}",
+            "match_id": f"match-{i % 300}",
+            "bet_amount": 10.0 + i % 50,
+            "odds": 1.5 + (i % 20) / 10,
+            "is_live": i % 7 == 0,
+            "bet_status": "pending",
+            "created_at": now,
+        })
+        for i in range(count)
+    )
+
+def copy_per_document(data: bytes) -> list:
+    """Previous services/database.py pattern: decode, then copy every row into a new dict."""
+    return [{**doc, "_id": str(doc["_id"])} for doc in decode_all(data, DEFAULT_CODEC_OPTIONS)]
+
+def mutate_per_document(data: bytes) -> list:
+    """Previous db/mongodb.find_many pattern: decode, then rewrite `_id` in place."""
+    documents = decode_all(data, DEFAULT_CODEC_OPTIONS)
+    for doc in documents:
+        doc["_id"] = str(doc["_id"])
+    return documents
+
+def codec(data: bytes) -> list:
+    """Current pattern: the decoder emits string ids directly."""
+    return decode_all(data, CODEC_OPTIONS)
+
+def measure(fn, data: bytes, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(data)
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = build_batch(args.docs)
+    assert codec(data)[0]["_id"] == copy_per_document(data)[0]["_id"]
+
+    print(f"{args.docs} documents, best of {args.repeat}")
+    print(f"{'strategy':<22}{'time (ms)':>12}{'docs/s':>14}{'peak alloc (MB)':>18}")
+    for name, fn in (("copy per document", copy_per_document), ("mutate per document", mutate_per_document), ("codec (ObjectIdAsStr)", codec)):
+        elapsed, peak = measure(fn, data, args.repeat)
+        print(f"{name:<22}{elapsed * 1000:>12.1f}{args.docs / elapsed:>14,.0f}{peak / 1e6:>18.1f}")
+
+if __name__ == "__main__":
+    main()
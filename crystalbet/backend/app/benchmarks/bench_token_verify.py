@@ -0,0 +1,66 @@
+# benchmarks/bench_token_verify.py
+#
+# Access-token verifications per second on one core: the previous pattern
+# (jwt.decode with the raw secret string on every request) against core/tokens.py,
+# once with every token distinct (signature checked each time) and once with the
+# verified-token cache serving repeat tokens, which is what a logged-in client sends.
+#
+#   cd backend/app && python -m benchmarks.bench_token_verify [--tokens 1000] [--verifications 50000] [--rounds 5]
+
+import argparse
+import time
+from datetime import timedelta
+from jose import jwt
+from core.tokens import TokenEngine
+
+SECRET = "benchmark-secret-key"
+ALGORITHM = "HS256"
+
+def legacy(tokens: list, count: int):
+    for i in range(count):
+        jwt.decode(tokens[i % len(tokens)], SECRET, algorithms=[ALGORITHM])
+
+def measure(fn, tokens: list, count: int, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn(tokens, count)
+        best = min(best, time.perf_counter() - start)
+    return count / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=1000, help="distinct tokens in the working set")
+    parser.add_argument("--verifications", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    # A second key in the ring, as during a rotation
+    keys = {"default": SECRET, "next": "benchmark-next-key"}
+    signer = TokenEngine(keys, "default", ALGORITHM, cache_size=0)
+    tokens = [signer.encode({"sub": f"user-{i}", "role": "user", "active": True}, timedelta(hours=1)) for i in range(args.tokens)]
+
+    uncached = TokenEngine(keys, "default", ALGORITHM, cache_size=0)
+    cached = TokenEngine(keys, "default", ALGORITHM, cache_size=args.tokens)
+
+    def engine_decode(engine):
+        def run(tokens, count):
+            for i in range(count):
+                engine.decode(tokens[i % len(tokens)])
+        return run
+
+    rows = (
+        ("jwt.decode(secret)", legacy),
+        ("engine, no cache", engine_decode(uncached)),
+        ("engine, cached", engine_decode(cached)),
+    )
+    print(f"{args.verifications} verifications x {args.rounds} rounds (best round), {args.tokens} distinct tokens, 1 core")
+    print(f"{'verifier':<22}{'verifications/s':>18}{'vs legacy':>12}")
+    baseline = None
+    for name, fn in rows:
+        rate = measure(fn, tokens, args.verifications, args.rounds)
+        baseline = baseline or rate
+        print(f"{name:<22}{rate:>18,.0f}{rate / baseline:>11.2f}x")
+
+if __name__ == "__main__":
+    main()
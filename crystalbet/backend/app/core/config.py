@@ -2,13 +2,12 @@ from pydantic_settings import BaseSettings, SettingsConfigDict  # Adjust import
 from dotenv import load_dotenv
 import logging
 import bcrypt
-import motor.motor_asyncio
 from jose import JWTError, jwt  # JWT handling for security
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from schemas.auth import Token  # Assuming you have a Token schema for decoding JWTs
-from typing import Optional
+from typing import Dict, Optional
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
 
@@ -36,12 +35,98 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int
+    RESET_TOKEN_EXPIRE_MINUTES: int = 60
+    VERIFICATION_TOKEN_EXPIRE_HOURS: int = 48
+    JWT_KEYS: Dict[str, str] = {}  # kid -> secret, e.g. {"2026-10": "..."}; SECRET_KEY is always the "default" kid
+    JWT_ACTIVE_KID: str = ""  # kid used to sign new tokens, empty = "default"
+    JWT_CACHE_SIZE: int = 10000  # Verified tokens remembered until they expire
+    REFRESH_TOKEN_EXPIRE_DAYS: int = 14  # Lifetime of a login session, refreshes do not extend it
+    
+    # Email settings
+    FRONTEND_URL: str = "http://localhost:8000"  # Base of the links in emails
+    SMTP_SERVER: str = "smtp.example.com"
+    SMTP_PORT: int = 587
+    SMTP_USERNAME: str = "your_email@example.com"
+    SMTP_PASSWORD: str = "your_password"  # Empty = no AUTH (local relay, aiosmtpd)
+    SMTP_START_TLS: bool = True
+    SMTP_TIMEOUT_SECONDS: float = 30.0
+    SMTP_IDLE_SECONDS: float = 60.0  # The outbox closes its SMTP connection after this long without mail
+    MAIL_FROM: str = ""  # Sender address, empty = SMTP_USERNAME
+    OUTBOX_WORKER_ENABLED: bool = True  # Run the outbox sender in this process
+    OUTBOX_BATCH_SIZE: int = 50  # Messages claimed per batch
+    OUTBOX_POLL_SECONDS: float = 2.0  # Idle wait between outbox polls (enqueues in this process wake it at once)
+    OUTBOX_LEASE_SECONDS: float = 120.0  # A claimed message is retried after this if its sender died (keep above 2 x SMTP_TIMEOUT_SECONDS)
+    OUTBOX_MAX_ATTEMPTS: int = 8
+    OUTBOX_BACKOFF_SECONDS: float = 5.0  # First retry delay, doubled per attempt
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 900.0
+    CAMPAIGN_CONNECTIONS: int = 4  # SMTP connections per running campaign
+    CAMPAIGN_RATE_PER_SECOND: float = 50.0  # Messages per second across all connections of a campaign, 0 = unlimited
+    CAMPAIGN_CHECKPOINT_EVERY: int = 500  # Messages between progress checkpoints
+    CAMPAIGN_LEASE_SECONDS: float = 60.0  # A running campaign without a heartbeat for this long can be resumed elsewhere
+    SETTLEMENT_BATCH_SIZE: int = 1000  # Bets settled per batch (one bulk write and one checkpoint each)
+    SETTLEMENT_TRANSACTIONS: bool = True  # Commit each batch in a transaction (needs a replica set)
+    SETTLEMENT_LEASE_SECONDS: float = 300.0  # A running settlement without a heartbeat for this long can be resumed elsewhere
+    SLIP_MAX_SELECTIONS: int = 20
+    BET_GROUP_COMMIT: bool = False  # Batch bet and slip inserts across requests (db/group_commit.py)
+    GROUP_COMMIT_MAX_DOCS: int = 500  # Documents that trigger a group write at once
+    GROUP_COMMIT_MAX_DELAY_MS: float = 5.0  # Longest a document waits for its group write
+    IDEMPOTENCY_TTL_HOURS: float = 24.0  # How long a stored response answers repeats of its key
+    IDEMPOTENCY_CACHE_SECONDS: float = 300.0  # Front cache for stored responses
+    IDEMPOTENCY_LOCK_SECONDS: float = 30.0  # A claimed key whose request has not finished by then can be taken over
+    IDEMPOTENCY_WAIT_SECONDS: float = 10.0  # How long a repeat waits for the request in flight before 409
+    ODDS_CHECK_ENABLED: bool = True  # Check booked odds against the in-process odds snapshot
+    ODDS_TOLERANCE: float = 0.0  # Accept odds up to this fraction above the current price (0.02 = 2%)
+    ODDS_REFRESH_SECONDS: float = 1.0  # Poll for odds changed by other workers
+    CASHOUT_ENABLED: bool = True  # Revalue open singles and accumulators on every odds change
+    CASHOUT_MARGIN: float = 0.05  # Kept back from the fair value of a cash-out offer
+    CASHOUT_PRUNE_SECONDS: float = 300.0  # Interval between checks for finished matches no open bet still waits on
+    EXPOSURE_ENABLED: bool = True  # Keep the liability book in this process (rebuilt at startup)
+    EXPOSURE_CHECKPOINT_SECONDS: float = 30.0  # Interval between writes of changed outcomes to `exposure`
+    EXPOSURE_FOLD_LAG_SECONDS: float = 5.0  # Bets are folded into the book once their _id is this old (inserts in flight)
+    EXPOSURE_TRANSACTIONS: bool = True  # Write the outcomes and their watermark in one transaction (needs a replica set)
+    SLIP_MAX_LINES: int = 5000  # Lines a slip may cover (4-folds over 20 selections are 4845 lines)
     
     # MongoDB settings
     MONGO_URI: str
     DATABASE_NAME: str
     MAX_POOL_SIZE: int
     MIN_POOL_SIZE: int
+    WAIT_QUEUE_TIMEOUT_MS: int = 2000  # Fail fast with a timeout instead of queueing forever on a starved pool
+    SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    CONNECT_TIMEOUT_MS: int = 5000
+    SOCKET_TIMEOUT_MS: int = 20000
+    MAX_IDLE_TIME_MS: int = 300000
+    MONGO_APP_NAME: str = "crystalbet-api"
+    INDEX_VERIFY_ON_STARTUP: bool = True
+    STREAM_BATCH_SIZE: int = 500  # Documents fetched per cursor round-trip when streaming listings
+    FAST_PATH_ROUTERS: str = "matches,casino"  # Routers that serialize trusted DB output without response_model validation
+    MATCH_CACHE_LIVE_TTL_SECONDS: float = 2.0  # Live listings and in-play matches
+    MATCH_CACHE_PREMATCH_TTL_SECONDS: float = 60.0  # Prematch listings and matches
+    HASH_POOL_SIZE: int = 0  # bcrypt worker processes, 0 = one per CPU core
+    HASH_QUEUE_LIMIT: int = 0  # Hash calls queued or running before new ones get 503, 0 = 8 per worker
+    HASH_TARGET_MS: float = 250.0  # bcrypt cost is calibrated so one hash takes about this long here
+    HASH_ROUNDS: int = 0  # Fixed bcrypt cost instead of calibrating, 0 = calibrate
+    HASH_MIN_ROUNDS: int = 10  # Security floor, weaker stored hashes are always upgraded
+    HASH_MAX_ROUNDS: int = 16
+    PRINCIPAL_CACHE_TTL_SECONDS: float = 30.0  # User documents behind authenticated requests
+    CASINO_CACHE_TTL_SECONDS: float = 300.0
+    COUPON_CACHE_TTL_SECONDS: float = 60.0
+    USER_CACHE_TTL_SECONDS: float = 30.0
+    CONTENT_CACHE_TTL_SECONDS: float = 300.0
+    CACHE_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (shared by all workers)
+    REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_CODEC: str = "msgpack"  # Value encoding for the redis backend: "msgpack" or "orjson"
+    CACHE_KEY_PREFIX: str = "crystalbet:"
+    CACHE_MAX_ENTRIES: int = 10000  # Memory backend capacity, shared by all namespaces
+    THROTTLE_ENABLED: bool = True  # Token buckets on /token, /login, /register, /password-reset-request
+    THROTTLE_BACKEND: str = "memory"  # "memory" (per worker) or "redis" (REDIS_URL, shared by all workers)
+    THROTTLE_IP_BURST: int = 20  # Attempts a client IP can make at once
+    THROTTLE_IP_PER_MINUTE: float = 30.0  # Sustained attempts per client IP
+    THROTTLE_ACCOUNT_BURST: int = 5  # Attempts against one account at once, from any IP
+    THROTTLE_ACCOUNT_PER_MINUTE: float = 5.0
+    THROTTLE_SHARDS: int = 64
+    THROTTLE_MAX_KEYS: int = 100000  # Memory backend capacity across shards
+    THROTTLE_TRUST_FORWARDED: bool = False  # Take the client IP from X-Forwarded-For (only behind a trusted proxy)
     
     # Environment setting
     ENVIRONMENT: str
@@ -62,16 +147,11 @@ logger.info(f"MONGO_URI set to: {settings.MONGO_URI}")
 logger.info(f"DATABASE_NAME set to: {settings.DATABASE_NAME}")
 logger.info(f"MAX_POOL_SIZE set to: {settings.MAX_POOL_SIZE}")
 logger.info(f"MIN_POOL_SIZE set to: {settings.MIN_POOL_SIZE}")
+logger.info(f"WAIT_QUEUE_TIMEOUT_MS set to: {settings.WAIT_QUEUE_TIMEOUT_MS}")
 logger.info(f"ENVIRONMENT set to: {settings.ENVIRONMENT}")
 logger.info("Configuration loaded successfully")
 
-# MongoDB setup using the settings (Initialize MongoDB client once)
-client = motor.motor_asyncio.AsyncIOMotorClient(
-    settings.MONGO_URI,
-    maxPoolSize=settings.MAX_POOL_SIZE,
-    minPoolSize=settings.MIN_POOL_SIZE
-)
-DATABASE_NAME = client[settings.DATABASE_NAME]
+# The MongoDB client is created by db.mongodb.init_db from these settings
 
 # CORS Middleware setup
 app = FastAPI()
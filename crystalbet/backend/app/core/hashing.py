@@ -0,0 +1,266 @@
+# core/hashing.py
+#
+# bcrypt runs for ~250 ms per call. Called inline from an async handler it blocks the
+# event loop for that long, so a login storm freezes every other request on the worker.
+# All password hashing and verification goes through a process pool instead, behind a
+# bounded admission queue that sheds load with 503 once it is full.
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional
+import bcrypt
+from fastapi import HTTPException, status
+
+logger = logging.getLogger(__name__)
+
+# Worker-side functions. They run in the pool processes and must stay importable
+# without the app settings; they return their own start/end times for the metrics.
+
+def _hash(password: bytes, rounds: Optional[int]) -> tuple:
+    started = time.time()
+    salt = bcrypt.gensalt(rounds) if rounds else bcrypt.gensalt()
+    hashed = bcrypt.hashpw(password, salt)
+    return hashed.decode("utf-8"), started, time.time()
+
+def _verify(password: bytes, hashed: bytes) -> tuple:
+    started = time.time()
+    try:
+        ok = bcrypt.checkpw(password, hashed)
+    except ValueError:
+        # Malformed or non-bcrypt hash in the database
+        ok = False
+    return ok, started, time.time()
+
+def _calibrate(target_ms: float, min_rounds: int, max_rounds: int) -> tuple:
+    """Pick the bcrypt cost whose hash time is closest to target_ms on this hardware."""
+    started = time.time()
+    probe_started = time.perf_counter()
+    bcrypt.hashpw(b"calibration-probe", bcrypt.gensalt(min_rounds))
+    probe_ms = (time.perf_counter() - probe_started) * 1000
+    # Each extra round doubles the work
+    rounds = min_rounds + round(math.log2(max(target_ms / probe_ms, 1.0)))
+    return (min(max(rounds, min_rounds), max_rounds), probe_ms), started, time.time()
+
+_BCRYPT_HASH = re.compile(r"^\$2[abxy]?\$(\d{2})\$")
+
+# Cost parameter stored in a bcrypt hash ("$2b$12$..." -> 12), None for anything else
+def bcrypt_rounds(hashed: str) -> Optional[int]:
+    match = _BCRYPT_HASH.match(hashed or "")
+    return int(match.group(1)) if match else None
+
+class HashPolicy:
+    """
+    bcrypt cost for new hashes, and which stored hashes should be upgraded or downgraded.
+    The cost travels inside every bcrypt hash, so old hashes keep verifying after a policy change.
+    """
+    def __init__(self, rounds: int, min_rounds: int, max_rounds: int, target_ms: float, probe_ms: Optional[float] = None, source: str = "calibrated"):
+        self.rounds = rounds
+        self.min_rounds = min_rounds
+        self.max_rounds = max_rounds
+        self.target_ms = target_ms
+        self.probe_ms = probe_ms
+        self.source = source
+
+    def estimated_ms(self, rounds: int) -> Optional[float]:
+        if self.probe_ms is None:
+            return None
+        return self.probe_ms * 2 ** (rounds - self.min_rounds)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        rounds = bcrypt_rounds(hashed)
+        if rounds is None or rounds < self.min_rounds or rounds > self.max_rounds:
+            return True
+        if self.source == "configured":
+            return rounds != self.rounds
+        # Accept anything within 2x of the target either way. Workers calibrate independently and
+        # may land one round apart; the band keeps them from rehashing each other's hashes forever.
+        estimated = self.estimated_ms(rounds)
+        return not (self.target_ms / 2 <= estimated <= self.target_ms * 2)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "source": self.source,
+            "target_ms": self.target_ms,
+            "min_rounds": self.min_rounds,
+            "max_rounds": self.max_rounds,
+            "estimated_ms": round(self.estimated_ms(self.rounds), 1) if self.probe_ms else None,
+        }
+
+class _Timing:
+    """Count, total and max of one latency series, in seconds."""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        seconds = max(seconds, 0.0)
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count * 1000, 2) if self.count else None,
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+class PasswordHasher:
+    """
+    Process pool for bcrypt with bounded admission.
+    At most `max_pending` calls are queued or running; further calls fail fast with 503.
+    """
+    def __init__(self, workers: int, max_pending: int, policy: Optional[HashPolicy] = None, calibration: Optional[tuple] = None):
+        self.workers = workers
+        self.max_pending = max_pending
+        # Either a fixed policy, or (target_ms, min_rounds, max_rounds) to calibrate on first use
+        self.policy = policy
+        self._calibration = calibration
+        self._calibrating: Optional[asyncio.Future] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.errors = 0
+        self.queue_wait = _Timing()
+        self.hash_time = _Timing()
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: forking a process that already runs an event loop and driver threads is unsafe
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    async def _run(self, fn: Callable, *args: Any) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is busy, please retry shortly.",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        submitted = time.time()
+        try:
+            result, started, finished = await asyncio.get_running_loop().run_in_executor(self._pool(), fn, *args)
+        except HTTPException:
+            raise
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Password hashing failed: {e}")
+            raise
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.queue_wait.observe(started - submitted)
+        self.hash_time.observe(finished - started)
+        return result
+
+    async def calibrate(self) -> HashPolicy:
+        """
+        Measure bcrypt on this machine (in a pool process) and derive the policy. Runs once.
+        """
+        if self.policy is not None:
+            return self.policy
+        if self._calibrating is None:
+            self._calibrating = asyncio.ensure_future(self._run(_calibrate, *self._calibration))
+        try:
+            rounds, probe_ms = await asyncio.shield(self._calibrating)
+        except Exception:
+            self._calibrating = None
+            raise
+        if self.policy is None:
+            target_ms, min_rounds, max_rounds = self._calibration
+            self.policy = HashPolicy(rounds, min_rounds, max_rounds, target_ms, probe_ms)
+            logger.info(f"bcrypt cost calibrated to {rounds} (probe {probe_ms:.1f} ms at cost {min_rounds}, target {target_ms} ms)")
+        return self.policy
+
+    async def hash(self, password: str, rounds: Optional[int] = None) -> str:
+        if rounds is None:
+            rounds = (await self.calibrate()).rounds
+        return await self._run(_hash, password.encode("utf-8"), rounds)
+
+    async def needs_rehash(self, hashed: str) -> bool:
+        return (await self.calibrate()).needs_rehash(hashed)
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        if not hashed:
+            return False
+        return await self._run(_verify, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy.describe() if self.policy else None,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "queue_wait": self.queue_wait.snapshot(),
+            "hash_time": self.hash_time.snapshot(),
+        }
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+_hasher: Optional[PasswordHasher] = None
+
+def get_hasher() -> PasswordHasher:
+    """
+    The process-wide hasher, sized from settings on first use (HASH_POOL_SIZE=0 means one worker per core).
+    """
+    global _hasher
+    if _hasher is None:
+        # Imported here so pool processes never load the app settings
+        from core.config import settings
+        workers = settings.HASH_POOL_SIZE or os.cpu_count() or 1
+        bounds = (settings.HASH_MIN_ROUNDS, settings.HASH_MAX_ROUNDS)
+        if settings.HASH_ROUNDS:
+            policy = HashPolicy(settings.HASH_ROUNDS, *bounds, settings.HASH_TARGET_MS, source="configured")
+            _hasher = PasswordHasher(workers, settings.HASH_QUEUE_LIMIT or workers * 8, policy=policy)
+        else:
+            _hasher = PasswordHasher(workers, settings.HASH_QUEUE_LIMIT or workers * 8, calibration=(settings.HASH_TARGET_MS, *bounds))
+    return _hasher
+
+# Hash a password without blocking the event loop
+async def hash_password(password: str) -> str:
+    return await get_hasher().hash(password)
+
+# Verify a password without blocking the event loop
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await get_hasher().verify(plain_password, hashed_password)
+
+# Whether a stored hash was made under a different policy and should be replaced on next login
+async def needs_rehash(hashed_password: str) -> bool:
+    return await get_hasher().needs_rehash(hashed_password)
+
+# Calibrate at startup so the first login does not pay for it
+async def calibrate_hash_policy() -> HashPolicy:
+    return await get_hasher().calibrate()
+
+def hashing_stats() -> Dict[str, Any]:
+    return get_hasher().stats()
+
+def shutdown_hasher() -> None:
+    global _hasher
+    if _hasher is not None:
+        _hasher.shutdown()
+        _hasher = None
@@ -2,39 +2,30 @@ from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-import bcrypt
+from jose import JWTError
+from core import tokens
 from core.config import settings  # Assuming your settings are defined in this module
 from schemas.token import Token  # Assumes Token schema exists
+from core.hashing import hash_password, verify_password  # Re-exported: process pool + calibrated cost policy
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 # Function to create access tokens
+# (iat, added by the token engine, lets the revocation list reject tokens issued before a role or password change)
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    return tokens.encode_token(data, expires_delta)
 
 # Function to create a reset access token
 def create_reset_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=settings.RESET_TOKEN_EXPIRE_MINUTES)  # Shorter expiration time
-    to_encode.update({"exp": expire, "reset_password": True})  # Add a claim to indicate it's a reset token
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
+    to_encode["reset_password"] = True  # Add a claim to indicate it's a reset token
+    # Shorter expiration time
+    return tokens.encode_token(to_encode, expires_delta or timedelta(minutes=settings.RESET_TOKEN_EXPIRE_MINUTES))
 
 # Function to verify access tokens
 def verify_access_token(token: str, credentials_exception):
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = tokens.decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -46,7 +37,7 @@ def verify_access_token(token: str, credentials_exception):
 # Function to verify reset access token
 def verify_reset_access_token(token: str, credentials_exception):
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = tokens.decode_token(token)
         if not payload.get("reset_password"):  # Check the specific claim
             raise credentials_exception
         username: str = payload.get("sub")
@@ -66,19 +57,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     )
     return verify_access_token(token, credentials_exception)
 
-# Function to hash a password
-def hash_password(password: str) -> str:
-    # Hash the password with bcrypt
-    salt = bcrypt.gensalt()
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed_password.decode('utf-8')  # Return the hashed password as a string
-
-# Function to verify a password
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 def decode_token(token: str):
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = tokens.decode_token(token)
         return payload
     except JWTError:
         raise HTTPException(
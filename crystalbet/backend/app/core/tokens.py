@@ -0,0 +1,121 @@
+# core/tokens.py
+#
+# The one JWT engine. core/security.py, utils/jwt.py, utils/token.py and services/token.py
+# all delegate here, so every token is signed and checked with the same keys and defaults.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+from jose import JWTError, jwk, jws, jwt
+from jose.exceptions import JWSError
+from core.config import settings
+
+DEFAULT_KID = "default"
+
+class TokenEngine:
+    """
+    Signs and verifies JWTs with key objects built once at startup.
+
+    Keys are selected by the `kid` header, so a new signing key can be rolled out while
+    tokens signed with the previous one stay valid until they expire. Tokens without a
+    `kid` (issued before rotation existed) are checked against the default key.
+    Verified tokens are remembered in an LRU keyed by their SHA-256 digest until `exp`.
+    """
+    def __init__(self, keys: Dict[str, str], active_kid: str, algorithm: str, cache_size: int = 10000):
+        if active_kid not in keys:
+            raise ValueError(f"JWT_ACTIVE_KID '{active_kid}' is not in JWT_KEYS")
+        self.algorithm = algorithm
+        self.active_kid = active_kid
+        # Built once: jose would otherwise try json.loads and jwk.construct on the secret per call
+        self._keys = {kid: jwk.construct(secret, algorithm) for kid, secret in keys.items()}
+        self._headers = {"kid": active_kid}
+        self.cache_size = cache_size
+        self._verified: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def encode(self, claims: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+        """
+        Sign `claims` with the active key, adding exp (unless given) and iat.
+        """
+        now = datetime.utcnow()
+        to_encode = dict(claims)
+        to_encode.setdefault("exp", now + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)))
+        to_encode.setdefault("iat", now)
+        return jwt.encode(to_encode, self._keys[self.active_kid], algorithm=self.algorithm, headers=self._headers)
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """
+        Verify signature and expiry and return the claims. Raises JWTError (ExpiredSignatureError on expiry).
+        The returned dict is shared with the cache and must not be mutated.
+        """
+        if not token:
+            raise JWTError("Missing token")
+        digest = hashlib.sha256(token.encode("utf-8")).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._verified.get(digest)
+            if entry is not None:
+                if entry[0] > now:
+                    self._verified.move_to_end(digest)
+                    self.hits += 1
+                    return entry[1]
+                del self._verified[digest]
+            self.misses += 1
+
+        try:
+            kid = jws.get_unverified_header(token).get("kid", DEFAULT_KID)
+        except JWSError as e:
+            raise JWTError(str(e))
+        key = self._keys.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown signing key '{kid}'")
+        claims = jwt.decode(token, key, algorithms=[self.algorithm])
+
+        exp = claims.get("exp")
+        if exp is not None:
+            with self._lock:
+                self._verified[digest] = (float(exp), claims)
+                while len(self._verified) > self.cache_size:
+                    self._verified.popitem(last=False)
+        return claims
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active_kid": self.active_kid,
+            "kids": sorted(self._keys),
+            "algorithm": self.algorithm,
+            "cached": len(self._verified),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+def _build_engine() -> TokenEngine:
+    # Without JWT_KEYS the single SECRET_KEY becomes the default key, so existing tokens keep working
+    keys = {DEFAULT_KID: settings.SECRET_KEY, **settings.JWT_KEYS}
+    active_kid = settings.JWT_ACTIVE_KID or DEFAULT_KID
+    return TokenEngine(keys, active_kid, settings.ALGORITHM, settings.JWT_CACHE_SIZE)
+
+engine = _build_engine()
+
+# Sign claims with the active key
+def encode_token(claims: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
+    return engine.encode(claims, expires_delta)
+
+# Verify a token and return its claims; raises JWTError
+def decode_token(token: str) -> Dict[str, Any]:
+    return engine.decode(token)
+
+# Claims of a valid token, or None
+def try_decode_token(token: str) -> Optional[Dict[str, Any]]:
+    try:
+        return engine.decode(token)
+    except JWTError:
+        return None
+
+def token_stats() -> Dict[str, Any]:
+    return engine.stats()
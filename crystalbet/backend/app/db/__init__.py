@@ -1 +1 @@
-from .mongodb import init_db, close_db, get_collection, find_one, insert_one, update_one, delete_one
+from .mongodb import init_db, close_db, get_db, get_collection, collection_dependency, get_pool_stats, find_one, find_many, iter_many, iter_cursor, insert_one, update_one, delete_one
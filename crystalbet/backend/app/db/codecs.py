@@ -0,0 +1,36 @@
+from typing import Any
+from bson import ObjectId
+from bson.codec_options import CodecOptions, TypeDecoder, TypeRegistry
+
+# Decode every ObjectId as its hex string inside the driver.
+# The BSON decoder builds each result document once with string ids already in place,
+# so services no longer copy documents just to stringify `_id`.
+class ObjectIdAsStr(TypeDecoder):
+    bson_type = ObjectId
+
+    def transform_bson(self, value: ObjectId) -> str:
+        return str(value)
+
+CODEC_OPTIONS = CodecOptions(type_registry=TypeRegistry([ObjectIdAsStr()]))
+
+# Convert a string id back to an ObjectId for queries and writes.
+# Strings that are not valid ObjectIds are returned unchanged.
+def to_object_id(value: Any) -> Any:
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return ObjectId(value)
+    return value
+
+# Restore ObjectIds under `_id` in a filter or document (plain values and $in/$nin/$gt/... operators).
+# pymongo does not allow custom encoders for str, so this is the write-side half of the codec.
+def encode_ids(document: Any) -> Any:
+    if not isinstance(document, dict) or "_id" not in document:
+        return document
+    value = document["_id"]
+    if isinstance(value, dict):
+        value = {
+            op: [to_object_id(v) for v in operand] if isinstance(operand, list) else to_object_id(operand)
+            for op, operand in value.items()
+        }
+    else:
+        value = to_object_id(value)
+    return {**document, "_id": value}
@@ -0,0 +1,131 @@
+# db/group_commit.py
+#
+# Group commit for inserts under burst load. Callers hand their documents to a writer and
+# wait; the writer collects documents for at most GROUP_COMMIT_MAX_DELAY_MS or until
+# GROUP_COMMIT_MAX_DOCS are queued, then writes them all with one insert_many(ordered=False).
+# Each caller is resumed only after the write carrying its documents is acknowledged (with
+# the collection's write concern), and gets its own ids or its own error: a duplicate key
+# on one document fails that caller, not the batch.
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class GroupCommitWriter:
+    """
+    Batches inserts into one collection.
+    """
+    def __init__(self, collection: Any, max_docs: int = 500, max_delay: float = 0.005):
+        self.collection = collection
+        self.max_docs = max_docs
+        self.max_delay = max_delay
+        # Queued documents and, per caller, (future, offset of its first document, count)
+        self._docs: List[dict] = []
+        self._waiters: List[Tuple[asyncio.Future, int, int]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: set = set()
+        self.batches = 0
+        self.documents = 0
+
+    async def insert(self, docs: List[dict]) -> List[Any]:
+        """
+        Insert the documents in the next group write. Returns their _ids once it is acknowledged.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._waiters.append((future, len(self._docs), len(docs)))
+        self._docs.extend(docs)
+        if len(self._docs) >= self.max_docs:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_delay, self._flush)
+        return await future
+
+    async def insert_one(self, doc: dict) -> Any:
+        return (await self.insert([doc]))[0]
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._docs:
+            return
+        docs, waiters = self._docs, self._waiters
+        self._docs, self._waiters = [], []
+        task = asyncio.ensure_future(self._write(docs, waiters))
+        # Keep a reference so the write is not garbage collected, and so close() can wait for it
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _write(self, docs: List[dict], waiters: List[Tuple[asyncio.Future, int, int]]) -> None:
+        failed: Dict[int, Exception] = {}
+        try:
+            await self.collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            # Unordered: every document without a write error was inserted. Failed ones get the
+            # error insert_one would have raised
+            for error in e.details.get("writeErrors", []):
+                error_class = DuplicateKeyError if error.get("code") == 11000 else WriteError
+                failed[error["index"]] = error_class(error.get("errmsg"), error.get("code"), error)
+        except Exception as e:
+            logger.error(f"Group write of {len(docs)} documents to {self.collection.name} failed: {e}")
+            for future, _, _ in waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.documents += len(docs)
+        for future, offset, count in waiters:
+            if future.done():  # Caller was cancelled
+                continue
+            error = next((failed[i] for i in range(offset, offset + count) if i in failed), None)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                # insert_many sets the _id of each document it sends
+                future.set_result([doc["_id"] for doc in docs[offset:offset + count]])
+
+    async def close(self) -> None:
+        """
+        Write whatever is queued and wait for writes in flight.
+        """
+        self._flush()
+        if self._flushes:
+            await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": len(self._docs),
+            "in_flight": len(self._flushes),
+            "batches": self.batches,
+            "documents": self.documents,
+            "average_batch": round(self.documents / self.batches, 1) if self.batches else None,
+        }
+
+_writers: Dict[str, GroupCommitWriter] = {}
+
+def group_writer(db: Any, collection_name: str) -> GroupCommitWriter:
+    """
+    The process-wide writer for a collection, created on first use.
+    """
+    writer = _writers.get(collection_name)
+    if writer is None:
+        writer = GroupCommitWriter(
+            db[collection_name],
+            max_docs=settings.GROUP_COMMIT_MAX_DOCS,
+            max_delay=settings.GROUP_COMMIT_MAX_DELAY_MS / 1000.0,
+        )
+        _writers[collection_name] = writer
+    return writer
+
+async def close_group_writers() -> None:
+    for writer in list(_writers.values()):
+        await writer.close()
+    _writers.clear()
+
+def group_commit_stats() -> Dict[str, Any]:
+    return {name: writer.stats() for name, writer in _writers.items()}
@@ -0,0 +1,164 @@
+import logging
+from typing import Any, Dict, List, Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+# Declarative index registry, one entry per collection.
+# Every index is named explicitly so a changed definition fails loudly at startup
+# instead of silently creating a duplicate under a generated name.
+# Listing indexes end with _id so keyset pagination on (sort_key, _id) is a single index seek.
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="users_email_unique", unique=True),
+    ],
+    "one_time_tokens": [
+        IndexModel([("digest", ASCENDING)], name="one_time_tokens_digest_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("purpose", ASCENDING)], name="one_time_tokens_user_purpose"),
+        # Expired reset and verification tokens are removed by the server
+        IndexModel([("expires_at", ASCENDING)], name="one_time_tokens_expires_ttl", expireAfterSeconds=0),
+    ],
+    "sessions": [
+        IndexModel([("user_id", ASCENDING)], name="sessions_user"),
+        # Expired refresh-token sessions are removed by the server
+        IndexModel([("expires_at", ASCENDING)], name="sessions_expires_ttl", expireAfterSeconds=0),
+    ],
+    "email_outbox": [
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="email_outbox_status_due"),
+        # Delivered messages are kept for a week
+        IndexModel([("sent_at", ASCENDING)], name="email_outbox_sent_ttl", expireAfterSeconds=7 * 24 * 3600),
+    ],
+    "campaign_failures": [
+        IndexModel([("campaign_id", ASCENDING)], name="campaign_failures_campaign"),
+    ],
+    "coupons": [
+        IndexModel([("code", ASCENDING)], name="coupons_code_unique", unique=True),
+    ],
+    "transactions": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="transactions_user_created"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="transactions_created"),
+    ],
+    "bets": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="bets_user_created"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="bets_created"),
+        IndexModel([("status", ASCENDING), ("_id", ASCENDING)], name="bets_status"),
+        IndexModel([("bet_status", ASCENDING), ("_id", ASCENDING)], name="bets_bet_status"),
+        IndexModel([("match_id", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], name="bets_match_status"),
+        IndexModel([("match_id", ASCENDING), ("bet_status", ASCENDING), ("_id", ASCENDING)], name="bets_match_bet_status"),
+        IndexModel([("legs.match_id", ASCENDING), ("status", ASCENDING), ("_id", ASCENDING)], name="bets_legs_match_status"),
+        IndexModel(
+            [("is_live", ASCENDING), ("_id", ASCENDING)],
+            name="bets_is_live_id_partial",
+            partialFilterExpression={"is_live": True},
+        ),
+    ],
+    "bet_slips": [
+        IndexModel([("user_id", ASCENDING)], name="bet_slips_user"),
+    ],
+    "idempotency_keys": [
+        # Stored responses are removed by the server once their key expires
+        IndexModel([("expires_at", ASCENDING)], name="idempotency_keys_expires_ttl", expireAfterSeconds=0),
+    ],
+    "match_tombstones": [
+        # Only read by the odds snapshot polls that follow the delete
+        IndexModel([("deleted_at", ASCENDING)], name="match_tombstones_deleted_ttl", expireAfterSeconds=86400),
+    ],
+    "exposure": [
+        IndexModel([("match_id", ASCENDING)], name="exposure_match"),
+    ],
+    "matches": [
+        IndexModel([("status", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)], name="matches_status_start"),
+        IndexModel([("start_time", ASCENDING), ("_id", ASCENDING)], name="matches_start_time"),
+        IndexModel([("sport", ASCENDING), ("start_time", ASCENDING), ("_id", ASCENDING)], name="matches_sport_start"),
+        IndexModel([("odds_updated_at", ASCENDING)], name="matches_odds_updated"),
+    ],
+}
+
+# Hot queries that must be served by an index.
+# Each entry is checked with explain() after the indexes are applied.
+HOT_QUERIES: List[Dict[str, Any]] = [
+    {"collection": "users", "filter": {"email": "probe@example.com"}},
+    {"collection": "one_time_tokens", "filter": {"digest": "probe"}},
+    {"collection": "one_time_tokens", "filter": {"user_id": "probe", "purpose": "password_reset"}},
+    {"collection": "sessions", "filter": {"user_id": "probe"}},
+    {"collection": "email_outbox", "filter": {"status": {"$in": ["pending", "sending"]}, "next_attempt_at": {"$lte": "2000-01-01"}}, "sort": [("next_attempt_at", ASCENDING)]},
+    {"collection": "coupons", "filter": {"code": "PROBE"}},
+    {"collection": "transactions", "filter": {"user_id": "probe"}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {"collection": "transactions", "filter": {}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {"collection": "bets", "filter": {"user_id": "probe"}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {"collection": "bets", "filter": {}, "sort": [("created_at", DESCENDING), ("_id", DESCENDING)]},
+    {"collection": "bets", "filter": {"is_live": True}},
+    {"collection": "bets", "filter": {"is_live": True}, "sort": [("_id", ASCENDING)]},
+    {"collection": "bets", "filter": {"$or": [{"status": "pending"}, {"bet_status": "pending"}]}},
+    {"collection": "bets", "filter": {"match_id": "probe", "status": "pending"}, "sort": [("_id", ASCENDING)]},
+    {"collection": "bets", "filter": {"match_id": "probe", "$or": [{"status": "pending"}, {"bet_status": "pending"}]}, "sort": [("_id", ASCENDING)]},
+    {"collection": "bets", "filter": {"legs.match_id": "probe", "status": "pending"}, "sort": [("_id", ASCENDING)]},
+    {"collection": "bet_slips", "filter": {"user_id": "probe"}},
+    {"collection": "matches", "filter": {"status": "live"}},
+    {"collection": "matches", "filter": {"odds_updated_at": {"$gt": "2000-01-01"}}},
+    {"collection": "match_tombstones", "filter": {"deleted_at": {"$gt": "2000-01-01"}}},
+    {"collection": "matches", "filter": {"start_time": {"$gte": "2000-01-01"}}},
+    {"collection": "matches", "filter": {}, "sort": [("start_time", ASCENDING), ("_id", ASCENDING)]},
+    {"collection": "matches", "filter": {"sport": "football"}, "sort": [("start_time", ASCENDING), ("_id", ASCENDING)]},
+]
+
+# Outcome of the last bootstrap, read by the readiness probe
+index_report: Dict[str, Any] = {"applied": False, "errors": [], "collscans": []}
+
+# Create every registered index (idempotent, existing indexes are left untouched)
+async def ensure_indexes(db: Any, registry: Optional[Dict[str, List[IndexModel]]] = None) -> List[str]:
+    errors = []
+    for collection, models in (registry or INDEXES).items():
+        try:
+            await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            # IndexOptionsConflict / IndexKeySpecsConflict: an index with this name already exists with other options
+            errors.append(f"{collection}: {e}")
+            logger.error(f"Index conflict on '{collection}': {e}")
+        except PyMongoError as e:
+            errors.append(f"{collection}: {e}")
+            logger.error(f"Could not create indexes on '{collection}': {e}")
+    return errors
+
+# Walk an explain() plan tree and collect every stage name
+def _plan_stages(plan: Any) -> List[str]:
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(_plan_stages(item))
+    return stages
+
+# Explain every hot query and report the ones planned as a collection scan
+async def verify_indexes(db: Any, hot_queries: Optional[List[Dict[str, Any]]] = None) -> List[str]:
+    collscans = []
+    for query in (hot_queries or HOT_QUERIES):
+        cursor = db[query["collection"]].find(query["filter"])
+        if query.get("sort"):
+            cursor = cursor.sort(query["sort"])
+        try:
+            explain = await cursor.explain()
+        except PyMongoError as e:
+            collscans.append(f"{query['collection']} {query['filter']}: explain failed ({e})")
+            continue
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(winning_plan):
+            collscans.append(f"{query['collection']} {query['filter']}")
+            logger.error(f"Hot query on '{query['collection']}' plans as COLLSCAN: {query['filter']}")
+    return collscans
+
+# Apply the registry and run the self-check, recording the result for readiness
+async def bootstrap_indexes(db: Any, verify: bool = True) -> Dict[str, Any]:
+    index_report["errors"] = await ensure_indexes(db)
+    index_report["collscans"] = await verify_indexes(db) if verify else []
+    index_report["applied"] = True
+    return index_report
+
+# Ready only once indexes are applied without conflicts and no hot query scans
+def indexes_ready() -> bool:
+    return index_report["applied"] and not index_report["errors"] and not index_report["collscans"]
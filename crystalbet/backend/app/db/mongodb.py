@@ -2,36 +2,60 @@ from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
 from pymongo.errors import PyMongoError
 from fastapi import HTTPException
-from typing import Any, List, Optional
-import os
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
-
-# MongoDB configuration
-MONGO_URI = os.getenv("MONGO_URI")
-DATABASE_NAME = os.getenv("DATABASE_NAME")
-
-# Validate that environment variables are loaded
-if not MONGO_URI or not DATABASE_NAME:
-    raise ValueError("MONGO_URI and DATABASE_NAME must be set in the .env file.")
-
-# Global MongoDB client and database reference
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+from core.config import settings
+from db.codecs import CODEC_OPTIONS, encode_ids
+from db.indexes import bootstrap_indexes
+from db.pool_stats import PoolStatsListener
+
+# Global MongoDB client and database reference.
+# This is the only client in the application: routers and services reach Mongo through get_db/get_collection.
 client: Optional[AsyncIOMotorClient] = None
 database: Optional[Any] = None
 
+# Live pool counters, registered on the client in init_db
+pool_listener = PoolStatsListener()
+
+# Build the pooled client from the settings
+def create_client() -> AsyncIOMotorClient:
+    return AsyncIOMotorClient(
+        settings.MONGO_URI,
+        maxPoolSize=settings.MAX_POOL_SIZE,
+        minPoolSize=settings.MIN_POOL_SIZE,
+        waitQueueTimeoutMS=settings.WAIT_QUEUE_TIMEOUT_MS,
+        serverSelectionTimeoutMS=settings.SERVER_SELECTION_TIMEOUT_MS,
+        connectTimeoutMS=settings.CONNECT_TIMEOUT_MS,
+        socketTimeoutMS=settings.SOCKET_TIMEOUT_MS,
+        maxIdleTimeMS=settings.MAX_IDLE_TIME_MS,
+        appname=settings.MONGO_APP_NAME,
+        event_listeners=[pool_listener],
+    )
+
 # Initialize MongoDB connection
 async def init_db():
     global client, database
+    if client is not None:
+        return
     try:
-        client = AsyncIOMotorClient(MONGO_URI)
-        database = client[DATABASE_NAME]
-        print(f"Connected to MongoDB: {DATABASE_NAME}")
+        client = create_client()
+        # ObjectIds are decoded straight to str by the codec, see db/codecs.py
+        database = client.get_database(settings.DATABASE_NAME, codec_options=CODEC_OPTIONS)
+        print(f"Connected to MongoDB: {settings.DATABASE_NAME}")
+        # Apply the index registry and check hot queries before serving traffic
+        await bootstrap_indexes(database, verify=settings.INDEX_VERIFY_ON_STARTUP)
     except PyMongoError as e:
         print(f"Could not connect to MongoDB: {e}")
         raise HTTPException(status_code=500, detail="Could not connect to the database.")
 
+# Pool configuration and live counters (checked-out connections, wait-queue depth, checkout latency)
+def get_pool_stats() -> Dict[str, Any]:
+    return {
+        "max_pool_size": settings.MAX_POOL_SIZE,
+        "min_pool_size": settings.MIN_POOL_SIZE,
+        "wait_queue_timeout_ms": settings.WAIT_QUEUE_TIMEOUT_MS,
+        "pools": pool_listener.snapshot(),
+    }
+
 # Retrieve the database instance
 async def get_db() -> Any:
     if database is None:
@@ -43,6 +67,12 @@ async def get_collection(collection_name: str) -> Any:
     db = await get_db()
     return db[collection_name]
 
+# Dependency factory: Depends(collection_dependency("bets")) injects the named collection
+def collection_dependency(collection_name: str) -> Callable:
+    async def dependency() -> Any:
+        return await get_collection(collection_name)
+    return dependency
+
 # New async function to wrap collection retrieval
 async def get_content_collection() -> Any:
     return await get_collection("admin_content")
@@ -50,25 +80,44 @@ async def get_content_collection() -> Any:
 # CRUD Helpers
 
 # Find one document in a collection
-async def find_one(collection: str, query: dict) -> Optional[dict]:
+async def find_one(collection: str, query: dict, projection: Optional[dict] = None) -> Optional[dict]:
     try:
-        result = await (await get_collection(collection)).find_one(query)
-        if result:
-            result['_id'] = str(result['_id'])  # Convert ObjectId to string
-        return result
+        return await (await get_collection(collection)).find_one(encode_ids(query), projection)
     except PyMongoError as e:
         print(f"Error finding document: {e}")
         raise HTTPException(status_code=500, detail="Error finding document.")
 
-# Find multiple documents in a collection
-async def find_many(collection: str, query: dict = {}) -> List[dict]:
+# Stream documents from an open cursor, fetching batch_size documents per round-trip.
+# Only one batch is held in memory at a time, whatever the size of the result set.
+async def iter_cursor(cursor: Any, batch_size: Optional[int] = None) -> AsyncIterator[dict]:
+    cursor.batch_size(batch_size or settings.STREAM_BATCH_SIZE)
     try:
-        cursor = (await get_collection(collection)).find(query)
-        results = []
         async for document in cursor:
-            document['_id'] = str(document['_id'])  # Convert ObjectId to string
-            results.append(document)
-        return results
+            yield document
+    finally:
+        await cursor.close()
+
+# Stream documents matching a query without materializing the result set
+async def iter_many(
+    collection: str,
+    query: Optional[dict] = None,
+    sort: Optional[list] = None,
+    limit: int = 0,
+    batch_size: Optional[int] = None,
+    projection: Optional[dict] = None,
+) -> AsyncIterator[dict]:
+    cursor = (await get_collection(collection)).find(encode_ids(query or {}), projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    if limit:
+        cursor = cursor.limit(limit)
+    async for document in iter_cursor(cursor, batch_size):
+        yield document
+
+# Find multiple documents in a collection
+async def find_many(collection: str, query: dict = {}, projection: Optional[dict] = None) -> List[dict]:
+    try:
+        return [document async for document in iter_many(collection, query, projection=projection)]
     except PyMongoError as e:
         print(f"Error retrieving documents: {e}")
         raise HTTPException(status_code=500, detail="Error retrieving documents.")
@@ -76,7 +125,7 @@ async def find_many(collection: str, query: dict = {}) -> List[dict]:
 # Insert one document into a collection
 async def insert_one(collection: str, data: dict) -> str:
     try:
-        result = await (await get_collection(collection)).insert_one(data)
+        result = await (await get_collection(collection)).insert_one(encode_ids(data))
         return str(result.inserted_id)
     except PyMongoError as e:
         print(f"Failed to insert document: {e}")
@@ -85,7 +134,7 @@ async def insert_one(collection: str, data: dict) -> str:
 # Update one document in a collection
 async def update_one(collection: str, query: dict, update_data: dict) -> bool:
     try:
-        result = await (await get_collection(collection)).update_one(query, {"$set": update_data})
+        result = await (await get_collection(collection)).update_one(encode_ids(query), {"$set": update_data})
         return result.modified_count > 0
     except PyMongoError as e:
         print(f"Failed to update document: {e}")
@@ -94,7 +143,7 @@ async def update_one(collection: str, query: dict, update_data: dict) -> bool:
 # Delete one document from a collection
 async def delete_one(collection: str, query: dict) -> bool:
     try:
-        result = await (await get_collection(collection)).delete_one(query)
+        result = await (await get_collection(collection)).delete_one(encode_ids(query))
         return result.deleted_count > 0
     except PyMongoError as e:
         print(f"Failed to delete document: {e}")
@@ -109,12 +158,12 @@ def is_valid_object_id(id_str: str) -> bool:
         return False
 
 # Get a document by its ID
-async def get_by_id(collection: str, id: str) -> Any:
+async def get_by_id(collection: str, id: str, projection: Optional[dict] = None) -> Any:
     if not is_valid_object_id(id):
         raise HTTPException(status_code=400, detail="Invalid ID format.")
     
     try:
-        document = await find_one(collection, {"_id": ObjectId(id)})
+        document = await find_one(collection, {"_id": ObjectId(id)}, projection)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found.")
         return document
@@ -124,7 +173,9 @@ async def get_by_id(collection: str, id: str) -> Any:
 
 # Close MongoDB connection
 async def close_db():
-    global client
+    global client, database
     if client:
         client.close()
+        client = None
+        database = None
         print("Closed MongoDB connection.")
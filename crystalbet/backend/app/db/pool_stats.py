@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Any, Dict
+from pymongo import monitoring
+
+# Connection pool listener that keeps live counters per server address.
+# pymongo calls these hooks from the driver threads Motor runs on, so all state is guarded by a lock.
+# Checkout latency is measured per thread: a checkout starts and finishes on the same thread.
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pools: Dict[str, Dict[str, Any]] = {}
+
+    def _pool(self, address) -> Dict[str, Any]:
+        key = f"{address[0]}:{address[1]}"
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {
+                "open_connections": 0,
+                "checked_out": 0,
+                "wait_queue": 0,
+                "checkouts": 0,
+                "checkout_failures": 0,
+                "checkout_latency_ms_total": 0.0,
+                "checkout_latency_ms_max": 0.0,
+                "pool_clears": 0,
+            }
+        return pool
+
+    def _end_wait(self, pool: Dict[str, Any]) -> float:
+        started = getattr(self._local, "checkout_started", None)
+        self._local.checkout_started = None
+        pool["wait_queue"] = max(pool["wait_queue"] - 1, 0)
+        return (time.perf_counter() - started) * 1000 if started else 0.0
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)["pool_clears"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(f"{event.address[0]}:{event.address[1]}", None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address)["open_connections"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["open_connections"] = max(pool["open_connections"] - 1, 0)
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_started = time.perf_counter()
+        with self._lock:
+            self._pool(event.address)["wait_queue"] += 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            self._end_wait(pool)
+            pool["checkout_failures"] += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            latency = self._end_wait(pool)
+            pool["checked_out"] += 1
+            pool["checkouts"] += 1
+            pool["checkout_latency_ms_total"] += latency
+            pool["checkout_latency_ms_max"] = max(pool["checkout_latency_ms_max"], latency)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checked_out"] = max(pool["checked_out"] - 1, 0)
+
+    # Snapshot of every pool, with the average checkout latency derived from the totals
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            stats = {address: dict(pool) for address, pool in self._pools.items()}
+        for pool in stats.values():
+            checkouts = pool["checkouts"]
+            pool["checkout_latency_ms_avg"] = pool["checkout_latency_ms_total"] / checkouts if checkouts else 0.0
+        return stats
@@ -7,10 +7,21 @@ from typing import Any
 from db.mongodb import init_db, close_db, get_collection
 from core.config import settings
 from logging_config import setup_logging, logger
+from services.database import get_all_content as get_cached_content
+from utils.cache_backends import close_cache_backend
+from core.hashing import calibrate_hash_policy, shutdown_hasher
+from services.outbox import start_outbox_worker, stop_outbox_worker
+from services.campaign import stop_campaigns
+from services.cashout import start_cashout_engine, stop_cashout_engine
+from services.exposure import start_exposure_book, stop_exposure_book
+from services.odds import start_odds_snapshot, stop_odds_snapshot
+from utils.throttle import close_throttle
+from db.group_commit import close_group_writers
 
 # Import all routers
 from api.auth import router as auth_router
 from api.bets import router as bet_router
+from api.betting import router as betting_router
 from api.match import router as match_router
 from api.users import router as user_router
 from api.admin import router as admin_router
@@ -20,6 +31,7 @@ from api.casino import router as casino_router
 from api.virtuals import router as virtuals_router
 from api.coupon import router as coupon_router
 from api.main import router as main_router
+from api.health import router as health_router
 
 # Initialize logging
 setup_logging()
@@ -40,6 +52,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # Pagination cursor (utils/pagination.py) must be readable by the frontend
 )
 
 # HTTPS redirection in production
@@ -50,18 +63,33 @@ if settings.ENVIRONMENT == "production":
 @app.on_event("startup")
 async def startup_db_client():
     await init_db()
+    await calibrate_hash_policy()
+    await start_outbox_worker()
+    await start_exposure_book()
+    await start_odds_snapshot()
+    await start_cashout_engine()
     logger.info("Connected to MongoDB.")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await stop_campaigns()
+    await stop_outbox_worker()
+    await close_group_writers()
+    await stop_exposure_book()
+    await stop_cashout_engine()
+    await stop_odds_snapshot()
     await close_db()
+    await close_cache_backend()
+    await close_throttle()
+    shutdown_hasher()
     logger.info("MongoDB connection closed.")
 
 # Exception handlers
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     logger.error(f"HTTP error occurred at {request.url}: {exc.detail}")
-    return JSONResponse(status_code=exc.status_code, content={"error": exc.detail})
+    # Keep headers such as Retry-After (429 throttling, 503 hashing backpressure)
+    return JSONResponse(status_code=exc.status_code, content={"error": exc.detail}, headers=getattr(exc, "headers", None))
 
 @app.exception_handler(StarletteHTTPException)
 async def not_found_error_handler(request: Request, exc: StarletteHTTPException):
@@ -81,12 +109,12 @@ async def get_content_collection() -> Any:
 
 # Route to fetch all content
 @app.get("/all-content", tags=["Content"])
-async def get_all_content(content_collection: Any = Depends(get_content_collection)):
-    contents = await content_collection.find().to_list(100)
-    return contents
+async def get_all_content():
+    return await get_cached_content(100)
 
 # Include all routers
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
+app.include_router(betting_router, prefix="/api/bets", tags=["Bets"])
 app.include_router(bet_router, prefix="/api/bets", tags=["Bets"])
 app.include_router(match_router, prefix="/api/matches", tags=["Matches"])
 app.include_router(user_router, prefix="/api/users", tags=["User Profile"])
@@ -97,6 +125,7 @@ app.include_router(casino_router, prefix="/api/casino", tags=["Casino"])
 app.include_router(virtuals_router, prefix="/api/virtuals", tags=["Virtual Sports"])
 app.include_router(coupon_router, prefix="/api/coupons", tags=["Coupon Check"])
 app.include_router(main_router, tags=["General"])
+app.include_router(health_router, prefix="/health", tags=["Health"])
 
 # Root endpoint
 @app.get("/", tags=["Root"])
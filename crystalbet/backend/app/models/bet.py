@@ -25,27 +25,27 @@ class Bet(BaseModel):
 
     @classmethod
     async def create(cls, bet_data: dict):
-        result = await get_db["bets"].insert_one(bet_data)
+        result = await (await get_db())["bets"].insert_one(bet_data)
         return cls(**bet_data)
 
     @classmethod
     async def get_all(cls, skip: int = 0, limit: int = 10):
-        bets = await get_db["bets"].find().skip(skip).limit(limit).to_list(length=limit)
+        bets = await (await get_db())["bets"].find().skip(skip).limit(limit).to_list(length=limit)
         return [cls(**bet) for bet in bets]
 
     @classmethod
     async def get_by_user_id(cls, user_id: str):
-        bets = await get_db["bets"].find({"user_id": user_id}).to_list(length=100)
+        bets = await (await get_db())["bets"].find({"user_id": user_id}).to_list(length=100)
         return [cls(**bet) for bet in bets]
 
     @classmethod
     async def get_by_odds(cls, max_odds: float):
-        bets = await get_db["bets"].find({"odds": {"$lt": max_odds}}).to_list(length=100)
+        bets = await (await get_db())["bets"].find({"odds": {"$lt": max_odds}}).to_list(length=100)
         return [cls(**bet) for bet in bets]
 
     @classmethod
     async def get_live_bets(cls):
-        live_bets = await get_db["bets"].find({"is_live": True}).to_list(length=100)
+        live_bets = await (await get_db())["bets"].find({"is_live": True}).to_list(length=100)
         return [cls(**bet) for bet in live_bets]
 
 class BetInDB(Bet):
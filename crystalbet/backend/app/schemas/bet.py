@@ -3,16 +3,58 @@ from typing import List, Optional
 
 class BetCreate(BaseModel):
     match_id: str
+    selection: str  # Outcome backed, e.g. "home", "draw", "away"
     odds: float
     stake: float
 
-class Bet(BaseModel):
-    id: str
+class SlipSelection(BaseModel):
     match_id: str
+    selection: str
+    odds: float = Field(..., gt=1.0)
+
+class SlipRequest(BaseModel):
+    selections: List[SlipSelection] = Field(..., min_length=1)
+    stake: float = Field(..., gt=0, description="Stake per line")
+    bet_type: str = Field("single", description="single, accumulator, system, or a named system such as yankee or lucky15")
+    folds: Optional[List[int]] = Field(None, description="Fold sizes of a system bet, e.g. [2, 3] for doubles and trebles")
+    include_lines: bool = False
+
+class SlipFold(BaseModel):
+    fold: int
+    lines: int
+    payout: float
+
+class SlipLine(BaseModel):
+    selections: List[int]  # Indexes into the slip's selections
     odds: float
+    payout: float
+
+class SlipQuote(BaseModel):
+    bet_type: str
+    folds: List[SlipFold]
+    line_count: int
+    stake_per_line: float
+    total_stake: float
+    potential_payout: float
+    lines: Optional[List[SlipLine]] = None
+
+class CashoutQuote(BaseModel):
+    bet_id: str
+    available: bool  # False while a leg has no price (suspended market)
+    cashout_value: Optional[float] = None
+
+class Bet(BaseModel):
+    id: str
+    bet_type: str = "single"
+    match_id: Optional[str] = None  # Singles
+    selection: Optional[str] = None
+    legs: Optional[List[SlipSelection]] = None  # Accumulators and system bets
+    odds: float  # Combined odds of a multiple (potential payout / stake)
     stake: float
     user_id: str
     status: str = Field(default="pending")  # default status
+    potential_payout: Optional[float] = None
+    payout: Optional[float] = None  # Set at settlement
 
 class BetOut(Bet):
     created_at: Optional[str] = None
@@ -22,6 +64,8 @@ class BetSlip(BaseModel):
     bets: List[Bet]
     total_stake: float
     potential_payout: float
+    bet_type: str = "single"
+    line_count: int = 1
 
 class BetFilter(BaseModel):
     odds_less_than: Optional[float] = None
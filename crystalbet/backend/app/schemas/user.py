@@ -18,6 +18,7 @@ class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     full_name: Optional[str] = None
     is_active: Optional[bool] = None
+    marketing_opt_out: Optional[bool] = None  # Unsubscribe from (or back into) promotional email
 
     class Config:
         from_attributes = True
@@ -43,6 +44,7 @@ class UserResponse(BaseModel):
     full_name: Optional[str]
     is_active: bool
     is_admin: bool
+    marketing_opt_out: bool = False
 
     class Config:
         from_attributes = True
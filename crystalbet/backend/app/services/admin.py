@@ -5,9 +5,8 @@ from pymongo.collection import Collection
 from core.security import get_current_admin
 from models.admin import CMSContentModel
 from schemas.admin import CMSContentCreate, CMSContentUpdate
-from services.database import get_collection
 from pydantic import BaseModel
-from db.mongodb import get_db, get_collection
+from db.mongodb import collection_dependency
 
 # Admin service class
 class AdminService:
@@ -89,5 +88,5 @@ class AdminService:
         return {"message": "Content deleted successfully"}
 
 # Dependency function to get AdminService instance
-def get_admin_service(cms_collection: Collection = Depends(get_collection)) -> AdminService:
+def get_admin_service(cms_collection: Collection = Depends(collection_dependency("admin_content"))) -> AdminService:
     return AdminService(cms_collection=cms_collection)
@@ -4,9 +4,18 @@ from pydantic import EmailStr
 from datetime import datetime, timedelta
 from schemas.auth import UserCreate, UserUpdate
 from models.user import UserInDB
-from core.security import hash_password, verify_password, create_access_token, create_reset_token
-from fastapi_mail import FastMail, MessageSchema
+from core.security import create_access_token
+import asyncio
+import logging
+import time
+from core.hashing import hash_password, needs_rehash, verify_password
+from services.email import send_reset_password_email as queue_reset_email
 from db.mongodb import get_db
+from services.user import get_principal, invalidate_principal, invalidate_user
+from services.session import revoke_user_sessions
+from services.one_time_token import EMAIL_VERIFICATION, PASSWORD_RESET, consume_token, issue_token
+from db.codecs import to_object_id
+from utils.serialization import construct_model
 from core.config import settings
 from utils.jwt import decode_token, oauth2_scheme  # Correct import for JWT functions
 
@@ -21,7 +30,7 @@ async def create_user(db, user: UserCreate):
         )
     
     # Hash the password and prepare user data
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password(user.password)
     user_data = {
         "username": user.username,
         "email": user.email,
@@ -29,16 +38,48 @@ async def create_user(db, user: UserCreate):
         "created_at": datetime.utcnow(),
         "is_active": True,
         "is_superuser": False,
+        "marketing_opt_out": False,  # Excluded from campaigns once set (services/campaign.py)
     }
     result = await db["users"].insert_one(user_data)
     user_data["_id"] = str(result.inserted_id)  # Add inserted ID for returning
-    return UserInDB(**user_data)
+    return UserInDB(**user_data, id=user_data["_id"], hashed_password=hashed_password)
+
+logger = logging.getLogger(__name__)
+
+ADMIN_ROLE = "admin"
+USER_ROLE = "user"
+
+# sub -> second of revocation; tokens of that subject issued in an earlier second are rejected.
+# iat has whole-second resolution, so a token issued later in the revoking second (a login
+# right after a password reset) stays valid.
+# Per process, like the caches: with several workers, set a short ACCESS_TOKEN_EXPIRE_MINUTES.
+_revoked = {}
+
+# Rehash tasks in flight (kept referenced until they finish)
+_rehash_tasks = set()
+
+# Replace a hash made under an older cost policy, now that the plain password is known.
+# Conditional on the stored hash so a concurrent password change is never overwritten.
+async def rehash_password(db, user_id, password: str, old_hash: str):
+    try:
+        new_hash = await hash_password(password)
+        result = await db["users"].update_one({"_id": to_object_id(user_id), "password": old_hash}, {"$set": {"password": new_hash}})
+        if result.matched_count == 0:
+            logger.warning(f"Password rehash for user {user_id} matched no user (password changed or user removed)")
+    except Exception as e:
+        # Best effort: the next login tries again
+        logger.warning(f"Password rehash for user {user_id} skipped: {e}")
 
 # Authenticate a user by email and password
 async def authenticate_user(db, email: str, password: str):
     user = await db["users"].find_one({"email": email})
-    if user and verify_password(password, user["password"]):
-        return UserInDB(**user)
+    if user and await verify_password(password, user["password"]):
+        if await needs_rehash(user["password"]):
+            # Off the login path: the response does not wait for the second bcrypt run
+            task = asyncio.create_task(rehash_password(db, user["_id"], password, user["password"]))
+            _rehash_tasks.add(task)
+            task.add_done_callback(_rehash_tasks.discard)
+        return UserInDB(**user, id=user["_id"], hashed_password=user["password"])
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Invalid email or password."
@@ -53,46 +94,56 @@ async def send_reset_password_email(email: EmailStr, db):
             detail="User with this email not found."
         )
 
-    token = create_reset_token({"email": email})
-    reset_link = f"{settings.FRONTEND_URL}/reset-password?token={token}"
-    message = MessageSchema(
-        subject="Password Reset Request",
-        recipients=[email],
-        body=f"Click the following link to reset your password: {reset_link}",
-        subtype="html"
-    )
+    # Stored as a digest with its own TTL; any earlier reset link stops working
+    token = await issue_token(db, PASSWORD_RESET, user["_id"], email)
     
-    # Send email
-    fm = FastMail(settings.mail_config)
-    await fm.send_message(message)
-    
-    # Save reset token and expiration
-    await db["users"].update_one(
-        {"email": email},
-        {"$set": {"reset_token": token, "reset_token_expiration": datetime.utcnow() + timedelta(hours=1)}}
-    )
+    # Queued in the outbox, the request does not wait for SMTP
+    await queue_reset_email(email, token)
 
 # Reset user password
 async def reset_password(db, reset_token: str, new_password: str):
-    user = await db["users"].find_one({"reset_token": reset_token})
-    if not user:
+    # Single use: the token is deleted as it is redeemed
+    record = await consume_token(db, PASSWORD_RESET, reset_token)
+    if not record:
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Invalid reset token."
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired reset token."
         )
     
-    if user["reset_token_expiration"] < datetime.utcnow():
+    # Hash the new password and update user document
+    hashed_password = await hash_password(new_password)
+    result = await db["users"].update_one(
+        {"_id": to_object_id(record["user_id"])},
+        {"$set": {"password": hashed_password}, "$unset": {"reset_token": "", "reset_token_expiration": ""}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found."
+        )
+    # Sessions opened with the old password end here
+    revoke_user_tokens(record["user_id"])
+    await revoke_user_sessions(db, record["user_id"])
+
+# Mark the email address behind a verification token as verified
+async def verify_email(db, verification_token: str):
+    record = await consume_token(db, EMAIL_VERIFICATION, verification_token)
+    if not record:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Reset token has expired."
+            detail="Invalid or expired verification token."
         )
-    
-    # Hash the new password and update user document
-    hashed_password = hash_password(new_password)
-    await db["users"].update_one(
-        {"_id": ObjectId(user["_id"])},
-        {"$set": {"password": hashed_password, "reset_token": None, "reset_token_expiration": None}}
+    # Only if the address has not changed since the token was sent
+    result = await db["users"].update_one(
+        {"_id": to_object_id(record["user_id"]), "email": record["email"]},
+        {"$set": {"email_verified": True}}
     )
+    if result.matched_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid or expired verification token."
+        )
+    await invalidate_user(record["user_id"])
 
 async def get_user_by_email(db, email: EmailStr):
     user = await db["users"].find_one({"email": email})
@@ -120,23 +171,86 @@ async def update_user(db, user_update: UserUpdate, user_id: str):
             detail="User not found."
         )
 
-    # Prepare the update data
-    update_data = user_update.dict(exclude_unset=True)
-    if "password" in update_data:
-        update_data["password"] = hash_password(update_data["password"])  # Hash the new password
-    
-    # Update user in the database
-    await db["users"].update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
-    
+    await apply_user_update(db, user_id, user_update.dict(exclude_unset=True))
+
     # Return the updated user
     updated_user = await db["users"].find_one({"_id": ObjectId(user_id)})
     return UserInDB(**updated_user)
 
+# Write a user update: hash a new password, drop cached copies of the user and revoke the
+# tokens and sessions the change invalidates. Every user update path goes through here.
+async def apply_user_update(db, user_id: str, update_data: dict):
+    update_data = dict(update_data)
+    if "password" in update_data:
+        update_data["password"] = await hash_password(update_data["password"])  # Hash the new password
+    result = await db["users"].update_one({"_id": to_object_id(user_id)}, {"$set": update_data})
+    await invalidate_user(user_id)
+    await invalidate_principal(user_id)
+    # Issued tokens carry the old role/status claims, or were obtained with the old password
+    if {"password", "is_superuser", "is_active"} & update_data.keys():
+        revoke_user_tokens(user_id)
+        await revoke_user_sessions(db, user_id)
+    return result
+
+# Claims embedded in access tokens so authorization needs no user lookup
+def access_token_claims(user) -> dict:
+    return {
+        "sub": str(user.id),
+        "role": ADMIN_ROLE if user.is_superuser else USER_ROLE,
+        "active": bool(user.is_active),
+    }
+
+# Revoke every token of a user issued up to now (role, status or password change, deletion)
+def revoke_user_tokens(user_id: str):
+    now = int(time.time())
+    _revoked[str(user_id)] = now
+    # Entries only matter while tokens issued before them can still be unexpired
+    horizon = now - settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    for sub in [sub for sub, revoked_at in _revoked.items() if revoked_at < horizon]:
+        del _revoked[sub]
+
+# Decode a bearer token and apply the revocation list
+def token_claims(token: str) -> dict:
+    payload = decode_token(token)
+    if not payload or not payload.get("sub"):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    revoked_at = _revoked.get(payload["sub"])
+    if revoked_at is not None and payload.get("iat", 0) < revoked_at:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token has been revoked.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return payload
+
+def _principal_model(user: dict) -> UserInDB:
+    # Trusted DB output without the password hash, so skip validation
+    return construct_model(UserInDB, {**user, "id": user["_id"]})
+
 # Verify admin privileges
 async def verify_admin(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
-    user_info = await decode_token(token)
-    user = await db["users"].find_one({"_id": ObjectId(user_info["sub"])})
-    
+    claims = token_claims(token)
+
+    if "role" in claims:
+        # Stateless path: the token says who the caller is and what they may do
+        if not claims.get("active", False):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Account is disabled."
+            )
+        if claims["role"] != ADMIN_ROLE:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin privileges required."
+            )
+        return construct_model(UserInDB, {"id": claims["sub"], "is_active": True, "is_superuser": True})
+
+    # Tokens issued before role claims existed fall back to the user document
+    user = await get_principal(db, claims["sub"])
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -149,27 +263,23 @@ async def verify_admin(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
             detail="Admin privileges required."
         )
     
-    return UserInDB(**user)
+    return _principal_model(user)
 
 
 async def get_current_user(token: str = Depends(oauth2_scheme), db=Depends(get_db)):
-    try:
-        # Decode the JWT token to extract user information
-        user_info = decode_token(token)
-        user_id = user_info.get("sub")
-
-        # Retrieve the user from the database
-        user = await db["users"].find_one({"_id": ObjectId(user_id)})
-        if not user:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="User not found."
-            )
-        
-        return UserInDB(**user)
+    claims = token_claims(token)
 
-    except Exception as e:
+    # Retrieve the user through the principal cache
+    user = await get_principal(db, claims["sub"])
+    if not user:
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid or expired token."
-        )
\ No newline at end of file
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found."
+        )
+    if not user.get("is_active", True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Account is disabled."
+        )
+
+    return _principal_model(user)
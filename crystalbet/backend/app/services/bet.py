@@ -1,29 +1,102 @@
 # app/services/bet.py
 
+from datetime import datetime
+from typing import Union
 from pymongo.collection import Collection
-from schemas.bet import Bet, BetCreate, BetSlip
+from schemas.bet import Bet, BetCreate, BetSlip, SlipQuote, SlipRequest, SlipSelection
+from core.config import settings
+from db.group_commit import group_writer
+from services.cashout import cashout_engine
+from services.odds import odds_snapshot
+from utils.bet_slip import SINGLE, calculate_slip
+from utils.pagination import DESCENDING, PageParams, paginate
+
+def _calculate(slip: SlipRequest, include_lines: bool = False) -> dict:
+    return calculate_slip(
+        [selection.odds for selection in slip.selections],
+        slip.stake,
+        slip.bet_type,
+        slip.folds,
+        match_ids=[selection.match_id for selection in slip.selections],
+        include_lines=include_lines,
+    )
 
 class BetService:
     def __init__(self, db):
+        self.db = db
         self.collection: Collection = db["bets"]  # Replace with your actual collection name
         self.bet_slip_collection: Collection = db["bet_slips"]  # Collection for storing bet slips
 
-    async def get_all_bets(self) -> list[Bet]:
-        bets = await self.collection.find().to_list(length=None)
-        return [Bet(**bet) for bet in bets]
+    async def get_all_bets(self, page: PageParams, user_id: str = None) -> tuple[list[Bet], str]:
+        query = {"user_id": user_id} if user_id else {}
+        bets, next_cursor = await paginate(self.collection, query, page, sort_key="created_at", direction=DESCENDING)
+        return [Bet(**bet) for bet in bets], next_cursor
 
-    async def get_live_bets(self) -> list[Bet]:
-        live_bets = await self.collection.find({"status": "live"}).to_list(length=None)
-        return [Bet(**bet) for bet in live_bets]
+    async def get_live_bets(self, page: PageParams) -> tuple[list[Bet], str]:
+        live_bets, next_cursor = await paginate(self.collection, {"is_live": True}, page)
+        return [Bet(**bet) for bet in live_bets], next_cursor
 
-    async def book_bet(self, bet: BetCreate, user_id: str) -> BetSlip:
-        bet_data = bet.dict()
-        bet_data["user_id"] = user_id  # Link the bet to the user
-        result = await self.collection.insert_one(bet_data)
-        bet_slip = BetSlip(**bet_data)  # Create a bet slip
-        await self.bet_slip_collection.insert_one(bet_slip.dict())  # Save to bet slip collection
+    async def book_bet(self, bet: Union[BetCreate, SlipRequest], user_id: str) -> BetSlip:
+        """
+        Book a slip (a BetCreate is a slip with one single). Singles are stored as one bet per selection,
+        accumulators and system bets as one bet holding its legs, folds and stake per line.
+        """
+        slip = bet if isinstance(bet, SlipRequest) else SlipRequest(
+            selections=[SlipSelection(match_id=bet.match_id, selection=bet.selection, odds=bet.odds)],
+            stake=bet.stake,
+        )
+        quote = _calculate(slip)
+        if settings.ODDS_CHECK_ENABLED:
+            # Refuse prices the book no longer offers (409 with the current odds)
+            await odds_snapshot.check(slip.selections, self.db["matches"])
+        now = datetime.utcnow()
+        # Settled by services/settlement.py once the matches are finished
+        base = {"user_id": user_id, "bet_type": slip.bet_type, "status": "pending", "created_at": now}
+        if slip.bet_type == SINGLE:
+            bets_data = [
+                {**base, **selection.dict(), "stake": slip.stake, "potential_payout": round(slip.stake * selection.odds, 2)}
+                for selection in slip.selections
+            ]
+        else:
+            bets_data = [{
+                **base,
+                "legs": [selection.dict() for selection in slip.selections],
+                "folds": [fold["fold"] for fold in quote["folds"]],
+                "line_stake": slip.stake,
+                "line_count": quote["line_count"],
+                "stake": quote["total_stake"],
+                "odds": round(quote["potential_payout"] / quote["total_stake"], 4),
+                "potential_payout": quote["potential_payout"],
+            }]
+        if settings.BET_GROUP_COMMIT:
+            # Shares one insert_many with the bets placed by other requests in the same few ms
+            bet_ids = await group_writer(self.db, "bets").insert(bets_data)
+        else:
+            bet_ids = (await self.collection.insert_many(bets_data)).inserted_ids
+        if settings.CASHOUT_ENABLED:
+            for bet_id, data in zip(bet_ids, bets_data):
+                cashout_engine.add({**data, "_id": bet_id})
+        bet_slip = BetSlip(
+            bets=[Bet(id=str(bet_id), **data) for bet_id, data in zip(bet_ids, bets_data)],
+            total_stake=quote["total_stake"],
+            potential_payout=quote["potential_payout"],
+            bet_type=slip.bet_type,
+            line_count=quote["line_count"],
+        )
+        slip_data = {**bet_slip.dict(), "user_id": user_id, "created_at": now}
+        if settings.BET_GROUP_COMMIT:
+            await group_writer(self.db, "bet_slips").insert_one(slip_data)
+        else:
+            await self.bet_slip_collection.insert_one(slip_data)  # Save to bet slip collection
         return bet_slip
 
+    @staticmethod
+    def quote_slip(slip: SlipRequest) -> SlipQuote:
+        """
+        Totals, payout per fold and optionally per line of a slip, without booking it.
+        """
+        return SlipQuote(**_calculate(slip, include_lines=slip.include_lines))
+
     async def get_bet_slip(self, user_id: str) -> BetSlip:
         bet_slip = await self.bet_slip_collection.find_one({"user_id": user_id})
         if bet_slip is None:
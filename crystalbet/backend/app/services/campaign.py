@@ -0,0 +1,360 @@
+# services/campaign.py
+#
+# Bulk promotional email. A campaign streams its segment of the users collection in _id
+# order and hands recipients to N sender tasks, each owning one SMTP connection. Each
+# sender renders its own message (the template is compiled once), so rendering overlaps
+# with the other connections' network waits. A shared limiter caps the total send rate.
+#
+# Progress is checkpointed as the highest user _id below which every recipient has been
+# handled. After a crash the campaign resumes from there: delivery is at-least-once, and
+# at most the messages in flight at the crash are sent twice.
+#
+# Campaigns do not go through the outbox (services/outbox.py): the outbox is for
+# transactional mail and a campaign would queue hundreds of thousands of documents ahead of it.
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from bson import ObjectId
+from fastapi import HTTPException, status
+from jinja2 import TemplateNotFound
+from pymongo import ReturnDocument
+from core.config import settings
+from db.codecs import to_object_id
+from db.mongodb import iter_cursor
+from services.email import env
+from services.outbox import SMTPConnection, permanent_error, render_mime
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGNS = "campaigns"
+CAMPAIGN_FAILURES = "campaign_failures"
+
+DRAFT = "draft"
+RUNNING = "running"
+PAUSED = "paused"
+COMPLETED = "completed"
+FAILED = "failed"
+
+RECIPIENT_PROJECTION = {"_id": 1, "email": 1, "username": 1}
+
+class RateLimiter:
+    """
+    Spaces acquisitions 1/rate apart across all callers (one event loop, no lock needed).
+    """
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        now = time.monotonic()
+        slot = max(self._next, now)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+def segment_filter(segment: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Users query of a campaign segment. Users who opted out (PUT /users/profile with
+    marketing_opt_out) are never included.
+    """
+    query: Dict[str, Any] = {"marketing_opt_out": {"$ne": True}}
+    for field in ("is_active", "email_verified", "is_superuser"):
+        if segment.get(field) is not None:
+            query[field] = segment[field]
+    if segment.get("created_after") is not None:
+        query["created_at"] = {"$gte": segment["created_after"]}
+    return query
+
+class _Watermark:
+    """
+    Highest user _id below which every recipient is done, from out-of-order completions.
+    """
+    def __init__(self, start: Any):
+        self.value = start
+        self._order: Dict[int, Any] = {}
+        self._done = set()
+        self._issued = 0
+        self._next = 0
+
+    def issue(self, user_id: Any) -> int:
+        sequence = self._issued
+        self._order[sequence] = user_id
+        self._issued += 1
+        return sequence
+
+    def complete(self, sequence: int) -> None:
+        self._done.add(sequence)
+        while self._next in self._done:
+            self._done.discard(self._next)
+            self.value = self._order.pop(self._next)
+            self._next += 1
+
+class CampaignRunner:
+    """
+    Sends one campaign from its checkpoint until the segment is exhausted or it is stopped.
+    """
+    def __init__(self, db, campaign: dict):
+        self.db = db
+        self.campaign = campaign
+        self.campaign_id = str(campaign["_id"])
+        self.connections = campaign.get("connections") or settings.CAMPAIGN_CONNECTIONS
+        self.limiter = RateLimiter(campaign.get("rate_per_second") or settings.CAMPAIGN_RATE_PER_SECOND)
+        self.template = env.get_template(campaign["template"])
+        self.sender = settings.MAIL_FROM or settings.SMTP_USERNAME
+        self.watermark = _Watermark(campaign.get("last_user_id"))
+        self.sent = campaign.get("sent", 0)
+        self.failed = campaign.get("failed", 0)
+        self._sent_this_run = 0
+        self._started = time.monotonic()
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.connections * 50)
+        self._stopping = False
+        self._error: Optional[Exception] = None
+        self._senders: List[asyncio.Task] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self._started
+        return round(self._sent_this_run / elapsed, 2) if elapsed > 0 else 0.0
+
+    def render(self, user: dict) -> str:
+        context = dict(self.campaign.get("context") or {})
+        context.update({
+            "username": user.get("username") or "there",
+            "unsubscribe_url": f"{settings.FRONTEND_URL}/account/notifications",
+            "current_year": datetime.utcnow().year,
+        })
+        return render_mime(self.sender, user["email"], self.campaign["subject"], self.template.render(**context))
+
+    async def _produce(self) -> None:
+        query = segment_filter(self.campaign.get("segment") or {})
+        if self.watermark.value is not None:
+            query["_id"] = {"$gt": to_object_id(self.watermark.value)}
+        cursor = self.db["users"].find(query, RECIPIENT_PROJECTION).sort("_id", 1)
+        async for user in iter_cursor(cursor):
+            if self._stopping:
+                break
+            if not user.get("email"):
+                continue
+            if not await self._put((self.watermark.issue(user["_id"]), user)):
+                break
+
+    def _senders_alive(self) -> bool:
+        return any(not sender.done() for sender in self._senders)
+
+    async def _put(self, item: Any) -> bool:
+        # A full queue with no sender left would block forever while the heartbeat keeps the lease
+        while True:
+            try:
+                await asyncio.wait_for(self._queue.put(item), timeout=1.0)
+                return True
+            except asyncio.TimeoutError:
+                if not self._senders_alive():
+                    self._fail(RuntimeError("every campaign sender stopped"))
+                    return False
+
+    async def _drain(self) -> None:
+        # Wait for the queued recipients, unless no sender is left to take them
+        join = asyncio.ensure_future(self._queue.join())
+        try:
+            while not join.done():
+                await asyncio.wait([join], timeout=1.0)
+                if not join.done() and not self._senders_alive():
+                    self._fail(RuntimeError("every campaign sender stopped"))
+                    return
+        finally:
+            join.cancel()
+
+    def _fail(self, error: Exception) -> None:
+        if self._error is None:
+            self._error = error
+            logger.error(f"Campaign {self.campaign_id} stopping: {error}")
+        self._stopping = True
+
+    async def _send_loop(self) -> None:
+        smtp = SMTPConnection()
+        try:
+            while True:
+                sequence, user = await self._queue.get()
+                try:
+                    # When stopping, queued recipients are dropped without advancing the
+                    # watermark, so the resumed run picks them up again
+                    if not self._stopping and await self._deliver(smtp, user):
+                        self.watermark.complete(sequence)
+                except Exception as e:
+                    # Failure recording or checkpoint write: stop the campaign, keep this sender draining
+                    self._fail(e)
+                finally:
+                    self._queue.task_done()
+        finally:
+            await smtp.close()
+
+    async def _deliver(self, smtp: SMTPConnection, user: dict) -> bool:
+        """
+        Render and send to one recipient. False when the recipient was not handled.
+        """
+        try:
+            content = self.render(user)
+        except Exception as e:
+            error: Optional[Exception] = e
+        else:
+            await self.limiter.acquire()
+            error = await smtp.send(self.sender, user["email"], content)
+            if error is not None and not permanent_error(error):
+                # Server unreachable or throttling us: stop rather than fail every remaining recipient
+                self._fail(error)
+                return False
+        if error is None:
+            self.sent += 1
+            self._sent_this_run += 1
+        else:
+            self.failed += 1
+            await self.db[CAMPAIGN_FAILURES].insert_one({
+                "campaign_id": self.campaign_id,
+                "user_id": user["_id"],
+                "email": user["email"],
+                "error": str(error),
+                "created_at": datetime.utcnow(),
+            })
+        if (self.sent + self.failed) % settings.CAMPAIGN_CHECKPOINT_EVERY == 0:
+            await self.checkpoint()
+        return True
+
+    async def checkpoint(self, **fields: Any) -> None:
+        await self.db[CAMPAIGNS].update_one({"_id": to_object_id(self.campaign_id)}, {"$set": {
+            # Stored as an ObjectId so the resume query compares in _id order
+            "last_user_id": to_object_id(self.watermark.value),
+            "sent": self.sent,
+            "failed": self.failed,
+            "messages_per_second": self.throughput(),
+            "heartbeat_at": datetime.utcnow(),
+            **fields,
+        }})
+
+    async def _heartbeat(self) -> None:
+        # Keeps the lease fresh while the send rate is too low to checkpoint by count
+        while True:
+            await asyncio.sleep(settings.CAMPAIGN_LEASE_SECONDS / 3)
+            await self.checkpoint()
+
+    async def run(self) -> None:
+        senders = self._senders = [asyncio.create_task(self._send_loop()) for _ in range(self.connections)]
+        heartbeat = asyncio.create_task(self._heartbeat())
+        outcome = {"status": COMPLETED, "finished_at": datetime.utcnow()}
+        try:
+            await self._produce()
+            await self._drain()
+            if self._error is not None:
+                outcome = {"status": FAILED, "last_error": str(self._error)}
+            elif self._stopping:
+                outcome = {"status": PAUSED}
+        except asyncio.CancelledError:
+            outcome = {"status": PAUSED}
+            raise
+        except Exception as e:
+            logger.error(f"Campaign {self.campaign_id} failed: {e}")
+            outcome = {"status": FAILED, "last_error": str(e)}
+        finally:
+            heartbeat.cancel()
+            for sender in senders:
+                sender.cancel()
+            await asyncio.gather(heartbeat, *senders, return_exceptions=True)
+            if "finished_at" in outcome:
+                outcome["finished_at"] = datetime.utcnow()
+            await self.checkpoint(**outcome)
+            _runners.pop(self.campaign_id, None)
+            logger.info(f"Campaign {self.campaign_id} {outcome['status']}: {self.sent} sent, {self.failed} failed, {self.throughput()} msg/s")
+
+    async def stop(self) -> None:
+        """
+        Stop after the messages already queued are accounted for, then checkpoint.
+        """
+        self._stopping = True
+        if self.task is not None:
+            await asyncio.shield(self.task)
+
+# Campaigns sending from this process
+_runners: Dict[Any, CampaignRunner] = {}
+
+async def create_campaign(db, name: str, subject: str, template: str, context: Dict[str, Any], segment: Dict[str, Any],
+                          rate_per_second: Optional[float] = None, connections: Optional[int] = None) -> dict:
+    # Fails here rather than in the middle of a run
+    try:
+        env.get_template(template)
+    except TemplateNotFound:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown email template '{template}'.")
+    campaign = {
+        "name": name,
+        "subject": subject,
+        "template": template,
+        "context": context,
+        "segment": segment,
+        "rate_per_second": rate_per_second,
+        "connections": connections,
+        "status": DRAFT,
+        "last_user_id": None,
+        "sent": 0,
+        "failed": 0,
+        "created_at": datetime.utcnow(),
+    }
+    result = await db[CAMPAIGNS].insert_one(campaign)
+    campaign["_id"] = str(result.inserted_id)
+    return campaign
+
+async def start_campaign(db, campaign_id: str) -> dict:
+    """
+    Start a draft campaign, or resume a paused, failed or abandoned one from its checkpoint.
+    """
+    if not ObjectId.is_valid(campaign_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid campaign ID.")
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.CAMPAIGN_LEASE_SECONDS)
+    # Claim atomically: a running campaign is only taken over once its owner stopped heartbeating
+    campaign = await db[CAMPAIGNS].find_one_and_update(
+        {"_id": ObjectId(campaign_id), "$or": [
+            {"status": {"$in": [DRAFT, PAUSED, FAILED]}},
+            {"status": RUNNING, "heartbeat_at": {"$lt": stale}},
+        ]},
+        {"$set": {"status": RUNNING, "heartbeat_at": now, "started_at": now}, "$unset": {"last_error": ""}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if campaign is None:
+        existing = await db[CAMPAIGNS].find_one({"_id": ObjectId(campaign_id)}, {"status": 1})
+        if existing is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found.")
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Campaign is {existing['status']}.")
+    runner = CampaignRunner(db, campaign)
+    _runners[campaign_id] = runner
+    runner.task = asyncio.create_task(runner.run())
+    return campaign
+
+async def pause_campaign(db, campaign_id: str) -> dict:
+    runner = _runners.get(campaign_id)
+    if runner is None:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Campaign is not running in this process.")
+    await runner.stop()
+    return await campaign_progress(db, campaign_id)
+
+async def campaign_progress(db, campaign_id: str) -> dict:
+    """
+    Stored progress, with live counters when the campaign is sending from this process.
+    """
+    if not ObjectId.is_valid(campaign_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid campaign ID.")
+    campaign = await db[CAMPAIGNS].find_one({"_id": ObjectId(campaign_id)}, {"context": 0})
+    if campaign is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Campaign not found.")
+    runner = _runners.get(campaign_id)
+    if runner is not None:
+        campaign.update({"sent": runner.sent, "failed": runner.failed, "messages_per_second": runner.throughput()})
+    return campaign
+
+async def stop_campaigns() -> None:
+    """
+    Pause every campaign of this process (shutdown); they resume from their checkpoint.
+    """
+    await asyncio.gather(*(runner.stop() for runner in list(_runners.values())), return_exceptions=True)
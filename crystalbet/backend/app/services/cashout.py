@@ -0,0 +1,332 @@
+# services/cashout.py
+#
+# Cash-out offers for open singles and accumulators, revalued in one vectorized pass per
+# match whenever its odds move.
+#
+# Every open bet is a ticket: a slot in flat arrays holding its potential payout, the sum
+# of the log implied probabilities of its open legs, the number of legs without a price
+# and its current offer. Every match keeps the legs booked on it as parallel arrays
+# (ticket slot, selection code, booked odds, current log probability). When the odds
+# snapshot (services/odds.py) applies new prices to a match, the new log probabilities of
+# all its legs are computed at once and their change is added to the tickets' sums:
+#
+#   offer = potential payout x product of current implied probabilities x (1 - CASHOUT_MARGIN)
+#
+# A bet has at most one leg per match, so a ticket appears once in each match's arrays and
+# plain fancy indexing updates it. GET /api/bets/{id}/cashout then reads one array slot,
+# after a primary-key read confirming the bet is still pending: settlement may have run
+# in another worker. System bets get no offer.
+#
+# When the snapshot drops a match (settled or deleted, in any worker) every bet with a leg
+# on it is closed. An accumulator that carries on is tracked again, with its settled legs,
+# on its next quote; one with a lost leg is not. Dropped matches are remembered until no
+# open bet has an unresolved leg on them (checked every CASHOUT_PRUNE_SECONDS).
+
+import asyncio
+import logging
+import math
+from typing import Any, Dict, List, Optional, Set
+import numpy as np
+from core.config import settings
+from db.codecs import to_object_id
+from db.mongodb import get_db, iter_cursor
+from services.odds import odds_snapshot
+from utils.bet_slip import ACCUMULATOR, SINGLE
+
+logger = logging.getLogger(__name__)
+
+WON = "won"
+LOST = "lost"
+VOID = "void"
+
+CASHOUT_TYPES = (SINGLE, ACCUMULATOR)
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+def _legs(bet: dict) -> List[Dict[str, Any]]:
+    if bet.get("legs"):
+        return bet["legs"]
+    return [{"match_id": bet["match_id"], "selection": bet.get("selection") or "", "odds": bet["odds"]}]
+
+class _MatchLegs:
+    """
+    Legs booked on one match, as parallel arrays (swap-removed, so rows stay dense).
+    """
+    def __init__(self, capacity: int = 64):
+        self.codes: Dict[str, int] = {}
+        self.ticket = np.zeros(capacity, dtype=np.int64)
+        self.code = np.zeros(capacity, dtype=np.int32)
+        self.odds = np.zeros(capacity)
+        self.logp = np.zeros(capacity)  # 0 while the leg has no price
+        self.missing = np.zeros(capacity, dtype=bool)
+        self.row_of: Dict[int, int] = {}
+        self.size = 0
+
+    def add(self, ticket: int, selection: str, odds: float, logp: Optional[float]) -> None:
+        if self.size == len(self.ticket):
+            for name in ("ticket", "code", "odds", "logp", "missing"):
+                setattr(self, name, _grow(getattr(self, name), self.size + 1))
+        row = self.size
+        self.ticket[row] = ticket
+        self.code[row] = self.codes.setdefault(selection, len(self.codes))
+        self.odds[row] = odds
+        self.logp[row] = 0.0 if logp is None else logp
+        self.missing[row] = logp is None
+        self.row_of[ticket] = row
+        self.size += 1
+
+    def remove(self, ticket: int) -> None:
+        row = self.row_of.pop(ticket)
+        last = self.size - 1
+        if row != last:
+            for array in (self.ticket, self.code, self.odds, self.logp, self.missing):
+                array[row] = array[last]
+            self.row_of[int(self.ticket[row])] = row
+        self.size = last
+
+class CashoutEngine:
+    """
+    Open tickets in flat arrays, with their legs indexed per match.
+    """
+    def __init__(self, margin: float = 0.05, capacity: int = 1024):
+        self.margin = margin
+        self.payout = np.zeros(capacity)
+        self.logp = np.zeros(capacity)
+        self.missing = np.zeros(capacity, dtype=np.int32)
+        self.offer = np.full(capacity, np.nan)
+        self._bet_ids: List[Optional[str]] = [None] * capacity
+        self._users: List[Optional[str]] = [None] * capacity
+        self._matches_of: Dict[int, List[str]] = {}
+        self._ticket_of: Dict[str, int] = {}
+        self._free: List[int] = list(range(capacity - 1, -1, -1))
+        self._matches: Dict[str, _MatchLegs] = {}
+        self._dropped: Set[str] = set()
+        self.revaluations = 0
+        self.revalued_legs = 0
+
+    def _slot(self) -> int:
+        if not self._free:
+            size = len(self.payout)
+            self.payout = _grow(self.payout, size + 1)
+            self.logp = _grow(self.logp, size + 1)
+            self.missing = _grow(self.missing, size + 1)
+            offer = np.full(len(self.payout), np.nan)
+            offer[:size] = self.offer
+            self.offer = offer
+            self._bet_ids.extend([None] * (len(self.payout) - size))
+            self._users.extend([None] * (len(self.payout) - size))
+            self._free = list(range(len(self.payout) - 1, size - 1, -1))
+        return self._free.pop()
+
+    def _reoffer(self, tickets: np.ndarray) -> None:
+        value = np.round(self.payout[tickets] * np.exp(self.logp[tickets]) * (1.0 - self.margin), 2)
+        self.offer[tickets] = np.where(self.missing[tickets] == 0, value, np.nan)
+
+    def add(self, bet: dict) -> bool:
+        """
+        Track an open bet (as stored, with its _id). Returns False for bets that get no offer.
+        """
+        bet_id = str(bet["_id"])
+        if bet.get("bet_type", SINGLE) not in CASHOUT_TYPES or bet_id in self._ticket_of:
+            return False
+        legs = _legs(bet)
+        if any(leg.get("result") == LOST for leg in legs):
+            # Already lost, settlement closes it once its last match is in
+            return False
+        if any(leg["match_id"] in self._dropped and leg.get("result") is None for leg in legs):
+            # A leg on a finished match still awaits its result from settlement
+            return False
+        ticket = self._slot()
+        stake = bet.get("bet_amount", bet.get("stake")) or 0.0
+        self.payout[ticket] = bet.get("potential_payout") or stake * bet["odds"]
+        self.logp[ticket] = 0.0
+        self.missing[ticket] = 0
+        for leg in legs:
+            if leg.get("result") is not None:
+                # Accumulator leg already settled: a won leg is certain, a void leg drops out of the payout
+                if leg["result"] == VOID:
+                    self.payout[ticket] /= leg["odds"]
+                continue
+            price = odds_snapshot.price(leg["match_id"], leg["selection"])
+            logp = -math.log(price["odds"]) if price else None
+            self._matches.setdefault(leg["match_id"], _MatchLegs()).add(ticket, leg["selection"], leg["odds"], logp)
+            self.logp[ticket] += logp or 0.0
+            self.missing[ticket] += logp is None
+        self._bet_ids[ticket] = bet_id
+        self._users[ticket] = str(bet["user_id"])
+        self._matches_of[ticket] = [leg["match_id"] for leg in legs if leg.get("result") is None]
+        self._ticket_of[bet_id] = ticket
+        self._reoffer(np.array([ticket]))
+        return True
+
+    def _close(self, ticket: int, skip: Optional[str] = None) -> None:
+        for match_id in self._matches_of.pop(ticket, []):
+            if match_id != skip and match_id in self._matches:
+                legs = self._matches[match_id]
+                legs.remove(ticket)
+                if legs.size == 0:
+                    del self._matches[match_id]
+        self._ticket_of.pop(self._bet_ids[ticket], None)
+        self._bet_ids[ticket] = None
+        self._users[ticket] = None
+        self.offer[ticket] = np.nan
+        self._free.append(ticket)
+
+    def reprice(self, match_id: str, odds: Dict[str, float]) -> int:
+        """
+        Revalue every leg on a match at its new odds. Returns the number of legs revalued.
+        """
+        legs = self._matches.get(match_id)
+        if legs is None or legs.size == 0:
+            return 0
+        n = legs.size
+        # Log implied probability per selection code, NaN where the selection has no price
+        probabilities = np.full(len(legs.codes), np.nan)
+        for selection, code in legs.codes.items():
+            price = odds.get(selection)
+            if price:
+                probabilities[code] = -math.log(price)
+        new = probabilities[legs.code[:n]]
+        missing = np.isnan(new)
+        new[missing] = 0.0
+        tickets = legs.ticket[:n]
+        self.logp[tickets] += new - legs.logp[:n]
+        self.missing[tickets] += missing.astype(np.int32) - legs.missing[:n]
+        legs.logp[:n] = new
+        legs.missing[:n] = missing
+        self._reoffer(tickets)
+        self.revaluations += 1
+        self.revalued_legs += n
+        return n
+
+    def on_odds(self, match_id: str, odds: Dict[str, float]) -> None:
+        """
+        Odds snapshot listener: revalue on new prices, close the match's bets when it is dropped.
+        """
+        if odds:
+            self.reprice(match_id, odds)
+        else:
+            self.drop(match_id)
+
+    def drop(self, match_id: str) -> int:
+        """
+        Close every bet with a leg on a match that no longer takes bets. Returns the number closed.
+        """
+        self._dropped.add(match_id)
+        legs = self._matches.pop(match_id, None)
+        if legs is None:
+            return 0
+        tickets = legs.ticket[:legs.size].tolist()
+        for ticket in tickets:
+            self._close(ticket, skip=match_id)
+        return len(tickets)
+
+    async def prune(self, db) -> int:
+        """
+        Forget dropped matches no open bet still has an unresolved leg on. Returns the number forgotten.
+        """
+        forgotten = 0
+        for match_id in list(self._dropped):
+            waiting = await db["bets"].find_one({"match_id": match_id, "$or": [{"status": "pending"}, {"bet_status": "pending"}]}, {"_id": 1})
+            if waiting is None:
+                waiting = await db["bets"].find_one(
+                    {"legs": {"$elemMatch": {"match_id": match_id, "result": {"$exists": False}}}, "status": "pending"}, {"_id": 1},
+                )
+            if waiting is None:
+                self._dropped.discard(match_id)
+                forgotten += 1
+        return forgotten
+
+    def discard(self, bet_id: str) -> None:
+        ticket = self._ticket_of.get(bet_id)
+        if ticket is not None:
+            self._close(ticket)
+
+    def quote(self, bet_id: str) -> Optional[Dict[str, Any]]:
+        ticket = self._ticket_of.get(bet_id)
+        if ticket is None:
+            return None
+        offer = self.offer[ticket]
+        return {
+            "bet_id": bet_id,
+            "user_id": self._users[ticket],
+            "available": not np.isnan(offer),
+            "cashout_value": None if np.isnan(offer) else float(offer),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "open_bets": len(self._ticket_of),
+            "matches": len(self._matches),
+            "dropped_matches": len(self._dropped),
+            "capacity": len(self.payout),
+            "margin": self.margin,
+            "revaluations": self.revaluations,
+            "revalued_legs": self.revalued_legs,
+        }
+
+    async def load(self, db) -> int:
+        """
+        Track every open single and accumulator. Returns the number of bets tracked.
+        """
+        query = {"status": "pending", "bet_type": {"$in": [None, *CASHOUT_TYPES]}}
+        count = 0
+        async for bet in iter_cursor(db["bets"].find(query)):
+            count += self.add(bet)
+        return count
+
+cashout_engine = CashoutEngine(settings.CASHOUT_MARGIN)
+_task: Optional[asyncio.Task] = None
+
+async def get_cashout_quote(db, bet_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+    """
+    The current offer for a bet of the user, or None when there is none (settled, a system bet, someone else's).
+    """
+    quote = cashout_engine.quote(bet_id)
+    # The offer is only as current as this worker's view of settlement: confirm the bet is still open
+    bet = await db["bets"].find_one({"_id": to_object_id(bet_id), "status": "pending"}, {"_id": 1} if quote else None)
+    if bet is None:
+        cashout_engine.discard(bet_id)
+        return None
+    if quote is None:
+        # Placed through another worker since this one loaded, or an accumulator past a settled leg
+        if not cashout_engine.add(bet):
+            return None
+        quote = cashout_engine.quote(bet_id)
+    if quote["user_id"] != str(user_id):
+        return None
+    return quote
+
+async def _prune_loop(db) -> None:
+    while True:
+        await asyncio.sleep(settings.CASHOUT_PRUNE_SECONDS)
+        try:
+            await cashout_engine.prune(db)
+        except Exception as e:
+            logger.error(f"Cash-out prune failed: {e}")
+
+# Track open bets and follow odds changes (app startup, after the odds snapshot)
+async def start_cashout_engine() -> None:
+    global _task
+    if not settings.CASHOUT_ENABLED or cashout_engine.on_odds in odds_snapshot.listeners:
+        return
+    odds_snapshot.listeners.append(cashout_engine.on_odds)
+    db = await get_db()
+    count = await cashout_engine.load(db)
+    logger.info(f"Cash-out engine tracking {count} open bets")
+    _task = asyncio.create_task(_prune_loop(db))
+
+async def stop_cashout_engine() -> None:
+    global _task
+    if cashout_engine.on_odds in odds_snapshot.listeners:
+        odds_snapshot.listeners.remove(cashout_engine.on_odds)
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
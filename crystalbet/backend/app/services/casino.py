@@ -2,9 +2,17 @@ from pymongo import MongoClient
 from bson import ObjectId
 from pymongo.errors import PyMongoError
 from fastapi import HTTPException
-from typing import List, Optional
+from typing import AsyncIterator, List, Optional, Tuple
+from db.mongodb import iter_cursor
+from utils.pagination import PageParams, paginate
+from utils.serialization import construct_model, construct_models
+from utils.cache import ReadThroughCache, page_key
+from core.config import settings
 from models.casino import CasinoGame, CasinoGameCreate, CasinoGameUpdate  # Importing the models
 
+# Game catalog cache, shared by every CasinoService instance
+casino_cache = ReadThroughCache("casino", ttl=settings.CASINO_CACHE_TTL_SECONDS)
+
 class CasinoService:
     def __init__(self, db: MongoClient):
         self.db = db
@@ -17,6 +25,7 @@ class CasinoService:
             game_dict = game_data.dict()
             result = await self.games_collection.insert_one(game_dict)
             game_dict["_id"] = str(result.inserted_id)  # Convert ObjectId to string
+            await casino_cache.invalidate_prefix("page:")
 
             # Return the newly created game as a CasinoGame object
             return CasinoGame(**game_dict)
@@ -26,31 +35,49 @@ class CasinoService:
     # Get a game by its ID
     async def get_game(self, game_id: str) -> CasinoGame:
         try:
-            # Fetch the game by its ObjectId
-            game = await self.games_collection.find_one({"_id": ObjectId(game_id)})
+            # Fetch the game by its ObjectId, through the catalog cache
+            game = await casino_cache.get(
+                f"game:{game_id}",
+                lambda: self.games_collection.find_one({"_id": ObjectId(game_id)}),
+            )
 
             if not game:
                 raise HTTPException(status_code=404, detail="Game not found")
 
-            # Return the game data as a CasinoGame object
-            return CasinoGame(**game)
+            # Trusted DB output, build the CasinoGame object without validation
+            return construct_model(CasinoGame, game)
         except PyMongoError as e:
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+        except HTTPException:
+            raise
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error fetching game: {str(e)}")
 
     # Get a list of all games
-    async def get_all_games(self, limit: int = 10, skip: int = 0) -> List[CasinoGame]:
+    # Get one page of raw game documents, trimmed to the projection
+    async def find_games(self, page: PageParams, projection: Optional[dict] = None) -> Tuple[List[dict], Optional[str]]:
         try:
-            # Fetch all games with pagination (limit and skip)
-            cursor = self.games_collection.find().skip(skip).limit(limit)
-            games = await cursor.to_list(length=limit)
+            return await casino_cache.get(
+                page_key(page, projection),
+                lambda: paginate(self.games_collection, {}, page, projection=projection),
+            )
+        except PyMongoError as e:
+            raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
-            # Convert each game to a CasinoGame object
-            return [CasinoGame(**game) for game in games]
+    async def get_all_games(self, page: PageParams, projection: Optional[dict] = None) -> Tuple[List[CasinoGame], Optional[str]]:
+        try:
+            # Fetch one page of games, resuming after the cursor position
+            games, next_cursor = await self.find_games(page, projection)
+
+            # Trusted DB output, build the CasinoGame objects without validation
+            return construct_models(CasinoGame, games), next_cursor
         except PyMongoError as e:
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    # Stream every game, one cursor batch at a time
+    def iter_games(self, batch_size: Optional[int] = None, projection: Optional[dict] = None) -> AsyncIterator[dict]:
+        return iter_cursor(self.games_collection.find({}, projection), batch_size)
+
     # Update a game by its ID
     async def update_game(self, game_id: str, game_update: CasinoGameUpdate) -> CasinoGame:
         try:
@@ -64,6 +91,7 @@ class CasinoService:
 
             if result.matched_count == 0:
                 raise HTTPException(status_code=404, detail="Game not found")
+            await self._invalidate(game_id)
 
             # Fetch the updated game and return it
             updated_game = await self.get_game(game_id)
@@ -71,6 +99,11 @@ class CasinoService:
         except PyMongoError as e:
             raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
 
+    # Drop a game and every cached page it may appear on
+    async def _invalidate(self, game_id: str):
+        await casino_cache.invalidate(f"game:{game_id}")
+        await casino_cache.invalidate_prefix("page:")
+
     # Delete a game by its ID
     async def delete_game(self, game_id: str) -> dict:
         try:
@@ -78,6 +111,7 @@ class CasinoService:
 
             if result.deleted_count == 0:
                 raise HTTPException(status_code=404, detail="Game not found")
+            await self._invalidate(game_id)
 
             # Return a success message
             return {"status": "success", "message": "Game deleted successfully"}
@@ -1,7 +1,7 @@
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional
 from bson import ObjectId
 from fastapi import HTTPException
-from db.mongodb import get_collection, get_db, find_one, insert_one, update_one, delete_one, is_valid_object_id  # Imported helper functions for MongoDB interaction
+from db.mongodb import get_collection, get_db, find_one, insert_one, update_one, delete_one, is_valid_object_id, iter_many  # Imported helper functions for MongoDB interaction
 from models.user import UserModel
 from models.bet import Bet
 from models.match import Match
@@ -11,10 +11,15 @@ from models.coupon import CouponModel
 from models.casino import CasinoGame
 from models.virtual import VirtualSport
 from models.admin import AdminContentModel
+from utils.cache import ReadThroughCache
+from core.config import settings
+
+# CMS content changes a few times a day and is read on every page load
+content_cache = ReadThroughCache("content", ttl=settings.CONTENT_CACHE_TTL_SECONDS)
 
 # Admin Services
 async def create_admin(admin_data: AdminContentModel):
-    collection = get_collection("admins")
+    collection = await get_collection("admins")
     result = await collection.insert_one(admin_data.model_dump())  # Use model_dump in Pydantic v2 for serialization
     return {"_id": str(result.inserted_id)}
 
@@ -22,16 +27,29 @@ async def get_admin(admin_id: str):
     if not is_valid_object_id(admin_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
     
-    collection = get_collection("admins")
+    collection = await get_collection("admins")
     admin = await collection.find_one({"_id": ObjectId(admin_id)})
     if admin:
-        return {**admin, "_id": str(admin["_id"])}
+        return admin
     
     raise HTTPException(status_code=404, detail="Admin not found")
 
+# CMS Content Services
+async def get_all_content(limit: Optional[int] = None) -> List[Dict]:
+    async def load():
+        collection = await get_collection("admin_content")
+        return await collection.find().to_list(limit)
+    return await content_cache.get(f"all:{limit}", load)
+
+async def invalidate_content():
+    await content_cache.clear()
+
+# Credentials never leave the database through the generic user lookup
+USER_SECRET_FIELDS = {"password": 0, "hashed_password": 0, "reset_token": 0, "reset_token_expiration": 0}
+
 # Authentication Services
 async def create_user(user_data: UserModel):
-    collection = get_collection("users")
+    collection = await get_collection("users")
     result = await collection.insert_one(user_data.model_dump())
     return {"_id": str(result.inserted_id)}
 
@@ -39,27 +57,30 @@ async def get_user(user_id: str):
     if not is_valid_object_id(user_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
     
-    collection = get_collection("users")
-    user = await collection.find_one({"_id": ObjectId(user_id)})
+    collection = await get_collection("users")
+    user = await collection.find_one({"_id": ObjectId(user_id)}, USER_SECRET_FIELDS)
     if user:
-        return {**user, "_id": str(user["_id"])}
+        return user
     
     raise HTTPException(status_code=404, detail="User not found")
 
 # Bet Services
 async def create_bet(bet_data: Bet):
-    collection = get_collection("bets")
+    collection = await get_collection("bets")
     result = await collection.insert_one(bet_data.model_dump())
     return {"_id": str(result.inserted_id)}
 
+# Stream every bet batch by batch instead of loading the collection
+async def iter_all_bets(query: Optional[Dict] = None, batch_size: Optional[int] = None) -> AsyncIterator[Dict]:
+    async for bet in iter_many("bets", query, batch_size=batch_size):
+        yield bet
+
 async def get_all_bets() -> List[Dict]:
-    collection = get_collection("bets")
-    bets = await collection.find().to_list(None)
-    return [{**bet, "_id": str(bet["_id"])} for bet in bets]
+    return [bet async for bet in iter_all_bets()]
 
 # Match Services
 async def create_match(match_data: Match):
-    collection = get_collection("matches")
+    collection = await get_collection("matches")
     result = await collection.insert_one(match_data.model_dump())
     return {"_id": str(result.inserted_id)}
 
@@ -67,16 +88,16 @@ async def get_match(match_id: str):
     if not is_valid_object_id(match_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
     
-    collection = get_collection("matches")
+    collection = await get_collection("matches")
     match = await collection.find_one({"_id": ObjectId(match_id)})
     if match:
-        return {**match, "_id": str(match["_id"])}
+        return match
     
     raise HTTPException(status_code=404, detail="Match not found")
 
 # Payment Services
 async def create_payment(payment_data: Payment):
-    collection = get_collection("payments")
+    collection = await get_collection("payments")
     result = await collection.insert_one(payment_data.model_dump())
     return {"_id": str(result.inserted_id)}
 
@@ -84,41 +105,45 @@ async def get_payment(payment_id: str):
     if not is_valid_object_id(payment_id):
         raise HTTPException(status_code=400, detail="Invalid ID format")
     
-    collection = get_collection("payments")
+    collection = await get_collection("payments")
     payment = await collection.find_one({"_id": ObjectId(payment_id)})
     if payment:
-        return {**payment, "_id": str(payment["_id"])}
+        return payment
     
     raise HTTPException(status_code=404, detail="Payment not found")
 
 # Transaction Services
 async def create_transaction(transaction_data: TransactionModel):
-    collection = get_collection("transactions")
+    collection = await get_collection("transactions")
     result = await collection.insert_one(transaction_data.model_dump())
     return {"_id": str(result.inserted_id)}
 
+async def iter_all_transactions(query: Optional[Dict] = None, batch_size: Optional[int] = None) -> AsyncIterator[Dict]:
+    async for transaction in iter_many("transactions", query, batch_size=batch_size):
+        yield transaction
+
 async def get_all_transactions() -> List[Dict]:
-    collection = get_collection("transactions")
-    transactions = await collection.find().to_list(None)
-    return [{**transaction, "_id": str(transaction["_id"])} for transaction in transactions]
+    return [transaction async for transaction in iter_all_transactions()]
 
 # Coupon Services
 async def validate_coupon(coupon_data: CouponModel):
-    collection = get_collection("coupons")
+    collection = await get_collection("coupons")
     coupon = await collection.find_one({"code": coupon_data.code})
     if coupon:
-        return {**coupon, "_id": str(coupon["_id"])}
+        return coupon
     
     raise HTTPException(status_code=404, detail="Coupon not found")
 
 # Casino Services
+async def iter_casino_games(query: Optional[Dict] = None, batch_size: Optional[int] = None) -> AsyncIterator[Dict]:
+    async for game in iter_many("casino", query, batch_size=batch_size):
+        yield game
+
 async def get_casino_games() -> List[Dict]:
-    collection = get_collection("casino")
-    games = await collection.find().to_list(None)
-    return [{**game, "_id": str(game["_id"])} for game in games]
+    return [game async for game in iter_casino_games()]
 
 # Virtual Sports Services
 async def get_virtual_sports() -> List[Dict]:
-    collection = get_collection("virtuals")
+    collection = await get_collection("virtuals")
     virtuals = await collection.find().to_list(None)
-    return [{**virtual, "_id": str(virtual["_id"])} for virtual in virtuals]
+    return virtuals
@@ -0,0 +1,323 @@
+# services/exposure.py
+#
+# Liability book: for every open outcome (match, selection), the stake taken and the
+# amount we pay out if it wins. The book is kept in memory and fed from `bets`, and
+# settlement drops the match, so reading the exposure of an outcome is one dict lookup
+# instead of a scan of `bets`.
+#
+# A multiple counts its full potential payout against every one of its legs: until the
+# other legs are settled, any of them may be the one that completes it.
+#
+# Every EXPOSURE_CHECKPOINT_SECONDS the pending bets stored since the book's watermark are
+# folded in with one streaming aggregation, whichever process placed them, and the
+# outcomes that changed are written to the `exposure` collection together with the new
+# watermark (in one transaction when the deployment supports them). The fold stops
+# EXPOSURE_FOLD_LAG_SECONDS short of now: an _id is taken before its insert lands, so a bet
+# still in flight may carry an _id older than bets already stored. At startup the book is
+# loaded from the checkpoint and folded forward the same way.
+#
+# The checkpoint is shared, so exactly one process keeps the book: the one holding the
+# lease in `exposure_checkpoints` ("owner", renewed at every checkpoint). Other processes
+# started with EXPOSURE_ENABLED take over, loading the checkpoint, once the owner's lease
+# runs out, and meanwhile answer exposure queries from the `exposure` collection.
+# Matches settled or deleted anywhere are released when the odds snapshot drops them.
+
+import asyncio
+import heapq
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+from bson import ObjectId
+from pymongo import DeleteOne, ReplaceOne
+from pymongo.errors import DuplicateKeyError
+from core.config import settings
+from db.codecs import to_object_id
+import db.mongodb as mongodb
+from db.mongodb import get_db, iter_cursor
+from services.odds import odds_snapshot
+
+logger = logging.getLogger(__name__)
+
+EXPOSURE = "exposure"
+EXPOSURE_CHECKPOINTS = "exposure_checkpoints"
+
+# Identifies this process in the owner lease
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+# Pending bets -> stake, liability and bet count per outcome. Singles have one outcome,
+# multiples one per leg.
+AGGREGATE_PIPELINE = [
+    {"$project": {
+        "stake": {"$ifNull": ["$stake", "$bet_amount"]},
+        "liability": {"$ifNull": ["$potential_payout", {"$multiply": [{"$ifNull": ["$stake", "$bet_amount"]}, "$odds"]}]},
+        "outcomes": {"$ifNull": ["$legs", [{"match_id": "$match_id", "selection": "$selection"}]]},
+    }},
+    {"$unwind": "$outcomes"},
+    {"$group": {
+        "_id": {"match_id": "$outcomes.match_id", "selection": "$outcomes.selection"},
+        "stake": {"$sum": "$stake"},
+        "liability": {"$sum": "$liability"},
+        "bets": {"$sum": 1},
+    }},
+]
+
+# Bets booked through models/bet keep their state in bet_status, through BetService in status
+PENDING_BETS = {"$or": [{"status": "pending"}, {"bet_status": "pending"}]}
+
+def _outcome(match_id: str, selection: str, entry: List[float]) -> Dict[str, Any]:
+    return {"match_id": match_id, "selection": selection, "stake": round(entry[0], 2), "liability": round(entry[1], 2), "bets": entry[2]}
+
+def _match(match_id: str, selections: Dict[str, List[float]]) -> Dict[str, Any]:
+    stake = sum(entry[0] for entry in selections.values())
+    outcomes = [_outcome(match_id, selection, entry) for selection, entry in selections.items()]
+    for outcome in outcomes:
+        outcome["net_if_wins"] = round(stake - outcome["liability"], 2)
+    return {"match_id": match_id, "stake": round(stake, 2), "outcomes": outcomes}
+
+class ExposureBook:
+    """
+    Stake, liability and bet count per outcome, grouped by match.
+    """
+    def __init__(self):
+        # match_id -> selection -> [stake, liability, bets]
+        self._matches: Dict[str, Dict[str, List[float]]] = {}
+        self._dirty: Set[Tuple[str, str]] = set()
+        self._released: Set[str] = set()
+        self.last_bet_id: Optional[str] = None
+        self.recording = False  # True while this process holds the owner lease
+
+    def _add(self, match_id: str, selection: str, stake: float, liability: float, bets: int) -> None:
+        entry = self._matches.setdefault(match_id, {}).setdefault(selection, [0.0, 0.0, 0])
+        entry[0] += stake
+        entry[1] += liability
+        entry[2] += bets
+        self._dirty.add((match_id, selection))
+
+    def release(self, match_id: str) -> None:
+        """
+        Drop a settled (or voided) match.
+        """
+        if self._matches.pop(match_id, None) is not None:
+            self._dirty = {key for key in self._dirty if key[0] != match_id}
+            self._released.add(match_id)
+
+    def outcome(self, match_id: str, selection: str) -> Optional[Dict[str, Any]]:
+        entry = self._matches.get(match_id, {}).get(selection)
+        if entry is None:
+            return None
+        return _outcome(match_id, selection, entry)
+
+    def match(self, match_id: str) -> Dict[str, Any]:
+        """
+        Every outcome of a match, with the book's result should it win (stakes taken minus payout).
+        """
+        return _match(match_id, self._matches.get(match_id, {}))
+
+    def top(self, n: int, key: str = "liability") -> List[Dict[str, Any]]:
+        """
+        The n outcomes with the largest liability (or stake, or bet count).
+        """
+        index = ("stake", "liability", "bets").index(key)
+        largest = heapq.nlargest(
+            n,
+            ((entry[index], match_id, selection) for match_id, selections in self._matches.items() for selection, entry in selections.items()),
+        )
+        return [self.outcome(match_id, selection) for _, match_id, selection in largest]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "matches": len(self._matches),
+            "outcomes": sum(len(selections) for selections in self._matches.values()),
+            "dirty": len(self._dirty),
+            "last_bet_id": self.last_bet_id,
+            "recording": self.recording,
+            "process": PROCESS_ID,
+        }
+
+    async def load(self, db) -> int:
+        """
+        Load the last checkpoint, then fold in the bets stored after it. Returns the number of outcomes.
+        """
+        self._matches.clear()
+        self._dirty.clear()
+        self._released.clear()
+        self.last_bet_id = None
+        checkpoint = await db[EXPOSURE_CHECKPOINTS].find_one({"_id": "book"})
+        if checkpoint is not None:
+            async for doc in iter_cursor(db[EXPOSURE].find({})):
+                self._matches.setdefault(doc["match_id"], {})[doc["selection"]] = [doc["stake"], doc["liability"], doc["bets"]]
+            self.last_bet_id = checkpoint.get("last_bet_id")
+        await self.fold(db)
+        return self.stats()["outcomes"]
+
+    async def fold(self, db) -> int:
+        """
+        Add the pending bets stored since the watermark. Returns the number of outcomes changed.
+        """
+        # Up to an _id made from the lagged clock, which becomes the new watermark
+        until = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=settings.EXPOSURE_FOLD_LAG_SECONDS))
+        if self.last_bet_id is not None and until <= to_object_id(self.last_bet_id):
+            return 0
+        bounds: Dict[str, Any] = {"$lt": until}
+        if self.last_bet_id is not None:
+            bounds["$gt"] = to_object_id(self.last_bet_id)
+        cursor = db["bets"].aggregate([{"$match": {**PENDING_BETS, "_id": bounds}}, *AGGREGATE_PIPELINE])
+        changed = 0
+        async for group in iter_cursor(cursor):
+            self._add(group["_id"]["match_id"], group["_id"].get("selection") or "", group["stake"], group["liability"], group["bets"])
+            changed += 1
+        self.last_bet_id = str(until)
+        return changed
+
+    async def checkpoint(self, db) -> int:
+        """
+        Write the outcomes changed since the last checkpoint. Returns the number written.
+        """
+        dirty, self._dirty = self._dirty, set()
+        released, self._released = self._released, set()
+        watermark = self.last_bet_id
+        now = datetime.utcnow()
+        operations: List[Any] = []
+        for match_id, selection in dirty:
+            entry = self._matches.get(match_id, {}).get(selection)
+            key = f"{match_id}:{selection}"
+            if entry is None:
+                operations.append(DeleteOne({"_id": key}))
+                continue
+            operations.append(ReplaceOne(
+                {"_id": key},
+                {"match_id": match_id, "selection": selection, "stake": entry[0], "liability": entry[1], "bets": entry[2], "updated_at": now},
+                upsert=True,
+            ))
+        try:
+            if settings.EXPOSURE_TRANSACTIONS and mongodb.client is not None:
+                # The outcomes and the watermark they cover are loaded together, so they are written together
+                async with await mongodb.client.start_session() as session:
+                    async with session.start_transaction():
+                        await self._write(db, released, operations, watermark, now, session=session)
+            else:
+                await self._write(db, released, operations, watermark, now)
+        except Exception:
+            # Retry the same outcomes next time
+            self._dirty |= dirty
+            self._released |= released
+            raise
+        return len(operations)
+
+    async def _write(self, db, released: Set[str], operations: List[Any], watermark: Optional[str], now: datetime, session: Any = None) -> None:
+        if released:
+            await db[EXPOSURE].delete_many({"match_id": {"$in": list(released)}}, session=session)
+        if operations:
+            await db[EXPOSURE].bulk_write(operations, ordered=False, session=session)
+        await db[EXPOSURE_CHECKPOINTS].update_one(
+            {"_id": "book"},
+            {"$set": {"last_bet_id": watermark, "updated_at": now}},
+            upsert=True,
+            session=session,
+        )
+
+    async def acquire(self, db) -> bool:
+        """
+        Take or renew the owner lease. Returns False while another live process holds it.
+        """
+        now = datetime.utcnow()
+        try:
+            await db[EXPOSURE_CHECKPOINTS].update_one(
+                {"_id": "owner", "$or": [{"process": PROCESS_ID}, {"lease_until": {"$lt": now}}]},
+                {"$set": {"process": PROCESS_ID, "lease_until": now + timedelta(seconds=3 * settings.EXPOSURE_CHECKPOINT_SECONDS)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The owner document exists and its lease is held by another process
+            return False
+        return True
+
+    async def resign(self, db) -> None:
+        self.recording = False
+        await db[EXPOSURE_CHECKPOINTS].delete_one({"_id": "owner", "process": PROCESS_ID})
+
+    def on_odds(self, match_id: str, odds: Dict[str, float]) -> None:
+        # The snapshot drops a match once it is finished or deleted, in whichever process that happened
+        if not odds:
+            self.release(match_id)
+
+_book = ExposureBook()
+_task: Optional[asyncio.Task] = None
+
+def get_exposure_book() -> ExposureBook:
+    return _book
+
+# Readers for any process: the book where this process keeps it, the last checkpoint otherwise
+
+async def top_exposures(db, n: int, key: str = "liability") -> List[Dict[str, Any]]:
+    if _book.recording:
+        return _book.top(n, key)
+    cursor = db[EXPOSURE].find({}).sort([(key, -1), ("_id", 1)]).limit(n)
+    return [_outcome(doc["match_id"], doc["selection"], [doc["stake"], doc["liability"], doc["bets"]]) async for doc in iter_cursor(cursor)]
+
+async def match_exposure(db, match_id: str) -> Dict[str, Any]:
+    if _book.recording:
+        return _book.match(match_id)
+    selections = {doc["selection"]: [doc["stake"], doc["liability"], doc["bets"]] async for doc in iter_cursor(db[EXPOSURE].find({"match_id": match_id}))}
+    return _match(match_id, selections)
+
+async def _take_over(db) -> bool:
+    # The lease first, so no other process loads and checkpoints meanwhile
+    if not await _book.acquire(db):
+        return False
+    _book.recording = True
+    outcomes = await _book.load(db)
+    logger.info(f"Exposure book loaded with {outcomes} open outcomes")
+    return True
+
+async def _checkpoint_loop(db) -> None:
+    while True:
+        await asyncio.sleep(settings.EXPOSURE_CHECKPOINT_SECONDS)
+        try:
+            if not _book.recording:
+                await _take_over(db)
+            elif not await _book.acquire(db):
+                # Stalled past the lease and another process took over: its book is the one checkpointed
+                _book.recording = False
+                logger.error("Exposure owner lease lost; this process stops recording exposure")
+            else:
+                await _book.fold(db)
+                await _book.checkpoint(db)
+        except Exception as e:
+            logger.error(f"Exposure checkpoint failed: {e}")
+
+# Rebuild the book and start checkpointing it, or stand by for the owner's lease (app startup)
+async def start_exposure_book() -> None:
+    global _task
+    if not settings.EXPOSURE_ENABLED or _task is not None:
+        return
+    db = await get_db()
+    if _book.on_odds not in odds_snapshot.listeners:
+        odds_snapshot.listeners.append(_book.on_odds)
+    if not await _take_over(db):
+        logger.warning("Exposure is recorded by another process; this one takes over if its lease runs out")
+    _task = asyncio.create_task(_checkpoint_loop(db))
+
+async def stop_exposure_book() -> None:
+    global _task
+    if _task is None:
+        return
+    _task.cancel()
+    try:
+        await _task
+    except asyncio.CancelledError:
+        pass
+    _task = None
+    if _book.on_odds in odds_snapshot.listeners:
+        odds_snapshot.listeners.remove(_book.on_odds)
+    if not _book.recording:
+        return
+    try:
+        db = await get_db()
+        await _book.checkpoint(db)
+        await _book.resign(db)
+    except Exception as e:
+        logger.error(f"Final exposure checkpoint failed: {e}")
@@ -1,44 +1,145 @@
 # services/match.py
-from models.match import Match
+from datetime import datetime, timedelta
 from schemas.match import MatchResponse, MatchCreate, MatchUpdate
 from motor.motor_asyncio import AsyncIOMotorCollection
-from bson import ObjectId
-from db.mongodb import get_db
+from db.mongodb import get_db, iter_cursor
+from utils.pagination import PageParams, paginate
+from utils.serialization import construct_model, construct_models
+from utils.cache import ReadThroughCache, page_key
+from db.codecs import to_object_id
+from core.config import settings
+from services.odds import ingest_odds, match_closed, odds_snapshot, odds_update, tombstone_match
+
+LIST_PREFIX = "list:"
+MATCH_PREFIX = "match:"
+
+# Shared by every MatchService instance (and every worker with CACHE_BACKEND=redis)
+match_cache = ReadThroughCache(
+    "matches",
+    ttl=settings.MATCH_CACHE_PREMATCH_TTL_SECONDS,
+)
 
 class MatchService:
     def __init__(self, collection: AsyncIOMotorCollection):
         self.collection = collection
 
-    async def get_all_matches(self):
-        matches = []
-        async for match in self.collection.find():
-            matches.append(MatchResponse(**match))
-        return matches
+    # One page of raw match documents ordered by kick-off time, trimmed to the projection
+    async def find_matches(self, page: PageParams, query: dict = None, projection: dict = None):
+        return await paginate(self.collection, query or {}, page, sort_key="start_time", projection=projection)
+
+    # One page of matches ordered by kick-off time
+    async def get_all_matches(self, page: PageParams, query: dict = None, projection: dict = None):
+        matches, next_cursor = await self.find_matches(page, query, projection)
+        # Documents come straight from our own collection, skip re-validating them
+        return construct_models(MatchResponse, matches), next_cursor
+
+    # Stream every match, one cursor batch at a time
+    def iter_matches(self, query: dict = None, batch_size: int = None, projection: dict = None):
+        return iter_cursor(self.collection.find(query or {}, projection), batch_size)
 
-    async def get_match(self, match_id: str):
-        match_data = await self.collection.find_one({"_id": ObjectId(match_id)})
+    async def find_match(self, match_id: str, projection: dict = None):
+        return await self.collection.find_one({"_id": to_object_id(match_id)}, projection)
+
+    async def get_match(self, match_id: str, projection: dict = None):
+        match_data = await self.find_match(match_id, projection)
         if match_data:
-            return MatchResponse(**match_data)
-
-    async def create_match(self, match_data: MatchCreate):
-        match = Match.from_dict(match_data.dict())
-        created_match = await MatchCreate(self.collection, match)
-        return MatchResponse(**created_match)
-
-    async def update_match(self, match_id: str, match_data: MatchUpdate):
-        updated_match = await self.collection.find_one_and_update(
-            {"_id": ObjectId(match_id)},
-            {"$set": match_data.dict()},
-            return_document=True
-        )
-        if updated_match:
-            return MatchResponse(**updated_match)
+            return construct_model(MatchResponse, match_data)
+
+    async def create_match(self, match_data):
+        data = dict(match_data) if isinstance(match_data, dict) else match_data.dict()
+        if data.get("odds") is not None:
+            # Stamped like any other odds write, so other workers' snapshots pick the match up
+            data = {**data, **odds_update(data["odds"])["$set"], "odds_version": 0}
+        # Mongo assigns the ObjectId that every lookup by id expects
+        result = await self.collection.insert_one(data)
+        created_match = {**data, "_id": str(result.inserted_id)}
+        odds_snapshot.apply_document(created_match)
+        await invalidate_match_cache()
+        return construct_model(MatchResponse, {**created_match, "id": created_match["_id"]})
 
-    async def delete_match(self, match_id: str):
-        result = await self.collection.delete_one({"_id": ObjectId(match_id)})
-        return result.deleted_count > 0
     async def update_match(self, match_id: str, match_data: dict):
-        result = await self.collection.update_one({"_id": match_id}, {"$set": match_data})
-        if result.matched_count == 0:
+        update = {"$set": match_data}
+        if match_data.get("odds") is not None:
+            # New prices get a new version for the odds snapshot
+            versioned = odds_update(match_data["odds"])
+            update = {"$set": {**match_data, **versioned["$set"]}, "$inc": versioned["$inc"]}
+        elif "status" in match_data:
+            # Stamped like an odds change, so other workers' snapshots see the status (and drop a finished match)
+            update = match_closed(match_data)
+        match = await self.collection.find_one_and_update({"_id": to_object_id(match_id)}, update, return_document=True)
+        if match is None:
             return None
-        return await self.get_match(match_id)
\ No newline at end of file
+        odds_snapshot.apply_document(match)
+        await invalidate_match_cache(match_id)
+        return construct_model(MatchResponse, match)
+
+    async def ingest_odds(self, updates: dict) -> int:
+        # Feed prices for many matches: one bulk write, then the snapshot and caches follow
+        modified = await ingest_odds(self.collection, updates)
+        for match_id in updates:
+            await match_cache.invalidate(f"{MATCH_PREFIX}{match_id}")
+        await match_cache.invalidate_prefix(LIST_PREFIX)
+        return modified
+
+    async def delete_match(self, match_id: str):
+        result = await self.collection.delete_one({"_id": to_object_id(match_id)})
+        if result.deleted_count:
+            await tombstone_match(self.collection.database, match_id)
+        odds_snapshot.remove(match_id)
+        await invalidate_match_cache(match_id)
+        return result.deleted_count > 0
+
+    # Catalog reads below are served from match_cache and only hit Mongo on a miss
+
+    async def _find_all(self, query: dict, projection: dict = None):
+        return await self.collection.find(query, projection).sort([("start_time", 1), ("_id", 1)]).to_list(length=None)
+
+    # Matches currently in play
+    async def get_live_matches(self):
+        return await match_cache.get(
+            f"{LIST_PREFIX}live",
+            lambda: self._find_all({"status": "live"}),
+            ttl=settings.MATCH_CACHE_LIVE_TTL_SECONDS,
+        )
+
+    # Matches kicking off today (start_time is stored as an ISO-8601 string)
+    async def get_todays_matches(self):
+        today = datetime.utcnow().date()
+        start, end = today.isoformat(), (today + timedelta(days=1)).isoformat()
+        return await match_cache.get(
+            f"{LIST_PREFIX}today:{start}",
+            lambda: self._find_all({"start_time": {"$gte": start, "$lt": end}}),
+        )
+
+    async def get_matches_by_category(self, category: str):
+        return await match_cache.get(
+            f"{LIST_PREFIX}sport:{category}",
+            lambda: self._find_all({"sport": category}),
+        )
+
+    # One match; live matches expire quickly, unknown ids are negatively cached for the short TTL
+    async def get_match_by_id(self, match_id: str):
+        return await match_cache.get(
+            f"{MATCH_PREFIX}{match_id}",
+            lambda: self.find_match(match_id),
+            ttl=_match_ttl,
+        )
+
+    # Cached first pages of the catalog listing, keyed by everything that shapes the result
+    async def find_matches_cached(self, page: PageParams, projection: dict = None):
+        return await match_cache.get(
+            f"{LIST_PREFIX}{page_key(page, projection)}",
+            lambda: self.find_matches(page, projection=projection),
+        )
+
+def _match_ttl(match) -> float:
+    if not match or match.get("status") == "live":
+        return settings.MATCH_CACHE_LIVE_TTL_SECONDS
+    return settings.MATCH_CACHE_PREMATCH_TTL_SECONDS
+
+# Drop every cached listing, and the match itself when given.
+# Listings are derived from many documents, so any write invalidates all of them.
+async def invalidate_match_cache(match_id: str = None):
+    if match_id:
+        await match_cache.invalidate(f"{MATCH_PREFIX}{match_id}")
+    await match_cache.invalidate_prefix(LIST_PREFIX)
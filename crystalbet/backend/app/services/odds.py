@@ -0,0 +1,239 @@
+# services/odds.py
+#
+# In-process snapshot of current prices for bet acceptance. Every match write that changes
+# `odds` bumps the match's `odds_version` and stamps `odds_updated_at`; the snapshot applies
+# a match only if its version is newer than the one it holds, so a late or replayed update
+# never overwrites a fresher price.
+#
+# Each (match, selection) entry stores the highest odds still accepted, the current price
+# raised by ODDS_TOLERANCE, so checking a selection is one dict lookup and one compare.
+# The snapshot is loaded at startup, kept current by the writes made in this process and,
+# for writes made by other workers, by polling the `odds_updated_at` index every
+# ODDS_REFRESH_SECONDS. A match missing from it (created since the last poll) costs one
+# read of its odds. Settling a match stamps it like an odds change, so the poll sees it
+# finished; deleting one leaves a tombstone in `match_tombstones` for the poll to find.
+#
+# Listeners (services/cashout.py) are called with a match id and its new prices whenever
+# the snapshot applies them, and with no prices when a match leaves it.
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from fastapi import HTTPException, status
+from pymongo import UpdateOne
+from core.config import settings
+from db.codecs import to_object_id
+from db.mongodb import get_db, iter_cursor
+
+logger = logging.getLogger(__name__)
+
+ODDS_PROJECTION = {"odds": 1, "odds_version": 1, "status": 1}
+
+MATCH_TOMBSTONES = "match_tombstones"
+
+class OddsSnapshot:
+    """
+    Current price, acceptance limit and version per (match, selection).
+    """
+    def __init__(self, tolerance: float = 0.0):
+        self.tolerance = tolerance
+        self._limits: Dict[Tuple[str, str], float] = {}
+        self._prices: Dict[str, Dict[str, float]] = {}
+        self._versions: Dict[str, int] = {}
+        self.refreshed_at: Optional[datetime] = None
+        self.applied = 0
+        self.stale = 0
+        self.misses = 0
+        self.rejected = 0
+        self.listeners: List[Callable[[str, Dict[str, float]], Any]] = []
+
+    def apply(self, match_id: str, odds: Dict[str, float], version: int) -> bool:
+        """
+        Replace the prices of a match, unless the snapshot already holds a newer version.
+        """
+        if version < self._versions.get(match_id, -1):
+            self.stale += 1
+            return False
+        for selection in self._prices.get(match_id, {}):
+            self._limits.pop((match_id, selection), None)
+        self._prices[match_id] = dict(odds)
+        self._versions[match_id] = version
+        for selection, price in odds.items():
+            self._limits[(match_id, selection)] = price * (1.0 + self.tolerance)
+        self.applied += 1
+        self._notify(match_id, odds)
+        return True
+
+    def apply_document(self, match: dict) -> None:
+        match_id = str(match["_id"])
+        if match.get("status") == "finished":
+            self.remove(match_id)
+        elif match.get("odds") is not None:
+            self.apply(match_id, match["odds"], match.get("odds_version", 0))
+
+    def remove(self, match_id: str) -> None:
+        for selection in self._prices.pop(match_id, {}):
+            self._limits.pop((match_id, selection), None)
+        if self._versions.pop(match_id, None) is not None:
+            self._notify(match_id, {})
+
+    def _notify(self, match_id: str, odds: Dict[str, float]) -> None:
+        for listener in self.listeners:
+            try:
+                listener(match_id, odds)
+            except Exception as e:
+                logger.error(f"Odds listener failed for match {match_id}: {e}")
+
+    def price(self, match_id: str, selection: str) -> Optional[Dict[str, Any]]:
+        prices = self._prices.get(match_id)
+        if prices is None or selection not in prices:
+            return None
+        return {"match_id": match_id, "selection": selection, "odds": prices[selection], "odds_version": self._versions[match_id]}
+
+    def reject(self, selections: Sequence[Any]) -> Tuple[List[Dict[str, Any]], List[Any]]:
+        """
+        Selections priced above what is accepted now, and selections whose match is not in the snapshot.
+        """
+        rejected, unknown = [], []
+        limits = self._limits
+        for selection in selections:
+            limit = limits.get((selection.match_id, selection.selection))
+            if limit is None:
+                if selection.match_id in self._versions:
+                    rejected.append({"match_id": selection.match_id, "selection": selection.selection, "requested": selection.odds, "odds": None})
+                else:
+                    unknown.append(selection)
+            elif selection.odds > limit:
+                rejected.append({**self.price(selection.match_id, selection.selection), "requested": selection.odds})
+        return rejected, unknown
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "matches": len(self._versions),
+            "selections": len(self._limits),
+            "tolerance": self.tolerance,
+            "refreshed_at": self.refreshed_at,
+            "applied": self.applied,
+            "stale": self.stale,
+            "misses": self.misses,
+            "rejected": self.rejected,
+        }
+
+    async def load(self, collection: Any, since: Optional[datetime] = None) -> int:
+        """
+        Apply every open match (or every match whose odds changed since `since`). Returns the number read.
+        """
+        started = datetime.utcnow()
+        if since is not None:
+            # Overlap the previous poll to allow for clock skew between workers; re-applying is harmless
+            query: Dict[str, Any] = {"odds_updated_at": {"$gt": since - timedelta(seconds=5)}}
+        else:
+            query = {"status": {"$ne": "finished"}, "odds": {"$exists": True}}
+        count = 0
+        async for match in iter_cursor(collection.find(query, ODDS_PROJECTION)):
+            self.apply_document(match)
+            count += 1
+        if since is not None:
+            # Matches deleted by other workers
+            deleted = {"deleted_at": {"$gt": since - timedelta(seconds=5)}}
+            async for tombstone in iter_cursor(collection.database[MATCH_TOMBSTONES].find(deleted)):
+                self.remove(tombstone["_id"])
+                count += 1
+        # Writes landing while the scan ran are picked up again by the next poll
+        self.refreshed_at = started
+        return count
+
+    async def check(self, selections: Sequence[Any], collection: Any = None) -> None:
+        """
+        Raise 409 with the current prices if any selection is no longer offered at its odds.
+        """
+        rejected, unknown = self.reject(selections)
+        if unknown:
+            self.misses += len(unknown)
+            if collection is None:
+                collection = (await get_db())["matches"]
+            match_ids = {to_object_id(selection.match_id) for selection in unknown}
+            async for match in iter_cursor(collection.find({"_id": {"$in": list(match_ids)}}, ODDS_PROJECTION)):
+                self.apply_document(match)
+            more, unavailable = self.reject(unknown)
+            rejected.extend(more)
+            rejected.extend(
+                {"match_id": selection.match_id, "selection": selection.selection, "requested": selection.odds, "odds": None}
+                for selection in unavailable
+            )
+        if rejected:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"message": "Odds have changed or a selection is no longer available.", "selections": rejected},
+            )
+
+odds_snapshot = OddsSnapshot(settings.ODDS_TOLERANCE)
+_task: Optional[asyncio.Task] = None
+
+def odds_update(odds: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Update document that replaces a match's odds and bumps their version.
+    """
+    return {"$set": {"odds": odds, "odds_updated_at": datetime.utcnow()}, "$inc": {"odds_version": 1}}
+
+def match_closed(fields: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Update document for a match that stops taking bets (settled): stamped like an odds change so other workers' snapshots drop it.
+    """
+    return {"$set": {**fields, "odds_updated_at": datetime.utcnow()}, "$inc": {"odds_version": 1}}
+
+async def tombstone_match(db: Any, match_id: str) -> None:
+    """
+    Record a deleted match for other workers' snapshots (expired by a TTL index).
+    """
+    await db[MATCH_TOMBSTONES].update_one({"_id": match_id}, {"$set": {"deleted_at": datetime.utcnow()}}, upsert=True)
+
+async def ingest_odds(collection: Any, updates: Dict[str, Dict[str, float]]) -> int:
+    """
+    Apply a batch of price updates from a feed (match id -> selection -> odds) in one bulk write.
+    """
+    if not updates:
+        return 0
+    now = datetime.utcnow()
+    # Per-selection $set so a feed may send only the prices that moved
+    result = await collection.bulk_write([
+        UpdateOne(
+            {"_id": to_object_id(match_id)},
+            {"$set": {**{f"odds.{selection}": price for selection, price in odds.items()}, "odds_updated_at": now}, "$inc": {"odds_version": 1}},
+        )
+        for match_id, odds in updates.items()
+    ], ordered=False)
+    async for match in iter_cursor(collection.find({"_id": {"$in": [to_object_id(match_id) for match_id in updates]}}, ODDS_PROJECTION)):
+        odds_snapshot.apply_document(match)
+    return result.modified_count
+
+async def _refresh_loop(collection: Any) -> None:
+    while True:
+        await asyncio.sleep(settings.ODDS_REFRESH_SECONDS)
+        try:
+            await odds_snapshot.load(collection, since=odds_snapshot.refreshed_at)
+        except Exception as e:
+            logger.error(f"Odds snapshot refresh failed: {e}")
+
+# Load the snapshot and keep it current (app startup)
+async def start_odds_snapshot() -> None:
+    global _task
+    # Also the price source of cash-out offers
+    if not (settings.ODDS_CHECK_ENABLED or settings.CASHOUT_ENABLED) or _task is not None:
+        return
+    collection = (await get_db())["matches"]
+    count = await odds_snapshot.load(collection)
+    logger.info(f"Odds snapshot loaded with {count} matches")
+    _task = asyncio.create_task(_refresh_loop(collection))
+
+async def stop_odds_snapshot() -> None:
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
@@ -0,0 +1,55 @@
+# services/one_time_token.py
+#
+# Single-use tokens mailed to users (password reset, email verification).
+# Only the SHA-256 digest is stored, in its own collection: a unique index on the digest
+# makes the lookup one index seek, and a TTL index removes expired tokens without
+# leaving fields behind on the user documents.
+
+import hashlib
+import secrets
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from core.config import settings
+
+ONE_TIME_TOKENS = "one_time_tokens"
+
+PASSWORD_RESET = "password_reset"
+EMAIL_VERIFICATION = "email_verification"
+
+def _digest(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+# Lifetime of a token of the given purpose
+def token_ttl(purpose: str) -> timedelta:
+    if purpose == PASSWORD_RESET:
+        return timedelta(minutes=settings.RESET_TOKEN_EXPIRE_MINUTES)
+    return timedelta(hours=settings.VERIFICATION_TOKEN_EXPIRE_HOURS)
+
+# Create a token for `user_id` and return it in the clear; it is never stored that way.
+# Earlier tokens of the same purpose for the user stop working.
+async def issue_token(db, purpose: str, user_id: Any, email: Optional[str] = None) -> str:
+    token = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db[ONE_TIME_TOKENS].delete_many({"user_id": str(user_id), "purpose": purpose})
+    await db[ONE_TIME_TOKENS].insert_one({
+        "digest": _digest(token),
+        "purpose": purpose,
+        "user_id": str(user_id),
+        "email": email,
+        "created_at": now,
+        # TTL index: MongoDB removes the token once this passes
+        "expires_at": now + token_ttl(purpose),
+    })
+    return token
+
+# Redeem a token: returns its document and deletes it in the same operation, or None
+# when it is unknown, already used, expired, or was issued for another purpose.
+async def consume_token(db, purpose: str, token: str) -> Optional[dict]:
+    if not token:
+        return None
+    # The TTL monitor runs once a minute, so the expiry is also part of the filter
+    return await db[ONE_TIME_TOKENS].find_one_and_delete({
+        "digest": _digest(token),
+        "purpose": purpose,
+        "expires_at": {"$gt": datetime.utcnow()},
+    })
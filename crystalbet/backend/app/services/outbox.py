@@ -0,0 +1,265 @@
+# services/outbox.py
+#
+# Durable email outbox. Request handlers only insert a rendered message into the
+# email_outbox collection; a background worker drains them in batches over one SMTP
+# connection it keeps open, so no request waits on the SMTP server and no message pays
+# for its own connect + STARTTLS + AUTH.
+#
+# Messages are claimed one at a time, right before they are sent: the claim sets
+# next_attempt_at a lease into the future, so a message held by a worker that died is
+# picked up again once the lease runs out, and a lease only ever has to cover one send
+# however slow the server is. The outcome is written with the claim's attempt count as
+# a fence, so a worker whose lease lapsed cannot overwrite a newer claim. Several workers
+# (one per app process) can share the collection.
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, Optional
+import aiosmtplib
+from pymongo import ReturnDocument
+from core.config import settings
+from db.codecs import to_object_id
+from db.mongodb import get_db
+
+logger = logging.getLogger(__name__)
+
+EMAIL_OUTBOX = "email_outbox"
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+
+# Queue a rendered message. Returns as soon as it is stored.
+async def enqueue_email(recipient_email: str, subject: str, body: str, db=None) -> str:
+    db = db if db is not None else await get_db()
+    now = datetime.utcnow()
+    result = await db[EMAIL_OUTBOX].insert_one({
+        "to": recipient_email,
+        "subject": subject,
+        "html": body,
+        "status": PENDING,
+        "attempts": 0,
+        "created_at": now,
+        "next_attempt_at": now,
+    })
+    if _worker is not None:
+        _worker.wake()
+    return str(result.inserted_id)
+
+def permanent_error(error: Exception) -> bool:
+    # 5xx replies (unknown mailbox, rejected sender) will not succeed on retry
+    if isinstance(error, aiosmtplib.SMTPRecipientsRefused):
+        return True
+    code = getattr(error, "code", None)
+    return isinstance(code, int) and 500 <= code < 600
+
+def render_mime(sender: str, recipient_email: str, subject: str, body: str) -> str:
+    msg = MIMEMultipart()
+    msg["From"] = sender
+    msg["To"] = recipient_email
+    msg["Subject"] = subject
+    msg.attach(MIMEText(body, "html"))
+    return msg.as_string()
+
+class SMTPConnection:
+    """
+    One SMTP session kept open across messages: connect, STARTTLS and AUTH happen once,
+    and again only after the server drops the connection.
+    """
+    def __init__(self):
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self.last_used = 0.0
+        self.connects = 0
+
+    @property
+    def connected(self) -> bool:
+        return self._smtp is not None and self._smtp.is_connected
+
+    async def _connection(self) -> aiosmtplib.SMTP:
+        if not self.connected:
+            smtp = aiosmtplib.SMTP(
+                hostname=settings.SMTP_SERVER,
+                port=settings.SMTP_PORT,
+                start_tls=settings.SMTP_START_TLS,
+                timeout=settings.SMTP_TIMEOUT_SECONDS,
+            )
+            await smtp.connect()
+            if settings.SMTP_USERNAME and settings.SMTP_PASSWORD:
+                await smtp.login(settings.SMTP_USERNAME, settings.SMTP_PASSWORD)
+            self._smtp = smtp
+            self.connects += 1
+        return self._smtp
+
+    async def close(self) -> None:
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None and smtp.is_connected:
+            try:
+                await smtp.quit()
+            except Exception:
+                smtp.close()
+
+    async def send(self, sender: str, recipient_email: str, content: str) -> Optional[Exception]:
+        """
+        Send one message; returns the error instead of raising so a batch continues.
+        """
+        # Second try on a fresh connection: the server may have dropped an idle one
+        for attempt in range(2):
+            try:
+                smtp = await self._connection()
+                await smtp.sendmail(sender, [recipient_email], content)
+                self.last_used = time.monotonic()
+                return None
+            except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, ConnectionError) as e:
+                await self.close()
+                if attempt:
+                    return e
+            except Exception as e:
+                if not permanent_error(e):
+                    # Unknown connection state after a transient error, start over on the next message
+                    await self.close()
+                return e
+
+class OutboxWorker:
+    """
+    Sends outbox messages over a reused SMTP connection, up to a batch per wakeup,
+    retrying failures with exponential backoff until OUTBOX_MAX_ATTEMPTS.
+    """
+    def __init__(self, db):
+        self.db = db
+        self.batch_size = settings.OUTBOX_BATCH_SIZE
+        self.poll_seconds = settings.OUTBOX_POLL_SECONDS
+        self.lease = timedelta(seconds=settings.OUTBOX_LEASE_SECONDS)
+        self.sender = settings.MAIL_FROM or settings.SMTP_USERNAME
+        self.smtp = SMTPConnection()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def wake(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.smtp.close()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                sent = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Database hiccup: keep the worker alive and try again on the next poll
+                logger.error(f"Email outbox batch failed: {e}")
+                sent = 0
+            if sent >= self.batch_size:
+                continue
+            if self.smtp.connected and time.monotonic() - self.smtp.last_used > settings.SMTP_IDLE_SECONDS:
+                await self.smtp.close()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        # Due pending messages, and messages whose sender's lease ran out
+        return await self.db[EMAIL_OUTBOX].find_one_and_update(
+            {"status": {"$in": [PENDING, SENDING]}, "next_attempt_at": {"$lte": now}},
+            {"$set": {"status": SENDING, "next_attempt_at": now + self.lease}, "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _send(self, message: dict) -> None:
+        content = render_mime(self.sender, message["to"], message["subject"], message["html"])
+        error = await self.smtp.send(self.sender, message["to"], content)
+        now = datetime.utcnow()
+        if error is None:
+            self.sent += 1
+            update = {"$set": {"status": SENT, "sent_at": now}, "$unset": {"next_attempt_at": "", "last_error": ""}}
+        elif permanent_error(error) or message["attempts"] >= settings.OUTBOX_MAX_ATTEMPTS:
+            self.failed += 1
+            logger.error(f"Email to {message['to']} failed permanently after {message['attempts']} attempts: {error}")
+            update = {"$set": {"status": FAILED, "failed_at": now, "last_error": str(error)}, "$unset": {"next_attempt_at": ""}}
+        else:
+            self.retried += 1
+            delay = min(settings.OUTBOX_BACKOFF_SECONDS * 2 ** (message["attempts"] - 1), settings.OUTBOX_BACKOFF_MAX_SECONDS)
+            # Jitter so messages that failed together do not retry together
+            delay *= random.uniform(0.8, 1.2)
+            update = {"$set": {"status": PENDING, "next_attempt_at": now + timedelta(seconds=delay), "last_error": str(error)}}
+        # Fenced on this claim: if the lease lapsed and another worker reclaimed the message, its outcome wins
+        result = await self.db[EMAIL_OUTBOX].update_one(
+            {"_id": to_object_id(message["_id"]), "status": SENDING, "attempts": message["attempts"]}, update
+        )
+        if result.matched_count == 0:
+            logger.warning(f"Email outbox lease on {message['_id']} lapsed during the send; outcome left to the new claim")
+
+    async def drain_once(self) -> int:
+        """
+        Claim and send up to a batch of messages, one claim per message. Returns the number of messages claimed.
+        """
+        count = 0
+        while count < self.batch_size:
+            message = await self._claim()
+            if message is None:
+                break
+            await self._send(message)
+            count += 1
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "connected": self.smtp.connected,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "connects": self.smtp.connects,
+        }
+
+_worker: Optional[OutboxWorker] = None
+
+# Start the sender in this process (app startup)
+async def start_outbox_worker() -> Optional[OutboxWorker]:
+    global _worker
+    if not settings.OUTBOX_WORKER_ENABLED:
+        return None
+    if _worker is None:
+        _worker = OutboxWorker(await get_db())
+        _worker.start()
+    return _worker
+
+async def stop_outbox_worker() -> None:
+    global _worker
+    if _worker is not None:
+        await _worker.stop()
+        _worker = None
+
+async def outbox_stats() -> Dict[str, Any]:
+    """
+    Messages per status in the outbox, plus this process's sender counters.
+    """
+    db = await get_db()
+    # One index count per status rather than a $group over the whole collection
+    counts = {state: await db[EMAIL_OUTBOX].count_documents({"status": state}) for state in (PENDING, SENDING, SENT, FAILED)}
+    return {"queue": counts, "worker": _worker.stats() if _worker is not None else None}
@@ -0,0 +1,100 @@
+# services/session.py
+#
+# Refresh-token sessions. A login opens a session; the client then trades its refresh
+# token for a new access token at /api/auth/refresh instead of sending the password
+# again, which costs an indexed lookup on the session id rather than a bcrypt run.
+#
+# A refresh token is "<session id>.<secret>". Only the SHA-256 of the current secret is
+# stored, and every refresh rotates it. Presenting a secret that was already rotated
+# means the token was copied, so the whole session is revoked.
+
+import hashlib
+import hmac
+import logging
+import secrets
+from datetime import datetime, timedelta
+from typing import Tuple
+from fastapi import HTTPException, status
+from core.config import settings
+
+logger = logging.getLogger(__name__)
+
+SESSIONS = "sessions"
+
+def _digest(secret: str) -> str:
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+def _split(refresh_token: str) -> Tuple[str, str]:
+    session_id, _, secret = (refresh_token or "").partition(".")
+    if not session_id or not secret:
+        raise _invalid()
+    return session_id, secret
+
+def _invalid(detail: str = "Invalid or expired refresh token.") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+# Open a session for a freshly authenticated user and return its first refresh token.
+# `claims` are the access token claims, reissued on every refresh without reading the user.
+async def create_session(db, claims: dict) -> str:
+    session_id = secrets.token_urlsafe(16)
+    secret = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db[SESSIONS].insert_one({
+        "_id": session_id,
+        "user_id": claims["sub"],
+        "claims": claims,
+        "token_hash": _digest(secret),
+        "rotations": 0,
+        "created_at": now,
+        "last_used_at": now,
+        # TTL index: MongoDB removes the session once this passes
+        "expires_at": now + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS),
+    })
+    return f"{session_id}.{secret}"
+
+# Trade a refresh token for (access token claims, next refresh token)
+async def rotate_session(db, refresh_token: str) -> Tuple[dict, str]:
+    session_id, secret = _split(refresh_token)
+    session = await db[SESSIONS].find_one({"_id": session_id})
+    now = datetime.utcnow()
+    # The TTL monitor runs once a minute, so an expired session can still be found
+    if not session or session["expires_at"] <= now:
+        raise _invalid()
+
+    presented = _digest(secret)
+    if not hmac.compare_digest(presented, session["token_hash"]):
+        await _revoke_reused(db, session)
+        raise _invalid("Refresh token reuse detected, please log in again.")
+
+    next_secret = secrets.token_urlsafe(32)
+    # Conditional on the presented hash: of two concurrent refreshes with one token, one wins
+    result = await db[SESSIONS].update_one(
+        {"_id": session_id, "token_hash": presented},
+        {"$set": {"token_hash": _digest(next_secret), "last_used_at": now}, "$inc": {"rotations": 1}},
+    )
+    if result.modified_count == 0:
+        await _revoke_reused(db, session)
+        raise _invalid("Refresh token reuse detected, please log in again.")
+    return session["claims"], f"{session_id}.{next_secret}"
+
+async def _revoke_reused(db, session: dict):
+    logger.warning(f"Refresh token reuse on session {session['_id']} of user {session['user_id']}, revoking it")
+    await db[SESSIONS].delete_one({"_id": session["_id"]})
+    # Access tokens minted from the stolen refresh token die with the session
+    from services.auth import revoke_user_tokens
+    revoke_user_tokens(session["user_id"])
+
+# End one session (logout). Unknown or already rotated tokens are ignored.
+async def end_session(db, refresh_token: str) -> bool:
+    session_id, secret = _split(refresh_token)
+    result = await db[SESSIONS].delete_one({"_id": session_id, "token_hash": _digest(secret)})
+    return result.deleted_count > 0
+
+# End every session of a user (password, role or status change, deletion)
+async def revoke_user_sessions(db, user_id: str) -> int:
+    result = await db[SESSIONS].delete_many({"user_id": str(user_id)})
+    return result.deleted_count
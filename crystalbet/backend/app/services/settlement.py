@@ -0,0 +1,394 @@
+# services/settlement.py
+#
+# Settles every open bet on a finished match. Pending bets are streamed from the
+# (match_id, status, _id) and (match_id, bet_status, _id) indexes and settled in batches:
+#
+#   1. outcomes and payouts for the whole batch in one NumPy pass over odds and stakes
+#   2. bets updated with an unordered bulk_write (lost bets in one $in update, since
+#      they all get the same fields)
+#   3. a ledger entry per paid bet in `transactions`, with the deterministic _id
+#      "settlement:<bet id>", and one balance $inc per user in the batch
+#   4. the checkpoint in `settlements` (last bet _id, running totals and a heartbeat)
+#
+# Bets booked through models/bet keep their state in bet_status, bets booked through
+# BetService in status; each bet is settled in the field it has. Bets stored before either
+# field existed (neither set) are marked pending in status when their match is settled.
+#
+# One run per match at a time: settle_match claims the checkpoint, and a claim whose
+# heartbeat is older than SETTLEMENT_LEASE_SECONDS can be taken over.
+#
+# Accumulators and system bets then get this match's result on their legs, and those
+# with every leg resolved are paid through the same steps (see utils/bet_slip.py).
+#
+# With SETTLEMENT_TRANSACTIONS (the default, needs a replica set such as Atlas) the four
+# steps of a batch commit atomically, so a rerun after a crash settles exactly the bets
+# that are still pending and credits nothing twice. Without it the ledger is written
+# first (entries pending), each entry is credited once through a marker on the user, and
+# the bets are marked settled last, so a rerun completes an interrupted batch.
+
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import numpy as np
+from fastapi import HTTPException, status
+from pymongo import InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from core.config import settings
+from db.codecs import to_object_id
+import db.mongodb as mongodb
+from services.exposure import get_exposure_book
+from services.match import invalidate_match_cache
+from services.odds import match_closed, odds_snapshot
+from utils.bet_slip import slip_payout
+
+logger = logging.getLogger(__name__)
+
+SETTLEMENTS = "settlements"
+
+PENDING = "pending"
+WON = "won"
+LOST = "lost"
+VOID = "void"
+
+# Outcome codes used in the vectorized pass, indexed into OUTCOMES
+_LOST, _WON, _VOID = 0, 1, 2
+OUTCOMES = np.array([LOST, WON, VOID])
+
+BET_PROJECTION = {"_id": 1, "user_id": 1, "selection": 1, "odds": 1, "bet_amount": 1, "stake": 1, "status": 1, "bet_status": 1}
+MULTIPLE_PROJECTION = {"_id": 1, "user_id": 1, "legs": 1, "folds": 1, "line_stake": 1, "stake": 1}
+
+def ledger_id(bet_id: str) -> str:
+    return f"settlement:{bet_id}"
+
+def status_field(bet: dict) -> str:
+    # models/bet bets carry bet_status, BetService bets carry status
+    return "bet_status" if "bet_status" in bet else "status"
+
+def pending_bets(match_id: str) -> Dict[str, Any]:
+    return {"match_id": match_id, "$or": [{"status": PENDING}, {"bet_status": PENDING}]}
+
+def settle_batch(bets: List[dict], winning: Iterable[str], void: Iterable[str] = (), void_all: bool = False) -> Dict[str, np.ndarray]:
+    """
+    Outcome code and payout of every bet in the batch.
+    Won bets pay stake x odds, void bets (void selection, missing selection or void match) return the stake.
+    """
+    count = len(bets)
+    odds = np.fromiter((bet.get("odds") or 0.0 for bet in bets), dtype=np.float64, count=count)
+    # Bets booked through models/bet carry bet_amount, bets booked through BetService carry stake
+    stakes = np.fromiter((bet.get("bet_amount", bet.get("stake")) or 0.0 for bet in bets), dtype=np.float64, count=count)
+    labels, codes = np.unique(np.array([bet.get("selection") or "" for bet in bets], dtype=object), return_inverse=True)
+
+    # Decide once per distinct selection, then broadcast to the bets
+    label_won = np.isin(labels, list(winning))
+    label_void = np.isin(labels, list(void)) | (labels == "")
+    won = label_won[codes]
+    voided = label_void[codes] | np.full(count, void_all)
+    won &= ~voided
+
+    outcome = np.where(won, _WON, np.where(voided, _VOID, _LOST))
+    payout = np.where(won, np.round(stakes * odds, 2), np.where(voided, stakes, 0.0))
+    return {"outcome": outcome, "payout": payout, "stake": stakes}
+
+def settle_multiples(bets: List[dict]) -> Dict[str, np.ndarray]:
+    """
+    Outcome code and payout of accumulators and system bets whose legs all have a result.
+    """
+    outcome = np.empty(len(bets), dtype=np.int64)
+    payout = np.empty(len(bets))
+    for i, bet in enumerate(bets):
+        results = [leg["result"] for leg in bet["legs"]]
+        # Won legs pay their odds, void legs 1 (the line rolls on), lost legs 0
+        odds = [leg["odds"] if leg["result"] == WON else 1.0 if leg["result"] == VOID else 0.0 for leg in bet["legs"]]
+        payout[i] = slip_payout(odds, bet["line_stake"], bet["folds"])
+        outcome[i] = _VOID if all(result == VOID for result in results) else _WON if payout[i] > 0 else _LOST
+    stakes = np.fromiter((bet["stake"] for bet in bets), dtype=np.float64, count=len(bets))
+    return {"outcome": outcome, "payout": payout, "stake": stakes}
+
+class SettlementRun:
+    """
+    Settles one match from its checkpoint.
+    """
+    def __init__(self, db, match_id: str, winning: List[str], void: List[str], void_all: bool):
+        self.db = db
+        self.match_id = match_id
+        self.winning = winning
+        self.void = void
+        self.void_all = void_all
+        self.batch_size = settings.SETTLEMENT_BATCH_SIZE
+
+    def _bet_operations(self, bets: List[dict], outcome: np.ndarray, payout: np.ndarray, now: datetime) -> List[Any]:
+        # Only pending bets are touched, which keeps a rerun from settling twice
+        bet_ids = [bet["_id"] for bet in bets]
+        fields = [status_field(bet) for bet in bets]
+        operations: List[Any] = []
+        for field in sorted(set(fields)):
+            lost = [to_object_id(bet_ids[i]) for i in np.flatnonzero(outcome == _LOST) if fields[i] == field]
+            if lost:
+                operations.append(UpdateMany(
+                    {"_id": {"$in": lost}, field: PENDING},
+                    {"$set": {field: LOST, "payout": 0.0, "settled_at": now}},
+                ))
+        for i in np.flatnonzero(outcome != _LOST):
+            operations.append(UpdateOne(
+                {"_id": to_object_id(bet_ids[i]), fields[i]: PENDING},
+                {"$set": {fields[i]: str(OUTCOMES[outcome[i]]), "payout": float(payout[i]), "settled_at": now}},
+            ))
+        return operations
+
+    def _ledger_entries(self, bets: List[dict], outcome: np.ndarray, payout: np.ndarray, now: datetime, entry_status: str) -> List[dict]:
+        # One entry per bet that pays out
+        return [{
+            "_id": ledger_id(bets[i]["_id"]),
+            "user_id": bets[i]["user_id"],
+            "amount": float(payout[i]),
+            "type": "bet_refund" if outcome[i] == _VOID else "bet_payout",
+            "status": entry_status,
+            "bet_id": bets[i]["_id"],
+            "match_id": self.match_id,
+            "created_at": now,
+        } for i in np.flatnonzero((outcome != _LOST) & (payout > 0))]
+
+    async def _checkpoint(self, bets: List[dict], result: Dict[str, np.ndarray], resume: bool, now: datetime, session: Any = None) -> Dict[str, Any]:
+        outcome, payout = result["outcome"], result["payout"]
+        totals = {
+            "settled": len(bets),
+            "won": int(np.count_nonzero(outcome == _WON)),
+            "lost": int(np.count_nonzero(outcome == _LOST)),
+            "void": int(np.count_nonzero(outcome == _VOID)),
+            "stake_total": float(np.round(result["stake"].sum(), 2)),
+            "payout_total": float(np.round(payout.sum(), 2)),
+        }
+        progress: Dict[str, Any] = {"updated_at": now, "heartbeat_at": now}
+        if resume:
+            progress["last_bet_id"] = to_object_id(bets[-1]["_id"])
+        await self.db[SETTLEMENTS].update_one(
+            {"_id": self.match_id},
+            {"$set": progress, "$inc": totals},
+            session=session,
+        )
+        return totals
+
+    async def _apply(self, bets: List[dict], result: Dict[str, np.ndarray], resume: bool = True, session: Any = None) -> Dict[str, Any]:
+        # Inside a transaction: the order of the steps does not matter
+        now = datetime.utcnow()
+        outcome, payout = result["outcome"], result["payout"]
+        operations = self._bet_operations(bets, outcome, payout, now)
+        if operations:
+            await self.db["bets"].bulk_write(operations, ordered=False, session=session)
+
+        # Ledger and wallet credits for bets that pay out
+        entries = self._ledger_entries(bets, outcome, payout, now, "completed")
+        if entries:
+            await self.db["transactions"].bulk_write([InsertOne(entry) for entry in entries], ordered=False, session=session)
+
+            users, inverse = np.unique(np.array([entry["user_id"] for entry in entries], dtype=object), return_inverse=True)
+            credits = np.round(np.bincount(inverse, weights=[entry["amount"] for entry in entries]), 2)
+            await self.db["users"].bulk_write([
+                UpdateOne({"_id": to_object_id(user_id)}, {"$inc": {"balance": float(credit)}})
+                for user_id, credit in zip(users, credits)
+            ], ordered=False, session=session)
+
+        return await self._checkpoint(bets, result, resume, now, session=session)
+
+    async def _apply_sequential(self, bets: List[dict], result: Dict[str, np.ndarray], resume: bool = True) -> Dict[str, Any]:
+        # Without a transaction each step must be safe to repeat after a crash: the ledger is
+        # written first, every entry is credited exactly once, and the bets are marked settled
+        # last, so a rerun still sees them pending and finishes the batch.
+        now = datetime.utcnow()
+        outcome, payout = result["outcome"], result["payout"]
+        entries = self._ledger_entries(bets, outcome, payout, now, PENDING)
+        if entries:
+            try:
+                await self.db["transactions"].insert_many(entries, ordered=False)
+            except BulkWriteError as e:
+                # Entries already written by an interrupted run; _credit finds the ones it did not credit
+                if any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                    raise
+            await self._credit(entries)
+
+        operations = self._bet_operations(bets, outcome, payout, now)
+        if operations:
+            await self.db["bets"].bulk_write(operations, ordered=False)
+        # A crash before this line leaves the batch out of the running totals (its bets are no longer pending)
+        return await self._checkpoint(bets, result, resume, now)
+
+    async def _credit(self, entries: List[dict]) -> None:
+        # Credit the ledger entries still pending: written just now, or by an interrupted run.
+        # A credit pushes its entry ids onto the user in the same update as the $inc, so an
+        # entry credited before the crash is recognised and not paid again.
+        entry_ids = [entry["_id"] for entry in entries]
+        users = sorted({str(entry["user_id"]) for entry in entries})
+        user_ids = [to_object_id(user_id) for user_id in users]
+        due: Dict[str, List[dict]] = {}
+        cursor = self.db["transactions"].find({"_id": {"$in": entry_ids}, "status": PENDING}, {"user_id": 1, "amount": 1})
+        async for entry in mongodb.iter_cursor(cursor, self.batch_size):
+            due.setdefault(str(entry["user_id"]), []).append(entry)
+        if due:
+            credited = set()
+            cursor = self.db["users"].find({"_id": {"$in": user_ids}, "settlement_credits": {"$in": entry_ids}}, {"settlement_credits": 1})
+            async for user in mongodb.iter_cursor(cursor, self.batch_size):
+                credited.update(user["settlement_credits"])
+            operations = []
+            for user_id, user_entries in due.items():
+                fresh = [entry for entry in user_entries if entry["_id"] not in credited]
+                if fresh:
+                    ids = [entry["_id"] for entry in fresh]
+                    operations.append(UpdateOne(
+                        {"_id": to_object_id(user_id), "settlement_credits": {"$nin": ids}},
+                        {"$inc": {"balance": round(sum(entry["amount"] for entry in fresh), 2)}, "$push": {"settlement_credits": {"$each": ids}}},
+                    ))
+            if operations:
+                await self.db["users"].bulk_write(operations, ordered=False)
+            await self.db["transactions"].update_many(
+                {"_id": {"$in": [entry["_id"] for entries in due.values() for entry in entries]}},
+                {"$set": {"status": "completed"}},
+            )
+        # Markers are only needed until their entries are completed
+        await self.db["users"].update_many(
+            {"_id": {"$in": user_ids}, "settlement_credits": {"$in": entry_ids}},
+            {"$pull": {"settlement_credits": {"$in": entry_ids}}},
+        )
+
+    async def _commit(self, bets: List[dict], result: Dict[str, np.ndarray], resume: bool = True) -> None:
+        if not settings.SETTLEMENT_TRANSACTIONS or mongodb.client is None:
+            await self._apply_sequential(bets, result, resume)
+            return
+        async with await mongodb.client.start_session() as session:
+            async with session.start_transaction():
+                await self._apply(bets, result, resume, session=session)
+
+    async def _resolve_legs(self) -> None:
+        # Record this match's result on the legs of open multiples. Only legs without a
+        # result are touched and void takes precedence, as for singles, so a rerun is a no-op.
+        open_multiples = {"legs.match_id": self.match_id, "status": PENDING}
+        unresolved = {"leg.match_id": self.match_id, "leg.result": {"$exists": False}}
+        operations = []
+        if self.void_all:
+            operations.append(UpdateMany(open_multiples, {"$set": {"legs.$[leg].result": VOID}}, array_filters=[unresolved]))
+        else:
+            if self.void:
+                operations.append(UpdateMany(
+                    open_multiples, {"$set": {"legs.$[leg].result": VOID}},
+                    array_filters=[{**unresolved, "leg.selection": {"$in": self.void}}],
+                ))
+            if self.winning:
+                operations.append(UpdateMany(
+                    open_multiples, {"$set": {"legs.$[leg].result": WON}},
+                    array_filters=[{**unresolved, "leg.selection": {"$in": self.winning}}],
+                ))
+            operations.append(UpdateMany(open_multiples, {"$set": {"legs.$[leg].result": LOST}}, array_filters=[unresolved]))
+        await self.db["bets"].bulk_write(operations, ordered=True)
+
+    async def _settle_multiples(self) -> int:
+        await self._resolve_legs()
+        # Multiples on this match with no leg left open; others wait for their last match
+        query = {
+            "legs.match_id": self.match_id,
+            "status": PENDING,
+            "legs": {"$not": {"$elemMatch": {"result": {"$exists": False}}}},
+        }
+        cursor = self.db["bets"].find(query, MULTIPLE_PROJECTION).sort("_id", 1)
+        return await self._settle_stream(cursor, settle_multiples, resume=False)
+
+    async def _settle_stream(self, cursor: Any, settle: Callable[[List[dict]], Dict[str, np.ndarray]], resume: bool = True) -> int:
+        batch: List[dict] = []
+        settled = 0
+        async for bet in mongodb.iter_cursor(cursor, self.batch_size):
+            batch.append(bet)
+            if len(batch) >= self.batch_size:
+                await self._commit(batch, settle(batch), resume)
+                settled += len(batch)
+                batch = []
+        if batch:
+            await self._commit(batch, settle(batch), resume)
+            settled += len(batch)
+        return settled
+
+    async def run(self, checkpoint: dict) -> dict:
+        started = time.monotonic()
+        # Bets stored before status fields existed are open: mark them so they are selected below
+        await self.db["bets"].update_many(
+            {"match_id": self.match_id, "status": {"$exists": False}, "bet_status": {"$exists": False}},
+            {"$set": {"status": PENDING}},
+        )
+        query = pending_bets(self.match_id)
+        if checkpoint.get("last_bet_id") is not None:
+            query["_id"] = {"$gt": to_object_id(checkpoint["last_bet_id"])}
+        cursor = self.db["bets"].find(query, BET_PROJECTION).sort("_id", 1)
+        settled = await self._settle_stream(cursor, lambda batch: settle_batch(batch, self.winning, self.void, self.void_all))
+        settled += await self._settle_multiples()
+
+        elapsed = time.monotonic() - started
+        summary = await self.db[SETTLEMENTS].find_one_and_update(
+            {"_id": self.match_id},
+            {"$set": {
+                "status": "completed",
+                "finished_at": datetime.utcnow(),
+                "bets_per_second": round(settled / elapsed, 1) if elapsed > 0 else None,
+            }},
+            return_document=True,
+        )
+        logger.info(f"Settled {settled} bets on match {self.match_id} in {elapsed:.2f}s")
+        return summary
+
+async def settle_match(db, match_id: str, winning: List[str], void: Optional[List[str]] = None, void_all: bool = False) -> dict:
+    """
+    Record the result of a match and settle its open bets. Calling it again with the same
+    result resumes an interrupted run, or settles bets still pending after a finished one;
+    a different result is refused.
+    """
+    result = {"winning": sorted(winning), "void": sorted(void or []), "void_all": void_all}
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=settings.SETTLEMENT_LEASE_SECONDS)
+    # Claim atomically, creating the checkpoint on the first call. A run still heartbeating
+    # or a different result leaves the filter unmatched, and the upsert then hits the _id.
+    try:
+        previous = await db[SETTLEMENTS].find_one_and_update(
+            {"_id": match_id, "result": result, "$or": [{"status": {"$ne": "running"}}, {"heartbeat_at": {"$lt": stale}}]},
+            {
+                "$set": {"status": "running", "heartbeat_at": now},
+                "$unset": {"last_error": ""},
+                "$setOnInsert": {
+                    "started_at": now,
+                    "last_bet_id": None,
+                    "settled": 0, "won": 0, "lost": 0, "void": 0, "stake_total": 0.0, "payout_total": 0.0,
+                },
+            },
+            upsert=True,
+            return_document=ReturnDocument.BEFORE,
+        )
+    except DuplicateKeyError:
+        existing = await db[SETTLEMENTS].find_one({"_id": match_id}, {"result": 1})
+        if existing is not None and existing["result"] != result:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Match was already settled with a different result.",
+            )
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Match is being settled.")
+
+    # A finished run is scanned again from the start: bets accepted while it ran are still pending
+    resume = previous is not None and previous["status"] != "completed"
+    checkpoint = {"last_bet_id": previous.get("last_bet_id") if resume else None}
+
+    await db["matches"].update_one(
+        {"_id": to_object_id(match_id)},
+        match_closed({"status": "finished", "result": result}),
+    )
+    odds_snapshot.remove(match_id)
+    await invalidate_match_cache(match_id)
+    try:
+        summary = await SettlementRun(db, match_id, result["winning"], result["void"], void_all).run(checkpoint)
+    except Exception as e:
+        # Frees the claim at once; the next call resumes from the checkpoint
+        await db[SETTLEMENTS].update_one({"_id": match_id}, {"$set": {"status": "failed", "last_error": str(e)}})
+        raise
+    # Nothing on this match is open any more
+    get_exposure_book().release(match_id)
+    return summary
+
+async def get_settlement(db, match_id: str) -> dict:
+    settlement = await db[SETTLEMENTS].find_one({"_id": match_id})
+    if settlement is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Match has not been settled.")
+    return settlement
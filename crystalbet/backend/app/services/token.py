@@ -1,25 +1,13 @@
-import os
-from datetime import datetime, timedelta
-from jose import jwt, JWTError
+from datetime import timedelta
+from jose import JWTError
 from fastapi import HTTPException, status
-from passlib.context import CryptContext
-
-# Secret key and algorithm configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
-
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from core import hashing, tokens
 
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     """
     Creates a new JWT access token with an optional expiration time.
     """
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return tokens.encode_token(data, expires_delta)
 
 def verify_token(token: str) -> dict:
     """
@@ -27,7 +15,7 @@ def verify_token(token: str) -> dict:
     Raises HTTP 401 error if token is invalid.
     """
     try:
-        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        return tokens.decode_token(token)
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,14 +23,14 @@ def verify_token(token: str) -> dict:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def hash_password(password: str) -> str:
+async def hash_password(password: str) -> str:
     """
-    Hashes a password using bcrypt.
+    Hashes a password with the shared bcrypt cost policy (see core/hashing.py).
     """
-    return pwd_context.hash(password)
+    return await hashing.hash_password(password)
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
     """
     Verifies a plain password against a hashed password.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    return await hashing.verify_password(plain_password, hashed_password)
@@ -4,6 +4,10 @@ from bson import ObjectId
 from pymongo.errors import PyMongoError
 from fastapi import HTTPException
 from pymongo import MongoClient
+from utils.fields import model_projection
+
+# Only the fields TransactionResponse serializes are fetched
+TRANSACTION_PROJECTION = model_projection(TransactionResponse)
 
 class TransactionService:
     def __init__(self, db: MongoClient):  # Corrected the type hint for db
@@ -22,16 +26,14 @@ class TransactionService:
 
     async def get_transactions(self, user_id: str) -> list[TransactionResponse]:
         transactions = []
-        async for transaction in self.collection.find({"user_id": user_id}):
-            transaction["_id"] = str(transaction["_id"])  # Convert ObjectId to str
+        async for transaction in self.collection.find({"user_id": user_id}, TRANSACTION_PROJECTION):
             transactions.append(TransactionResponse(**transaction))
         return transactions
 
     async def get_transaction(self, transaction_id: str, user_id: str) -> TransactionResponse:
         try:
-            transaction = await self.collection.find_one({"_id": ObjectId(transaction_id), "user_id": user_id})
+            transaction = await self.collection.find_one({"_id": ObjectId(transaction_id), "user_id": user_id}, TRANSACTION_PROJECTION)
             if transaction:
-                transaction["_id"] = str(transaction["_id"])  # Convert ObjectId to str
                 return TransactionResponse(**transaction)
             raise HTTPException(status_code=404, detail="Transaction not found")  # Explicit not found handling
         except PyMongoError as e:
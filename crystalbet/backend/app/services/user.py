@@ -1,11 +1,40 @@
 from bson import ObjectId
-from db.mongodb import get_db  # Assuming you have your MongoDB connection setup
+from db.mongodb import get_db, get_by_id  # Assuming you have your MongoDB connection setup
+from utils.cache import ReadThroughCache
+from core.config import settings
+from db.codecs import to_object_id
+
+# Public user profiles only: callers always pass a projection without password or reset fields
+user_cache = ReadThroughCache("users", ttl=settings.USER_CACHE_TTL_SECONDS)
+
+# Profile of one user trimmed to `projection`, cached per projected shape
+async def get_cached_user(user_id: str, projection: dict):
+    shape = ",".join(sorted(projection))
+    return await user_cache.get(f"{user_id}:{shape}", lambda: get_by_id("users", user_id, projection))
+
+# Drop every cached shape of a user after a write
+async def invalidate_user(user_id: str):
+    await user_cache.invalidate_prefix(f"{user_id}:")
+
+# Token subjects, for authenticated requests that need the user document
+principal_cache = ReadThroughCache("principals", ttl=settings.PRINCIPAL_CACHE_TTL_SECONDS)
+
+# User document of a token subject, without credentials
+async def get_principal(db, user_id: str):
+    from services.database import USER_SECRET_FIELDS  # Lazy import to avoid circular import issue
+    return await principal_cache.get(
+        user_id,
+        lambda: db["users"].find_one({"_id": to_object_id(user_id)}, USER_SECRET_FIELDS),
+    )
+
+async def invalidate_principal(user_id: str):
+    await principal_cache.invalidate(str(user_id))
 
 class UserService:
     @staticmethod
     async def get_user_by_id(user_id: str):
         from models.user import UserModel  # Lazy import to avoid circular import issue
-        user = await get_db.users.find_one({"_id": ObjectId(user_id)})
+        user = await (await get_db()).users.find_one({"_id": ObjectId(user_id)})
         if user:
             return UserModel(**user)  # Return the Pydantic model instance
         return None
@@ -13,9 +42,10 @@ class UserService:
     @staticmethod
     async def update_user(user_id: str, user_update):
         from models.user import UserModel  # Lazy import to avoid circular import issue
+        from services.auth import apply_user_update  # services.auth imports this module
         update_data = user_update.dict(exclude_unset=True)  # Only update provided fields
-        result = await get_db.users.update_one({"_id": ObjectId(user_id)}, {"$set": update_data})
+        result = await apply_user_update(await get_db(), user_id, update_data)
         if result.modified_count == 1:
-            updated_user = await get_db.users.find_one({"_id": ObjectId(user_id)})
+            updated_user = await (await get_db()).users.find_one({"_id": ObjectId(user_id)})
             return UserModel(**updated_user)  # Return the updated user
         return None
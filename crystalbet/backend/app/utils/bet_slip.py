@@ -0,0 +1,144 @@
+# utils/bet_slip.py
+#
+# Stakes and payouts of a bet slip: singles, accumulators and full-cover system bets.
+#
+# A k-fold over n selections has C(n, k) lines, each paying the line stake times the
+# product of its odds. Summed over all lines that is the k-th elementary symmetric
+# polynomial of the odds, which is built for every k at once in n vectorized steps, so
+# slip totals never enumerate lines. Lines are only enumerated (one row of odds products
+# per combination) when the slip asks for them, and a slip may not exceed SLIP_MAX_LINES.
+#
+# The same polynomial settles a slip: lost legs count as odds 0 and void legs as odds 1.
+
+from itertools import chain, combinations
+from math import comb
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from fastapi import HTTPException, status
+from core.config import settings
+
+SINGLE = "single"
+ACCUMULATOR = "accumulator"
+SYSTEM = "system"
+
+# Named full-cover bets: number of selections and the folds they cover
+SYSTEMS: Dict[str, Tuple[int, Tuple[int, ...]]] = {
+    "trixie": (3, (2, 3)),
+    "patent": (3, (1, 2, 3)),
+    "yankee": (4, (2, 3, 4)),
+    "lucky15": (4, (1, 2, 3, 4)),
+    "canadian": (5, (2, 3, 4, 5)),
+    "super_yankee": (5, (2, 3, 4, 5)),
+    "lucky31": (5, (1, 2, 3, 4, 5)),
+    "heinz": (6, (2, 3, 4, 5, 6)),
+    "lucky63": (6, (1, 2, 3, 4, 5, 6)),
+    "super_heinz": (7, (2, 3, 4, 5, 6, 7)),
+    "goliath": (8, (2, 3, 4, 5, 6, 7, 8)),
+}
+
+def _invalid(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+def resolve_folds(bet_type: str, selections: int, folds: Optional[Sequence[int]] = None) -> Tuple[int, ...]:
+    """
+    Fold sizes covered by a bet type, e.g. ("yankee", 4) -> (2, 3, 4).
+    "system" takes arbitrary k-of-n folds.
+    """
+    if bet_type == SINGLE:
+        return (1,)
+    if bet_type == ACCUMULATOR:
+        if selections < 2:
+            raise _invalid("An accumulator needs at least 2 selections.")
+        return (selections,)
+    if bet_type == SYSTEM:
+        resolved = tuple(sorted(set(folds or ())))
+        if not resolved or resolved[0] < 1 or resolved[-1] > selections:
+            raise _invalid(f"System folds must be between 1 and {selections}.")
+        return resolved
+    if bet_type in SYSTEMS:
+        required, covered = SYSTEMS[bet_type]
+        if selections != required:
+            raise _invalid(f"A {bet_type} needs exactly {required} selections.")
+        return covered
+    raise _invalid(f"Unknown bet type '{bet_type}'.")
+
+def line_count(selections: int, folds: Sequence[int]) -> int:
+    return sum(comb(selections, k) for k in folds)
+
+def elementary_symmetric(values: np.ndarray, max_k: int) -> np.ndarray:
+    """
+    e[k] = sum over all k-subsets of the product of their values, for k = 0..max_k.
+    """
+    e = np.zeros(max_k + 1)
+    e[0] = 1.0
+    for value in values:
+        # Every subset either skips this value or extends a (k-1)-subset with it
+        e[1:] = e[1:] + value * e[:-1]
+    return e
+
+def fold_returns(odds: np.ndarray, folds: Sequence[int]) -> np.ndarray:
+    """
+    Return of a unit stake on every line of each fold, summed per fold.
+    """
+    return elementary_symmetric(odds, max(folds))[list(folds)]
+
+def slip_payout(odds: Sequence[float], line_stake: float, folds: Sequence[int]) -> float:
+    """
+    Payout of a slip whose legs are all resolved: pass the odds of won legs, 1 for void legs and 0 for lost legs.
+    """
+    return round(float(line_stake * fold_returns(np.asarray(odds, dtype=np.float64), folds).sum()), 2)
+
+def enumerate_lines(odds: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Selection indexes (one row per line) and combined odds of every k-fold line.
+    """
+    count = comb(len(odds), k)
+    index = np.fromiter(chain.from_iterable(combinations(range(len(odds)), k)), dtype=np.intp, count=count * k)
+    index = index.reshape(count, k)
+    return index, odds[index].prod(axis=1)
+
+def calculate_slip(
+    odds: Sequence[float],
+    stake: float,
+    bet_type: str = ACCUMULATOR,
+    folds: Optional[Sequence[int]] = None,
+    match_ids: Optional[Sequence[str]] = None,
+    include_lines: bool = False,
+) -> Dict[str, Any]:
+    """
+    Quote a slip: `stake` is the stake per line. Returns the totals, the line count and
+    payout per fold and, with include_lines, every line with its own payout.
+    """
+    prices = np.asarray(odds, dtype=np.float64)
+    if len(prices) > settings.SLIP_MAX_SELECTIONS:
+        raise _invalid(f"A slip can have at most {settings.SLIP_MAX_SELECTIONS} selections.")
+    resolved = resolve_folds(bet_type, len(prices), folds)
+    if resolved[-1] > 1 and match_ids is not None and len(set(match_ids)) < len(match_ids):
+        raise _invalid("Selections from the same match cannot be combined.")
+    lines = line_count(len(prices), resolved)
+    if lines > settings.SLIP_MAX_LINES:
+        raise _invalid(f"The slip has {lines} lines, the limit is {settings.SLIP_MAX_LINES}.")
+
+    returns = stake * fold_returns(prices, resolved)
+    quote: Dict[str, Any] = {
+        "bet_type": bet_type,
+        "folds": [
+            {"fold": k, "lines": comb(len(prices), k), "payout": round(float(payout), 2)}
+            for k, payout in zip(resolved, returns)
+        ],
+        "line_count": lines,
+        "stake_per_line": stake,
+        "total_stake": round(stake * lines, 2),
+        "potential_payout": round(float(returns.sum()), 2),
+    }
+    if include_lines:
+        listed: List[Dict[str, Any]] = []
+        for k in resolved:
+            index, combined = enumerate_lines(prices, k)
+            payouts = np.round(stake * combined, 2)
+            listed.extend(
+                {"selections": row, "odds": price, "payout": payout}
+                for row, price, payout in zip(index.tolist(), np.round(combined, 4).tolist(), payouts.tolist())
+            )
+        quote["lines"] = listed
+    return quote
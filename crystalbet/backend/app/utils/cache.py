@@ -0,0 +1,179 @@
+# utils/cache.py
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+from utils.cache_backends import MISSING, CacheBackend, get_cache_backend
+
+logger = logging.getLogger(__name__)
+
+# TTL in seconds, or a function of the loaded value returning one
+TTL = Union[float, Callable[[Any], float]]
+
+# Every cache created in the process, by namespace, for the health endpoint
+_caches: Dict[str, "ReadThroughCache"] = {}
+
+class ReadThroughCache:
+    """
+    Read-through cache over the configured backend (see utils/cache_backends.py), one namespace per cache.
+    Concurrent misses on the same key within a process share one loader call; the others await its result.
+    """
+    def __init__(self, name: str, ttl: TTL, backend: Optional[CacheBackend] = None):
+        self.name = name
+        self.ttl = ttl
+        self._backend = backend
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # Bumped on every invalidation so a refill started before it is not stored
+        self._generation = 0
+        self.refills = 0
+        self.refill_errors = 0
+        self.coalesced = 0
+        _caches[name] = self
+
+    @property
+    def backend(self) -> CacheBackend:
+        # Resolved lazily so settings and the backend are ready before first use
+        return self._backend or get_cache_backend()
+
+    def _seconds(self, ttl: TTL, value: Any) -> float:
+        return ttl(value) if callable(ttl) else ttl
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[TTL] = None) -> Any:
+        """
+        Return the cached value for `key`, calling `loader` once on a miss.
+        """
+        try:
+            value = await self.backend.get(self.name, key)
+        except Exception as e:
+            # An unreachable backend degrades to reading through, it never fails the request
+            logger.error(f"Cache '{self.name}' backend read failed for {key}: {e}")
+            value = MISSING
+        if value is not MISSING:
+            return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            # shield: a cancelled waiter must not cancel the refill the others are waiting on
+            return await asyncio.shield(inflight)
+
+        refill = asyncio.ensure_future(self._refill(key, loader, self.ttl if ttl is None else ttl))
+        self._inflight[key] = refill
+        return await asyncio.shield(refill)
+
+    async def _refill(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: TTL) -> Any:
+        generation = self._generation
+        try:
+            value = await loader()
+        except Exception as e:
+            # Errors are not cached, the next request retries
+            self.refill_errors += 1
+            logger.error(f"Cache '{self.name}' refill failed for {key}: {e}")
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        self.refills += 1
+        seconds = self._seconds(ttl, value)
+        if generation == self._generation and seconds > 0:
+            try:
+                await self.backend.set(self.name, key, value, seconds)
+            except Exception as e:
+                logger.error(f"Cache '{self.name}' backend write failed for {key}: {e}")
+        return value
+
+    async def get_many(
+        self,
+        keys: Iterable[str],
+        loader: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+        ttl: Optional[TTL] = None,
+    ) -> Dict[str, Any]:
+        """
+        Batched read: one mget for all keys, one `loader(missing_keys)` call and one mset for the misses.
+        Keys the loader does not return are left out of the result.
+        """
+        keys = list(dict.fromkeys(keys))
+        try:
+            values = await self.backend.mget(self.name, keys)
+        except Exception as e:
+            logger.error(f"Cache '{self.name}' backend read failed for {len(keys)} keys: {e}")
+            values = [MISSING] * len(keys)
+        found = {key: value for key, value in zip(keys, values) if value is not MISSING}
+        missing = [key for key in keys if key not in found]
+        if not missing:
+            return found
+
+        generation = self._generation
+        try:
+            loaded = await loader(missing)
+        except Exception as e:
+            self.refill_errors += 1
+            logger.error(f"Cache '{self.name}' batch refill failed for {len(missing)} keys: {e}")
+            raise
+        self.refills += 1
+        if generation == self._generation and loaded:
+            ttl = self.ttl if ttl is None else ttl
+            # Group by TTL so value-dependent TTLs still go out in as few batches as possible
+            batches: Dict[float, Dict[str, Any]] = {}
+            for key, value in loaded.items():
+                seconds = self._seconds(ttl, value)
+                if seconds > 0:
+                    batches.setdefault(seconds, {})[key] = value
+            try:
+                for seconds, items in batches.items():
+                    await self.backend.mset(self.name, items, seconds)
+            except Exception as e:
+                logger.error(f"Cache '{self.name}' backend write failed for {len(loaded)} keys: {e}")
+        found.update(loaded)
+        return found
+
+    async def invalidate(self, *keys: str) -> None:
+        """
+        Drop the given keys.
+        """
+        self._generation += 1
+        try:
+            await self.backend.delete(self.name, keys)
+        except Exception as e:
+            # The write already happened; stale entries age out with their TTL
+            logger.error(f"Cache '{self.name}' invalidation failed: {e}")
+
+    async def invalidate_prefix(self, prefix: str) -> None:
+        """
+        Drop every key starting with `prefix`.
+        """
+        self._generation += 1
+        try:
+            await self.backend.delete_prefix(self.name, prefix)
+        except Exception as e:
+            logger.error(f"Cache '{self.name}' invalidation failed for prefix {prefix!r}: {e}")
+
+    async def clear(self) -> None:
+        await self.invalidate_prefix("")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "refills": self.refills,
+            "refill_errors": self.refill_errors,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+        }
+
+def page_key(page: Any, projection: Optional[dict] = None) -> str:
+    """
+    Cache key of one keyset page: everything that shapes the result (limit, cursor, projected fields).
+    """
+    shape = ",".join(sorted(projection)) if projection else ""
+    return f"page:{page.limit}:{page.cursor or ''}:{shape}"
+
+async def cache_stats() -> Dict[str, Any]:
+    """
+    Backend counters (hits, misses, sets, evictions per namespace) merged with each cache's refill counters.
+    """
+    stats = await get_cache_backend().stats()
+    namespaces = stats["namespaces"]
+    for name, cache in _caches.items():
+        counters = namespaces.setdefault(name, {})
+        counters.update(cache.stats())
+        lookups = counters.get("hits", 0) + counters.get("misses", 0)
+        counters["hit_ratio"] = round(counters.get("hits", 0) / lookups, 4) if lookups else None
+    return stats
@@ -0,0 +1,318 @@
+# utils/cache_backends.py
+
+import json
+import logging
+import re
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from core.config import settings
+from utils.serialization import dumps
+
+try:
+    import orjson
+except ImportError:  # Optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # Optional dependency
+    msgpack = None
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency, only needed with CACHE_BACKEND=redis
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+# Value codecs for backends that store bytes.
+# Both round-trip datetimes (coupon expiry, transaction timestamps); tuples come back as lists.
+
+_DATETIME_EXT = 1
+_DATE_MARKER = "$date"
+
+class MsgpackCodec:
+    name = "msgpack"
+
+    def __init__(self):
+        if msgpack is None:
+            raise RuntimeError("CACHE_CODEC=msgpack requires the 'msgpack' package.")
+
+    @staticmethod
+    def _default(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return msgpack.ExtType(_DATETIME_EXT, value.isoformat().encode("ascii"))
+        return str(value)
+
+    @staticmethod
+    def _ext_hook(code: int, data: bytes) -> Any:
+        if code == _DATETIME_EXT:
+            return datetime.fromisoformat(data.decode("ascii"))
+        return msgpack.ExtType(code, data)
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=self._default, use_bin_type=True)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+class JSONCodec:
+    """
+    orjson (or stdlib json) with datetimes tagged as {"$date": iso} so they decode back to datetime.
+    """
+    name = "orjson"
+
+    @staticmethod
+    def _tag(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return {_DATE_MARKER: value.isoformat()}
+        if isinstance(value, dict):
+            return {k: JSONCodec._tag(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [JSONCodec._tag(v) for v in value]
+        return value
+
+    @staticmethod
+    def _untag(value: Any) -> Any:
+        if isinstance(value, dict):
+            if len(value) == 1 and _DATE_MARKER in value:
+                return datetime.fromisoformat(value[_DATE_MARKER])
+            return {k: JSONCodec._untag(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [JSONCodec._untag(v) for v in value]
+        return value
+
+    def encode(self, value: Any) -> bytes:
+        if orjson is not None:
+            # Passthrough hands datetimes to the default hook instead of emitting bare strings
+            return orjson.dumps(value, default=self._datetime, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        return dumps(self._tag(value))
+
+    @staticmethod
+    def _datetime(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return {_DATE_MARKER: value.isoformat()}
+        return str(value)
+
+    def decode(self, data: bytes) -> Any:
+        value = orjson.loads(data) if orjson is not None else json.loads(data)
+        # Only walk payloads that actually carry a tagged datetime
+        if _DATE_MARKER.encode() in data:
+            value = self._untag(value)
+        return value
+
+def get_codec(name: str):
+    if name == "msgpack":
+        return MsgpackCodec()
+    if name in ("orjson", "json"):
+        return JSONCodec()
+    raise ValueError(f"Unknown CACHE_CODEC '{name}'")
+
+# Backends. Keys are namespaced ("matches", "casino", ...) and every backend
+# keeps per-namespace counters for the health endpoint.
+
+def _counters() -> Dict[str, int]:
+    return {"hits": 0, "misses": 0, "sets": 0, "deletes": 0, "evictions": 0, "expirations": 0}
+
+class CacheBackend:
+    """
+    Interface shared by the cache backends.
+    """
+    name = "base"
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = defaultdict(_counters)
+
+    async def get(self, namespace: str, key: str) -> Any:
+        values = await self.mget(namespace, [key])
+        return values[0]
+
+    async def set(self, namespace: str, key: str, value: Any, ttl: float) -> None:
+        await self.mset(namespace, {key: value}, ttl)
+
+    async def mget(self, namespace: str, keys: List[str]) -> List[Any]:
+        """Values in key order, MISSING for absent or expired keys."""
+        raise NotImplementedError
+
+    async def mset(self, namespace: str, items: Dict[str, Any], ttl: float) -> None:
+        raise NotImplementedError
+
+    async def delete(self, namespace: str, keys: Iterable[str]) -> int:
+        raise NotImplementedError
+
+    async def delete_prefix(self, namespace: str, prefix: str) -> int:
+        raise NotImplementedError
+
+    async def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "namespaces": {ns: dict(counters) for ns, counters in self._stats.items()}}
+
+    async def close(self) -> None:
+        pass
+
+class MemoryBackend(CacheBackend):
+    """
+    Process-local LRU with per-key expiry. Values are stored as-is, callers must not mutate them.
+    """
+    name = "memory"
+
+    def __init__(self, max_entries: int = 10000):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+
+    async def mget(self, namespace: str, keys: List[str]) -> List[Any]:
+        now = time.monotonic()
+        counters = self._stats[namespace]
+        values = []
+        for key in keys:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and entry[0] <= now:
+                del self._entries[(namespace, key)]
+                counters["expirations"] += 1
+                entry = None
+            if entry is None:
+                counters["misses"] += 1
+                values.append(MISSING)
+            else:
+                counters["hits"] += 1
+                self._entries.move_to_end((namespace, key))
+                values.append(entry[1])
+        return values
+
+    async def mset(self, namespace: str, items: Dict[str, Any], ttl: float) -> None:
+        expires_at = time.monotonic() + ttl
+        for key, value in items.items():
+            self._entries[(namespace, key)] = (expires_at, value)
+            self._entries.move_to_end((namespace, key))
+        self._stats[namespace]["sets"] += len(items)
+        while len(self._entries) > self.max_entries:
+            (evicted_namespace, _), _ = self._entries.popitem(last=False)
+            self._stats[evicted_namespace]["evictions"] += 1
+
+    async def delete(self, namespace: str, keys: Iterable[str]) -> int:
+        deleted = sum(1 for key in keys if self._entries.pop((namespace, key), None) is not None)
+        self._stats[namespace]["deletes"] += deleted
+        return deleted
+
+    async def delete_prefix(self, namespace: str, prefix: str) -> int:
+        keys = [key for ns, key in self._entries if ns == namespace and key.startswith(prefix)]
+        return await self.delete(namespace, keys)
+
+    async def stats(self) -> Dict[str, Any]:
+        stats = await super().stats()
+        stats.update({"entries": len(self._entries), "max_entries": self.max_entries})
+        return stats
+
+class RedisBackend(CacheBackend):
+    """
+    Shared cache on any Redis-protocol server (redis-server, KeyDB, fakeredis in development).
+    All workers see the same hot set, so a deploy warms it once instead of once per worker.
+    """
+    name = "redis"
+
+    def __init__(self, url: str, codec_name: str = "msgpack", key_prefix: str = "crystalbet:", client: Any = None):
+        super().__init__()
+        if client is None:
+            if aioredis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package.")
+            client = aioredis.from_url(url)
+        self.client = client
+        self.codec = get_codec(codec_name)
+        self.key_prefix = key_prefix
+
+    def _key(self, namespace: str, key: str) -> str:
+        return f"{self.key_prefix}{namespace}:{key}"
+
+    async def mget(self, namespace: str, keys: List[str]) -> List[Any]:
+        if not keys:
+            return []
+        raw = await self.client.mget([self._key(namespace, key) for key in keys])
+        counters = self._stats[namespace]
+        values = []
+        for data in raw:
+            if data is None:
+                counters["misses"] += 1
+                values.append(MISSING)
+            else:
+                counters["hits"] += 1
+                values.append(self.codec.decode(data))
+        return values
+
+    async def mset(self, namespace: str, items: Dict[str, Any], ttl: float) -> None:
+        if not items:
+            return
+        milliseconds = max(1, int(ttl * 1000))
+        # One round-trip for the whole batch; MSET has no per-key expiry
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._key(namespace, key), self.codec.encode(value), px=milliseconds)
+            await pipe.execute()
+        self._stats[namespace]["sets"] += len(items)
+
+    async def delete(self, namespace: str, keys: Iterable[str]) -> int:
+        names = [self._key(namespace, key) for key in keys]
+        if not names:
+            return 0
+        deleted = await self.client.unlink(*names)
+        self._stats[namespace]["deletes"] += deleted
+        return deleted
+
+    async def delete_prefix(self, namespace: str, prefix: str) -> int:
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", self._key(namespace, prefix)) + "*"
+        deleted = 0
+        batch = []
+        async for name in self.client.scan_iter(match=pattern, count=500):
+            batch.append(name)
+            if len(batch) >= 500:
+                deleted += await self.client.unlink(*batch)
+                batch = []
+        if batch:
+            deleted += await self.client.unlink(*batch)
+        self._stats[namespace]["deletes"] += deleted
+        return deleted
+
+    async def stats(self) -> Dict[str, Any]:
+        stats = await super().stats()
+        # Redis evicts and expires server-side, for all namespaces at once
+        try:
+            info = await self.client.info("stats")
+            stats["server"] = {
+                "evicted_keys": info.get("evicted_keys"),
+                "expired_keys": info.get("expired_keys"),
+                "keyspace_hits": info.get("keyspace_hits"),
+                "keyspace_misses": info.get("keyspace_misses"),
+            }
+        except Exception as e:
+            stats["server"] = {"error": str(e)}
+        stats["codec"] = self.codec.name
+        return stats
+
+    async def close(self) -> None:
+        # redis-py 5 renamed close() to aclose()
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+
+_backend: Optional[CacheBackend] = None
+
+def get_cache_backend() -> CacheBackend:
+    """
+    The process-wide backend selected by CACHE_BACKEND, created on first use.
+    """
+    global _backend
+    if _backend is None:
+        if settings.CACHE_BACKEND == "redis":
+            _backend = RedisBackend(settings.REDIS_URL, settings.CACHE_CODEC, settings.CACHE_KEY_PREFIX)
+        else:
+            _backend = MemoryBackend(settings.CACHE_MAX_ENTRIES)
+        logger.info(f"Cache backend: {_backend.name}")
+    return _backend
+
+async def close_cache_backend() -> None:
+    global _backend
+    if _backend is not None:
+        await _backend.close()
+        _backend = None
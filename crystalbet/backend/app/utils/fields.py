@@ -0,0 +1,76 @@
+# utils/fields.py
+
+from typing import Callable, Dict, Mapping, Optional, Type
+from fastapi import HTTPException, Query, status
+from pydantic import BaseModel
+from utils.serialization import TrustedJSONResponse
+
+def _model_fields(model: Type[BaseModel]) -> Dict[str, str]:
+    """
+    Map every public name of a response model (field name and alias) to its Mongo key.
+    Works with both Pydantic v1 (__fields__) and v2 (model_fields).
+    An un-aliased `id` field is the document's `_id`.
+    """
+    fields = getattr(model, "model_fields", None)
+    if fields is None:
+        fields = model.__fields__
+    names = {}
+    for name, field in fields.items():
+        key = field.alias or name
+        if key == "id":
+            key = "_id"
+        names[name] = key
+        names[key] = key
+    return names
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """
+    Projection that fetches exactly the fields a response model serializes.
+    Anything else on the document (password hashes, reset tokens, embedded markets) never leaves Mongo.
+    """
+    projection = {key: 1 for key in set(_model_fields(model).values())}
+    # _id is returned by default; exclude it explicitly when the model does not use it
+    projection.setdefault("_id", 0)
+    return projection
+
+class FieldSelection:
+    """
+    Result of the ?fields= dependency: the Mongo projection and whether it is a subset of the model.
+    """
+    def __init__(self, projection: Dict[str, int], partial: bool):
+        self.projection = projection
+        self.partial = partial
+
+    def respond(self, documents, status_code: int = 200, headers: Optional[Mapping[str, str]] = None) -> TrustedJSONResponse:
+        """
+        Serialize a sparse result directly: the response model would reject the missing fields.
+        Headers already set on the injected Response (e.g. X-Next-Cursor) must be passed along.
+        """
+        return TrustedJSONResponse(documents, status_code=status_code, headers=dict(headers) if headers else None)
+
+def sparse_fields(model: Type[BaseModel]) -> Callable[..., FieldSelection]:
+    """
+    Dependency factory for ?fields=a,b,c on endpoints returning `model`.
+    Without the parameter the projection still trims documents to the model's own fields.
+    """
+    names = _model_fields(model)
+    full = model_projection(model)
+
+    def dependency(
+        fields: Optional[str] = Query(None, description=f"Comma-separated subset of: {', '.join(sorted(set(names.values())))}")
+    ) -> FieldSelection:
+        if not fields:
+            return FieldSelection(full, partial=False)
+        requested = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in requested if name not in names]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown field(s): {', '.join(unknown)}"
+            )
+        projection = {names[name]: 1 for name in requested}
+        # Keep the identifier whenever the model exposes one
+        projection.setdefault("_id", full["_id"])
+        return FieldSelection(projection, partial=True)
+
+    return dependency
@@ -0,0 +1,141 @@
+# utils/idempotency.py
+#
+# Idempotency-Key support for endpoints that must not run twice when a client retries
+# (bet placement, payment initiation). The first request with a key claims it in the
+# TTL-indexed `idempotency_keys` collection, runs the handler and stores its response;
+# repeats get the stored response without running the handler again.
+#
+# Lookups go through a read-through cache ("idempotency" in /health/cache), so repeats
+# within IDEMPOTENCY_CACHE_SECONDS are answered without Mongo, and concurrent repeats in
+# one process wait on the request already in flight. A repeat arriving at another process
+# while the first is running polls the claim until it completes. The claim's
+# IDEMPOTENCY_LOCK_SECONDS lease is renewed while the handler runs, so only a claim whose
+# process died (or stalled past the lease) is taken over.
+#
+# Only successful responses are stored: if the handler raises, the claim is released and
+# a retry runs it again. Reusing a key with a different request body is refused with 422.
+
+import asyncio
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+from fastapi import HTTPException, Response, status
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+from core.config import settings
+from db.mongodb import get_db
+from utils.cache import ReadThroughCache
+
+IDEMPOTENCY_KEYS = "idempotency_keys"
+
+IN_PROGRESS = "in_progress"
+COMPLETED = "completed"
+
+MAX_KEY_LENGTH = 255
+
+idempotency_cache = ReadThroughCache("idempotency", ttl=settings.IDEMPOTENCY_CACHE_SECONDS)
+
+def _digest(value: str) -> str:
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+def _record(doc: dict) -> dict:
+    return {"fingerprint": doc["fingerprint"], "response": doc["response"]}
+
+async def _take_over(collection: Any, storage_key: str, fingerprint: str, holder: str) -> bool:
+    # Claim a key that is free again: released after a failure, or its holder's lease ran out
+    now = datetime.utcnow()
+    try:
+        await collection.insert_one({
+            "_id": storage_key,
+            "fingerprint": fingerprint,
+            "holder": holder,
+            "status": IN_PROGRESS,
+            "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS),
+            "expires_at": now + timedelta(hours=settings.IDEMPOTENCY_TTL_HOURS),
+        })
+        return True
+    except DuplicateKeyError:
+        pass
+    taken = await collection.find_one_and_update(
+        {"_id": storage_key, "status": IN_PROGRESS, "locked_until": {"$lt": now}},
+        {"$set": {"fingerprint": fingerprint, "holder": holder, "locked_until": now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)}},
+    )
+    return taken is not None
+
+async def _renew(collection: Any, storage_key: str, holder: str) -> None:
+    # Keeps the lease ahead of a slow handler (a payment provider call) while it runs
+    while True:
+        await asyncio.sleep(settings.IDEMPOTENCY_LOCK_SECONDS / 3)
+        await collection.update_one(
+            {"_id": storage_key, "status": IN_PROGRESS, "holder": holder},
+            {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)}},
+        )
+
+async def _execute(storage_key: str, fingerprint: str, handler: Callable[[], Awaitable[Any]]) -> dict:
+    collection = (await get_db())[IDEMPOTENCY_KEYS]
+    deadline = asyncio.get_running_loop().time() + settings.IDEMPOTENCY_WAIT_SECONDS
+    delay = 0.05
+    holder = uuid.uuid4().hex
+    while not await _take_over(collection, storage_key, fingerprint, holder):
+        doc = await collection.find_one({"_id": storage_key})
+        if doc is not None and doc["status"] == COMPLETED:
+            return _record(doc)
+        if asyncio.get_running_loop().time() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still in progress.",
+                headers={"Retry-After": "1"},
+            )
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.5)
+
+    renewal = asyncio.create_task(_renew(collection, storage_key, holder))
+    try:
+        response = jsonable_encoder(await handler())
+    except BaseException:
+        await collection.delete_one({"_id": storage_key, "status": IN_PROGRESS})
+        raise
+    finally:
+        renewal.cancel()
+        await asyncio.gather(renewal, return_exceptions=True)
+    await collection.update_one(
+        {"_id": storage_key},
+        {"$set": {"status": COMPLETED, "response": response, "completed_at": datetime.utcnow()}, "$unset": {"locked_until": ""}},
+    )
+    return {"fingerprint": fingerprint, "response": response}
+
+async def idempotent(
+    response: Response,
+    scope: str,
+    key: Optional[str],
+    payload: Any,
+    handler: Callable[[], Awaitable[Any]],
+) -> Any:
+    """
+    Run `handler` once per (scope, key); repeats return its stored response with Idempotent-Replayed: true.
+    Without a key the handler simply runs. `payload` is the request body the key is bound to.
+    """
+    if key is None:
+        return await handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters.")
+    fingerprint = _digest(json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":")))
+    ran = False
+
+    async def run():
+        nonlocal ran
+        ran = True
+        return await handler()
+
+    storage_key = _digest(f"{scope}:{key}")
+    record = await idempotency_cache.get(storage_key, lambda: _execute(storage_key, fingerprint, run))
+    if record["fingerprint"] != fingerprint:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request.",
+        )
+    if not ran:
+        response.headers["Idempotent-Replayed"] = "true"
+    return record["response"]
@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
-from jose import JWTError, jwt
+from jose import JWTError
+from core import tokens
 from fastapi import HTTPException, Depends, Request
 from fastapi.security import OAuth2PasswordBearer, SecurityScopes
 from pydantic import ValidationError, ConfigDict
@@ -7,7 +8,7 @@ from typing import Optional
 from models.user import User  # Ensure you have a User model to fetch user data from DB
 from schemas.auth import Token # Assuming TokenData schema validates JWT token claims
 from core.config import settings  # Assuming settings.py contains secret key and algorithm configs
-import bcrypt
+from core.hashing import hash_password, verify_password  # Re-exported: process pool + calibrated cost policy
 
 # OAuth2 scheme to get the token from the "Authorization" header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -19,20 +20,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
 # Create an access token
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return tokens.encode_token(data, expires_delta)
 
 # Verify and decode the access token
 def verify_access_token(token: str, credentials_exception):
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = tokens.decode_token(token)
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
@@ -53,7 +46,7 @@ class JWTBearer:
             headers={"WWW-Authenticate": "Bearer"},
         )
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = tokens.decode_token(token)
             request.state.user = payload  # Store the payload in request.state.user
         except JWTError:
             raise credentials_exception
@@ -83,18 +76,10 @@ def get_current_user(token: str = Depends(oauth2_scheme)):
 def decode_token(token: str):
     """Decodes a JWT token and returns the payload."""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = tokens.decode_token(token)
         return payload
     except JWTError:
         return None
-def hash_password(password: str) -> str:
-    """Hashes the password using bcrypt."""
-    hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    return hashed.decode('utf-8')
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verifies the password against the hashed password."""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
 
 # Refresh token logic can be added similarly by creating another function for long-term sessions
 
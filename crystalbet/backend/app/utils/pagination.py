@@ -0,0 +1,116 @@
+# utils/pagination.py
+
+import base64
+from typing import Any, List, Optional, Tuple
+from bson import json_util
+from fastapi import HTTPException, Query, Response, status
+from pymongo import ASCENDING, DESCENDING
+from db.codecs import to_object_id
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+class PageParams:
+    """
+    Shared pagination dependency for list endpoints: ?limit=&cursor=
+    The cursor is the opaque token returned in the X-Next-Cursor header of the previous page.
+    """
+    def __init__(
+        self,
+        limit: int = Query(20, ge=1, le=100, description="Maximum number of items per page"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+def encode_cursor(sort_value: Any, last_id: Any) -> str:
+    """
+    Encode the (sort_key, _id) position of the last item of a page.
+    Extended JSON keeps ObjectId and datetime values intact across the round-trip.
+    """
+    raw = json_util.dumps({"v": sort_value, "i": last_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Any, Any]:
+    """
+    Decode a cursor token back into its (sort_value, _id) position.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json_util.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return data["v"], data["i"]
+    except Exception:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+
+def _with_position_keys(projection: Optional[dict], sort_key: str) -> Tuple[Optional[dict], List[str]]:
+    # The next cursor is built from the last document's sort key and _id, so a sparse
+    # projection (?fields=) must still fetch them. Returns the keys added for the caller to drop.
+    if not projection:
+        return projection, []
+    projection = dict(projection)
+    inclusion = any(value for key, value in projection.items() if key != "_id")
+    added = []
+    for key in dict.fromkeys((sort_key, "_id")):
+        if inclusion and not projection.get(key, key == "_id"):
+            projection[key] = 1
+            added.append(key)
+        elif not inclusion and projection.get(key, 1) == 0:
+            del projection[key]
+            added.append(key)
+    return projection or None, added
+
+def keyset_filter(sort_key: str, direction: int, cursor: Optional[str]) -> dict:
+    """
+    Range predicate that resumes right after the cursor position.
+    Served by a compound (sort_key, _id) index, so every page is a single index seek.
+    """
+    if not cursor:
+        return {}
+    sort_value, last_id = decode_cursor(cursor)
+    # Documents carry string ids (see db/codecs.py), the index holds ObjectIds
+    last_id = to_object_id(last_id)
+    op = "$gt" if direction == ASCENDING else "$lt"
+    if sort_key == "_id":
+        return {"_id": {op: last_id}}
+    return {"$or": [
+        {sort_key: {op: sort_value}},
+        {sort_key: sort_value, "_id": {op: last_id}},
+    ]}
+
+async def paginate(
+    collection: Any,
+    query: Optional[dict],
+    page: PageParams,
+    sort_key: str = "_id",
+    direction: int = ASCENDING,
+    projection: Optional[dict] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetch one page ordered by (sort_key, _id) and the cursor of the next page (None on the last page).
+    """
+    position = keyset_filter(sort_key, direction, page.cursor)
+    if query and position:
+        query = {"$and": [query, position]}
+    else:
+        query = query or position
+
+    sort = [("_id", direction)] if sort_key == "_id" else [(sort_key, direction), ("_id", direction)]
+    projection, added = _with_position_keys(projection, sort_key)
+    cursor = collection.find(query, projection).sort(sort).limit(page.limit + 1)
+    documents = await cursor.to_list(length=page.limit + 1)
+
+    next_cursor = None
+    if len(documents) > page.limit:
+        documents = documents[:page.limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last.get(sort_key) if sort_key != "_id" else last["_id"], last["_id"])
+    for document in documents:
+        for key in added:
+            document.pop(key, None)
+    return documents, next_cursor
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    """
+    Expose the next-page cursor to the client.
+    """
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,73 @@
+# utils/serialization.py
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, List, Mapping, Optional, Type
+from bson import Decimal128, ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from core.config import settings
+
+try:
+    import orjson
+except ImportError:  # Optional dependency, the stdlib encoder is used instead
+    orjson = None
+
+def _default(value: Any) -> Any:
+    """
+    JSON fallback for the BSON types found in Mongo documents.
+    """
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal128):
+        return str(value.to_decimal())
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(by_alias=True) if hasattr(value, "model_dump") else value.dict(by_alias=True)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    """
+    Encode trusted content as compact JSON, with orjson when it is installed.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode("utf-8")
+
+class TrustedJSONResponse(JSONResponse):
+    """
+    Response for documents read back from our own database.
+    Returned directly from an endpoint it skips response_model validation and jsonable_encoder.
+    """
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+def construct_model(model: Type[BaseModel], document: Mapping[str, Any]) -> BaseModel:
+    """
+    Build a model from a trusted document without running validation.
+    """
+    construct = getattr(model, "model_construct", None) or model.construct
+    return construct(**document)
+
+def construct_models(model: Type[BaseModel], documents: Iterable[Mapping[str, Any]]) -> List[BaseModel]:
+    construct = getattr(model, "model_construct", None) or model.construct
+    return [construct(**document) for document in documents]
+
+class FastPath:
+    """
+    Per-router switch for the zero-validation serialization path.
+    Enabled for the routers listed in FAST_PATH_ROUTERS; other routers keep full response_model validation.
+    """
+    def __init__(self, router: str):
+        self.router = router
+
+    @property
+    def enabled(self) -> bool:
+        return self.router in {name.strip() for name in settings.FAST_PATH_ROUTERS.split(",")}
+
+    def respond(self, content: Any, headers: Optional[Mapping[str, str]] = None, status_code: int = 200) -> TrustedJSONResponse:
+        return TrustedJSONResponse(content, status_code=status_code, headers=dict(headers) if headers else None)
@@ -0,0 +1,92 @@
+# utils/smtp_sink.py
+#
+# Local SMTP stand-in for the email outbox (services/outbox.py), built on aiosmtpd.
+# Messages are kept in memory instead of delivered, and the reply to DATA can be set to
+# exercise the outbox's retry (4xx) and permanent failure (5xx) paths.
+#
+#   with SMTPSink() as sink:  # settings.SMTP_* point at the sink while it is open
+#       await OutboxWorker(db).drain_once()
+#       sink.messages         # received email.message.EmailMessage objects
+#
+# Or as a mail catcher while developing (prints every message):
+#
+#   cd backend/app && python -m utils.smtp_sink [--port 8025]
+
+import argparse
+import time
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional
+from aiosmtpd.controller import Controller
+from core.config import settings
+
+OVERRIDES = ("SMTP_SERVER", "SMTP_PORT", "SMTP_START_TLS", "SMTP_PASSWORD")
+
+class _Handler:
+    def __init__(self, sink: "SMTPSink"):
+        self.sink = sink
+
+    async def handle_DATA(self, server, session, envelope) -> str:
+        if self.sink.reply is not None:
+            return self.sink.reply
+        message = message_from_bytes(envelope.content, policy=policy.default)
+        self.sink.messages.append(message)
+        self.sink.sessions.add(id(session))
+        if self.sink.echo:
+            print(f"--- {message['From']} -> {', '.join(envelope.rcpt_tos)}: {message['Subject']}")
+        return "250 Message accepted for delivery"
+
+class SMTPSink:
+    """
+    In-process SMTP server collecting messages. As a context manager it also points the
+    SMTP settings at itself (plain, no AUTH) and restores them on exit.
+    """
+    def __init__(self, hostname: str = "127.0.0.1", port: int = 8025, echo: bool = False):
+        self.hostname = hostname
+        self.port = port
+        self.echo = echo
+        self.messages: List[EmailMessage] = []
+        self.sessions: set = set()  # SMTP sessions that delivered mail, to check connection reuse
+        self.reply: Optional[str] = None  # e.g. "451 Try again later" or "550 No such user"
+        self._controller = Controller(_Handler(self), hostname=hostname, port=port)
+        self._saved: Dict[str, Any] = {}
+
+    def start(self) -> None:
+        self._controller.start()
+
+    def stop(self) -> None:
+        self._controller.stop()
+
+    def __enter__(self) -> "SMTPSink":
+        self.start()
+        self._saved = {name: getattr(settings, name) for name in OVERRIDES}
+        settings.SMTP_SERVER = self.hostname
+        settings.SMTP_PORT = self.port
+        settings.SMTP_START_TLS = False
+        settings.SMTP_PASSWORD = ""
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for name, value in self._saved.items():
+            setattr(settings, name, value)
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Catch outgoing mail on a local SMTP port")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, echo=True)
+    sink.start()
+    print(f"SMTP sink on {args.host}:{args.port} (SMTP_SERVER={args.host} SMTP_PORT={args.port} SMTP_START_TLS=false SMTP_PASSWORD=)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.stop()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# utils/streaming.py
+
+import logging
+from typing import Any, AsyncIterator, Callable, Optional
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+from utils.serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+NDJSON = "ndjson"
+JSON_ARRAY = "json"
+
+def encode_document(document: Any) -> bytes:
+    """
+    Encode a single document as compact JSON.
+    """
+    return dumps(document)
+
+async def ndjson_lines(documents: AsyncIterator[Any], encode: Callable[[Any], bytes] = encode_document) -> AsyncIterator[bytes]:
+    """
+    One JSON document per line.
+    """
+    try:
+        async for document in documents:
+            yield encode(document) + b"\n"
+    except Exception as e:
+        # Headers are already sent, the client sees a truncated stream
+        logger.error(f"NDJSON stream aborted: {e}")
+        raise
+
+async def json_array_chunks(documents: AsyncIterator[Any], encode: Callable[[Any], bytes] = encode_document) -> AsyncIterator[bytes]:
+    """
+    A regular JSON array, written one element at a time.
+    """
+    first = True
+    try:
+        yield b"["
+        async for document in documents:
+            yield (b"" if first else b",") + encode(document)
+            first = False
+        yield b"]"
+    except Exception as e:
+        logger.error(f"JSON array stream aborted: {e}")
+        raise
+
+def stream_documents(documents: AsyncIterator[Any], mode: str = NDJSON, encode: Callable[[Any], bytes] = encode_document) -> StreamingResponse:
+    """
+    Wrap an async document iterator in a chunked StreamingResponse.
+    """
+    if mode == NDJSON:
+        return StreamingResponse(ndjson_lines(documents, encode), media_type="application/x-ndjson")
+    return StreamingResponse(json_array_chunks(documents, encode), media_type="application/json")
+
+def stream_mode(
+    stream: Optional[str] = Query(None, pattern="^(ndjson|json)$", description="Stream the listing as 'ndjson' or a chunked 'json' array")
+) -> Optional[str]:
+    """
+    Dependency for list endpoints: ?stream=ndjson|json switches to a streaming response.
+    """
+    return stream
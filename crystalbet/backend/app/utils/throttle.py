@@ -0,0 +1,245 @@
+# utils/throttle.py
+#
+# Token-bucket throttling for the authentication endpoints. A failed login still costs
+# a full bcrypt verification, so credential stuffing is refused here with 429 before any
+# hashing work. Buckets are keyed by client IP and by account (normalized email or
+# username), so neither many accounts from one address nor one account from many
+# addresses gets through.
+#
+# The memory backend keeps per-key state as (tokens, timestamp) under a 16-byte digest of
+# the key, in shards that are swept one at a time for buckets that have refilled: a full
+# bucket is the same as no bucket, so idle keys cost nothing. The redis backend runs the
+# same algorithm in a Lua script so limits hold across workers.
+
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException, Request, status
+from core.config import settings
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # Optional dependency, only needed with THROTTLE_BACKEND=redis
+    aioredis = None
+
+logger = logging.getLogger(__name__)
+
+class Limit:
+    """
+    Bucket of `burst` tokens refilled at `per_minute` tokens a minute.
+    """
+    def __init__(self, name: str, burst: int, per_minute: float):
+        self.name = name
+        self.burst = float(burst)
+        self.rate = per_minute / 60.0
+
+    def idle_seconds(self, tokens: float) -> float:
+        # Time until a bucket holding `tokens` is full again
+        return (self.burst - tokens) / self.rate
+
+def _digest(limit: Limit, key: str) -> bytes:
+    return hashlib.blake2b(f"{limit.name}:{key}".encode("utf-8"), digest_size=16).digest()
+
+class MemoryThrottle:
+    """
+    Per-process buckets in `shards` dicts, swept round-robin for idle entries.
+    """
+    name = "memory"
+
+    def __init__(self, shards: int = 64, max_keys: int = 100000, sweep_interval: float = 1.0):
+        self._shards: List[Dict[bytes, Tuple[float, float, float]]] = [{} for _ in range(shards)]
+        self.max_keys_per_shard = max(1, max_keys // shards)
+        self.sweep_interval = sweep_interval
+        self._next_sweep = 0.0
+        self._sweep_shard = 0
+        self.allowed = 0
+        self.throttled = 0
+        self.evicted = 0
+
+    async def take(self, limit: Limit, key: str, cost: float = 1.0) -> float:
+        """
+        Take `cost` tokens. Returns 0 when allowed, else the seconds until it would be.
+        """
+        now = time.monotonic()
+        self._sweep(now)
+        digest = _digest(limit, key)
+        shard = self._shards[digest[0] % len(self._shards)]
+        entry = shard.get(digest)
+        tokens = limit.burst if entry is None else min(limit.burst, entry[0] + (now - entry[1]) * limit.rate)
+        if tokens < cost:
+            self.throttled += 1
+            return (cost - tokens) / limit.rate
+        tokens -= cost
+        # Third field: when the bucket is full again and the entry can go
+        shard[digest] = (tokens, now, now + limit.idle_seconds(tokens))
+        if len(shard) > self.max_keys_per_shard:
+            # Drop the oldest entry (dicts keep insertion order); it errs on the side of allowing
+            shard.pop(next(iter(shard)))
+            self.evicted += 1
+        self.allowed += 1
+        return 0.0
+
+    def _sweep(self, now: float) -> None:
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        shard = self._shards[self._sweep_shard]
+        self._sweep_shard = (self._sweep_shard + 1) % len(self._shards)
+        idle = [digest for digest, (_, _, full_at) in shard.items() if full_at <= now]
+        for digest in idle:
+            del shard[digest]
+        self.evicted += len(idle)
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "keys": sum(len(shard) for shard in self._shards),
+            "shards": len(self._shards),
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "evicted": self.evicted,
+        }
+
+# KEYS[1] bucket; ARGV burst, rate per second, cost. Returns the retry-after seconds as a string
+# (Lua numbers would be truncated to integers in the reply). The key expires once the bucket is full.
+_TAKE_SCRIPT = """
+local burst = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(state[1])
+if tokens == nil then
+    tokens = burst
+else
+    tokens = math.min(burst, tokens + (now - tonumber(state[2])) * rate)
+end
+if tokens < cost then
+    return tostring((cost - tokens) / rate)
+end
+tokens = tokens - cost
+redis.call('HSET', KEYS[1], 't', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+return '0'
+"""
+
+class RedisThrottle:
+    """
+    Buckets shared by all workers on a Redis-protocol server. Falls back to the local
+    buckets while the server is unreachable, so limits degrade to per-worker instead of off.
+    """
+    name = "redis"
+
+    def __init__(self, url: str, key_prefix: str = "crystalbet:", client: Any = None, fallback: Optional[MemoryThrottle] = None):
+        if client is None:
+            if aioredis is None:
+                raise RuntimeError("THROTTLE_BACKEND=redis requires the 'redis' package.")
+            client = aioredis.from_url(url)
+        self.client = client
+        self.key_prefix = f"{key_prefix}throttle:"
+        self._take = client.register_script(_TAKE_SCRIPT)
+        self.fallback = fallback or MemoryThrottle()
+        self.allowed = 0
+        self.throttled = 0
+        self.errors = 0
+
+    async def take(self, limit: Limit, key: str, cost: float = 1.0) -> float:
+        name = self.key_prefix + _digest(limit, key).hex()
+        try:
+            retry_after = float(await self._take(keys=[name], args=[limit.burst, limit.rate, cost]))
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Throttle backend unavailable, using local buckets: {e}")
+            return await self.fallback.take(limit, key, cost)
+        if retry_after > 0:
+            self.throttled += 1
+        else:
+            self.allowed += 1
+        return retry_after
+
+    async def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "fallback": await self.fallback.stats(),
+        }
+
+    async def close(self) -> None:
+        close = getattr(self.client, "aclose", None) or self.client.close
+        await close()
+
+IP_LIMIT = Limit("ip", settings.THROTTLE_IP_BURST, settings.THROTTLE_IP_PER_MINUTE)
+ACCOUNT_LIMIT = Limit("account", settings.THROTTLE_ACCOUNT_BURST, settings.THROTTLE_ACCOUNT_PER_MINUTE)
+
+_throttle = None
+
+def get_throttle():
+    """
+    The process-wide throttle selected by THROTTLE_BACKEND, created on first use.
+    """
+    global _throttle
+    if _throttle is None:
+        if settings.THROTTLE_BACKEND == "redis":
+            _throttle = RedisThrottle(settings.REDIS_URL, settings.CACHE_KEY_PREFIX)
+        else:
+            _throttle = MemoryThrottle(settings.THROTTLE_SHARDS, settings.THROTTLE_MAX_KEYS)
+    return _throttle
+
+async def close_throttle() -> None:
+    global _throttle
+    if isinstance(_throttle, RedisThrottle):
+        await _throttle.close()
+    _throttle = None
+
+async def throttle_stats() -> Dict[str, Any]:
+    return await get_throttle().stats()
+
+def client_ip(request: Request) -> str:
+    if settings.THROTTLE_TRUST_FORWARDED:
+        # Behind a proxy that sets X-Forwarded-For, the first hop is the client
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+async def _account(request: Request) -> Optional[str]:
+    # Reads the body FastAPI has already parsed for the endpoint (cached on the request)
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("application/json"):
+            body = await request.json()
+        elif content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+            body = await request.form()
+        else:
+            return None
+    except Exception:
+        return None
+    if not hasattr(body, "get"):
+        return None
+    account = body.get("username") or body.get("email")
+    return account.strip().lower() if isinstance(account, str) and account.strip() else None
+
+async def throttle_auth(request: Request) -> None:
+    """
+    Dependency for the authentication endpoints: 429 with Retry-After once the client IP
+    or the account in the request body is out of tokens.
+    """
+    if not settings.THROTTLE_ENABLED:
+        return
+    throttle = get_throttle()
+    retry_after = await throttle.take(IP_LIMIT, client_ip(request))
+    if not retry_after:
+        account = await _account(request)
+        if account:
+            retry_after = await throttle.take(ACCOUNT_LIMIT, account)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, please retry later.",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
@@ -1,6 +1,7 @@
 from datetime import datetime, timedelta
 from typing import Union
-from jose import JWTError, jwt
+from jose import JWTError
+from core import tokens
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from models.user import UserModel  # Ensure User model is imported
@@ -16,19 +17,12 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 def create_access_token(data: dict, expires_delta: Union[timedelta, None] = None) -> str:
     """Create a new JWT access token."""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    return tokens.encode_token(data, expires_delta)
 
 async def verify_token(token: str, credentials_exception) -> UserModel:
     """Verify the given JWT token and return the associated user."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = tokens.decode_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
@@ -41,9 +35,9 @@ async def verify_token(token: str, credentials_exception) -> UserModel:
 def decode_token(token: str):
     """Decodes a JWT token and returns the payload."""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = tokens.decode_token(token)
         return payload
-    except jwt.JWTError:
+    except JWTError:
         return None  # Handle the exception accordingly
     
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserModel: